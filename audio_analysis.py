@@ -0,0 +1,128 @@
+"""
+audio_analysis.py
+Audio decoding and energy analysis helpers.
+- Stream 16 kHz mono PCM out of any media file with ffmpeg
+- Windowed RMS energy with NumPy
+- Find the quietest point in a range, for cutting at pauses
+- Split points at pauses from the energy of the whole track, without transcription
+"""
+
+import subprocess
+from typing import List
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+def iter_pcm_blocks(media_path, block_seconds=30.0, sample_rate=SAMPLE_RATE):
+    '''
+    Decode the audio of media_path to mono float32 PCM and yield it block by block.
+    Only one block is held in memory at a time, whatever the source length.
+    '''
+    process = subprocess.Popen([
+        "ffmpeg", "-nostdin", "-v", "error",
+        "-i", media_path,
+        "-vn", "-ac", "1", "-ar", str(sample_rate),
+        "-f", "s16le", "-"
+    ], stdout=subprocess.PIPE)
+    block_bytes = int(block_seconds * sample_rate) * 2
+    try:
+        while True:
+            data = process.stdout.read(block_bytes)
+            if not data:
+                break
+            if len(data) % 2:
+                data = data[:-1]
+            yield np.frombuffer(data, np.int16).astype(np.float32) / 32768.0
+    finally:
+        process.stdout.close()
+        process.wait()
+    if process.returncode not in (0, None):
+        raise RuntimeError(f"ffmpeg n'a pas pu décoder l'audio de {media_path}")
+
+
+def window_rms(samples, window_size):
+    '''RMS energy of consecutive non-overlapping windows of window_size samples.'''
+    n_windows = len(samples) // window_size
+    if n_windows == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = samples[:n_windows * window_size].reshape(n_windows, window_size)
+    return np.sqrt(np.mean(np.square(frames), axis=1))
+
+
+def quietest_point(samples, start, end, window_size):
+    '''
+    Return the sample index of the centre of the quietest window in samples[start:end].
+    '''
+    start = max(0, start)
+    end = min(len(samples), end)
+    rms = window_rms(samples[start:end], window_size)
+    if len(rms) == 0:
+        return end
+    return start + int(np.argmin(rms)) * window_size + window_size // 2
+
+
+def energy_profile(media_path, window_seconds=0.05, sample_rate=SAMPLE_RATE):
+    '''
+    RMS energy of the whole audio track of media_path, one value per window_seconds.
+    The audio is decoded once; only the RMS values are kept, not the samples.
+    '''
+    window_size = int(window_seconds * sample_rate)
+    profile = []
+    rest = np.zeros(0, dtype=np.float32)
+    for block in iter_pcm_blocks(media_path, sample_rate=sample_rate):
+        block = np.concatenate([rest, block]) if len(rest) else block
+        n_samples = len(block) // window_size * window_size
+        profile.append(window_rms(block[:n_samples], window_size))
+        rest = block[n_samples:]
+    return np.concatenate(profile) if profile else np.zeros(0, dtype=np.float32)
+
+
+def pause_split_points(rms, window_seconds, min_duration=60.0, search_seconds=15.0,
+                       pause_seconds=0.3, pause_ratio=0.1) -> List[float]:
+    '''
+    Split points (in seconds) at the pauses of an energy_profile(), each at least
+    min_duration after the previous one, like CueStore.split_points().
+    A pause is pause_seconds of energy at or below pause_ratio times the median
+    energy of the track, so it does not depend on how often the speaker pauses.
+    After each boundary, the first pause within search_seconds is cut in its middle,
+    or the middle of its part inside that range; without a pause, the quietest point
+    of the range is used.
+    '''
+    if len(rms) == 0:
+        return []
+    pause_windows = max(1, int(round(pause_seconds / window_seconds)))
+    smoothed = np.convolve(rms, np.ones(pause_windows) / pause_windows, mode="same")
+    quiet = smoothed <= pause_ratio * np.median(smoothed)
+    # Index of the first loud window at or after each window, to find where a pause ends
+    loud = np.flatnonzero(~quiet)
+    next_loud = np.searchsorted(loud, np.arange(len(rms)))
+    next_loud = np.append(loud, len(rms))[next_loud]
+
+    min_windows = int(min_duration / window_seconds)
+    search_windows = max(1, int(search_seconds / window_seconds))
+    split_points = []
+    last = 0
+    while last + min_windows < len(rms):
+        start = last + min_windows
+        end = min(len(rms), start + search_windows)
+        pauses = np.flatnonzero(quiet[start:end])
+        if len(pauses):
+            pause_start = start + int(pauses[0])
+            cut = (pause_start + min(int(next_loud[pause_start]), end)) // 2
+        else:
+            cut = start + int(np.argmin(smoothed[start:end]))
+        split_points.append(float((cut + 0.5) * window_seconds))
+        last = cut
+    return split_points
+
+
+def get_split_points_from_audio(media_path: str, min_duration: float = 60.0, **options) -> List[float]:
+    '''
+    Get split points (in seconds) at the pauses of the audio of media_path, without
+    running Whisper (e.g. videos without speech, or clips posted without subtitles).
+    Same shape as subtitle.get_split_points_from_srt(); options go to pause_split_points().
+    '''
+    window_seconds = 0.05
+    return pause_split_points(energy_profile(media_path, window_seconds), window_seconds, min_duration, **options)
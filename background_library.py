@@ -0,0 +1,142 @@
+"""
+background_library.py
+Persistent library of pre-normalized satisfying background clips.
+- Normalize each clip once to the background format (1080x960, 30 fps, H.264/AAC)
+- JSON index of duration and tags, updated under a file lock (concurrent batches)
+- Pick and concatenate enough footage for a requested duration, without re-encoding
+"""
+
+import json
+import os
+import random
+import subprocess
+import time
+import uuid
+
+from file_lock import locked, write_json_atomic
+from video_editor import has_audio_stream, probe_duration
+
+LIBRARY_DIR = os.path.join("downloads", "library")
+INDEX_FILE = "index.json"
+
+# Every clip in the library shares this format, so clips can be joined by stream copy
+WIDTH = 1080
+HEIGHT = 960
+FPS = 30
+SAMPLE_RATE = 44100
+TIMESCALE = 15360
+
+
+def load_index(library_dir=LIBRARY_DIR):
+    '''Read the library index (an empty one if the library does not exist yet).'''
+    path = os.path.join(library_dir, INDEX_FILE)
+    if not os.path.exists(path):
+        return {"clips": []}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_index(index, library_dir=LIBRARY_DIR):
+    '''Write the library index atomically.'''
+    write_json_atomic(os.path.join(library_dir, INDEX_FILE), index, indent=2)
+
+
+def normalize_clip(input_path, output_path):
+    '''Re-encode a clip to the library format: scaled/cropped to 1080x960, 30 fps, stereo AAC.'''
+    video_filter = (
+        f"scale=-2:{HEIGHT},crop='min(iw,{WIDTH})':{HEIGHT},"
+        f"pad={WIDTH}:{HEIGHT}:(ow-iw)/2:0,setsar=1,fps={FPS},format=yuv420p"
+    )
+    command = ["ffmpeg", "-y", "-v", "error", "-i", input_path]
+    if has_audio_stream(input_path):
+        audio_map = "0:a:0"
+    else:
+        command += ["-f", "lavfi", "-i", f"anullsrc=r={SAMPLE_RATE}:cl=stereo"]
+        audio_map = "1:a:0"
+    command += [
+        "-map", "0:v:0", "-map", audio_map, "-shortest",
+        "-vf", video_filter,
+        "-c:v", "libx264", "-preset", "medium", "-g", str(FPS * 2),
+        "-c:a", "aac", "-ar", str(SAMPLE_RATE), "-ac", "2",
+        "-video_track_timescale", str(TIMESCALE),
+        "-movflags", "+faststart",
+        output_path
+    ]
+    subprocess.run(command, check=True)
+    return output_path
+
+
+def add_clip(input_path, tags=(), source=None, library_dir=LIBRARY_DIR):
+    '''Normalize input_path into the library and index it. Returns the index entry.'''
+    os.makedirs(library_dir, exist_ok=True)
+    clip_id = uuid.uuid4().hex[:12]
+    output_path = os.path.join(library_dir, f"{clip_id}.mp4")
+    normalize_clip(input_path, output_path)
+    entry = {
+        "id": clip_id,
+        "path": output_path,
+        "duration": probe_duration(output_path),
+        "tags": sorted(set(tags)),
+        "source": source,
+        "added": time.time(),
+    }
+    # Read again under the lock: other threads/processes may have added clips meanwhile
+    with locked(os.path.join(library_dir, INDEX_FILE)):
+        index = load_index(library_dir)
+        index["clips"].append(entry)
+        save_index(index, library_dir)
+    return entry
+
+
+def _matching_clips(index, tags=None):
+    return [
+        c for c in index["clips"]
+        if os.path.exists(c["path"]) and (not tags or set(tags) & set(c["tags"]))
+    ]
+
+
+def library_duration(tags=None, library_dir=LIBRARY_DIR):
+    '''Total duration (s) of the clips matching tags (any tag), or of the whole library.'''
+    return sum(c["duration"] for c in _matching_clips(load_index(library_dir), tags))
+
+
+def pick_clips(duration, tags=None, library_dir=LIBRARY_DIR, rng=random):
+    '''
+    Pick clips in random order until they cover `duration` seconds.
+    Returns None if the matching clips are too short in total.
+    '''
+    clips = _matching_clips(load_index(library_dir), tags)
+    rng.shuffle(clips)
+    picked = []
+    total = 0.0
+    for clip in clips:
+        if total >= duration:
+            break
+        picked.append(clip)
+        total += clip["duration"]
+    return picked if total >= duration else None
+
+
+def build_background(duration, output_path, tags=None, library_dir=LIBRARY_DIR, rng=random):
+    '''
+    Concatenate library clips covering `duration` seconds into output_path by stream copy.
+    Returns output_path, or None if the library does not hold enough footage.
+    '''
+    clips = pick_clips(duration, tags, library_dir, rng)
+    if clips is None:
+        return None
+    list_path = output_path + ".txt"
+    with open(list_path, "w", encoding="utf-8") as f:
+        for clip in clips:
+            f.write(f"file '{os.path.abspath(clip['path'])}'\n")
+    try:
+        subprocess.run([
+            "ffmpeg", "-y", "-v", "error",
+            "-f", "concat", "-safe", "0", "-i", list_path,
+            "-t", f"{duration:.3f}",
+            "-c", "copy",
+            output_path
+        ], check=True)
+    finally:
+        os.remove(list_path)
+    return output_path
@@ -0,0 +1,278 @@
+"""
+benchmark.py
+Offline, reproducible benchmark of the pipeline stages.
+- Deterministic synthetic sources (ffmpeg testsrc2/sine) and a canned Whisper-style transcript
+- Times each editing/subtitle function separately, and every clip end to end
+  through the workflow functions of main.py
+- JSON results, with comparison against a baseline file to flag regressions
+- Command-line startup time, and a check that no heavy module is imported at startup
+
+Usage:
+    python benchmark.py --output bench.json
+    python benchmark.py --baseline bench.json --threshold 0.10
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARKS = []
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+# Must not be imported just by starting the command line or importing main.py
+HEAVY_MODULES = ("whisper", "torch", "numpy", "moviepy", "yt_dlp", "selenium", "googleapiclient")
+
+
+def benchmark(name, media=True):
+    '''Register a benchmark: fn(ctx) runs the timed work once. media=False: no synthetic inputs needed.'''
+    def register(fn):
+        BENCHMARKS.append((name, fn, media))
+        return fn
+    return register
+
+
+def make_source(path, duration, size, pattern="testsrc2", frequency=440):
+    '''Generate a deterministic test video with a sine tone.'''
+    subprocess.run([
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "lavfi", "-i", f"{pattern}=size={size}:rate=30:duration={duration}",
+        "-f", "lavfi", "-i", f"sine=frequency={frequency}:sample_rate=44100:duration={duration}",
+        "-c:v", "libx264", "-preset", "ultrafast", "-g", "60", "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-shortest",
+        path
+    ], check=True)
+    return path
+
+
+def make_whisper_result(duration, seed=0):
+    '''Canned Whisper-style result: sentences of 4-12 words, ~2.5 words/s, over `duration` seconds.'''
+    rng = random.Random(seed)
+    vocabulary = ["the", "video", "is", "really", "a", "great", "moment", "and", "we", "love",
+                  "this", "part", "of", "show", "today", "you", "can", "see", "it", "now"]
+    segments = []
+    t = 0.0
+    while t < duration - 1:
+        n_words = rng.randint(4, 12)
+        text = " ".join(rng.choice(vocabulary) for _ in range(n_words))
+        end = min(duration, t + n_words / 2.5)
+        segments.append({"id": len(segments), "start": round(t, 3), "end": round(end, 3),
+                         "text": " " + text.capitalize() + rng.choice([".", ".", "!", "?", ","])})
+        t = end + rng.uniform(0.1, 0.8)
+    return {"text": "".join(s["text"] for s in segments), "segments": segments, "language": "en"}
+
+
+def time_runs(fn, ctx, repeat):
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(ctx)
+        runs.append(time.perf_counter() - start)
+    return runs
+
+
+@benchmark("get_split_points_from_srt")
+def bench_split_points(ctx):
+    from subtitle import get_split_points_from_srt
+    get_split_points_from_srt(ctx["srt"], min_duration=ctx["min_duration"])
+
+
+@benchmark("get_split_points_from_audio")
+def bench_audio_split_points(ctx):
+    from audio_analysis import get_split_points_from_audio
+    get_split_points_from_audio(ctx["main"], min_duration=ctx["min_duration"])
+
+
+@benchmark("slice_srt")
+def bench_slice_srt(ctx):
+    from subtitle import slice_srt
+    start = 0.0
+    for i, end in enumerate(ctx["split_points"]):
+        slice_srt(ctx["srt"], os.path.join(ctx["workdir"], f"slice_{i}.srt"), start, end)
+        start = end
+
+
+@benchmark("edit_video")
+def bench_edit_video(ctx):
+    from video_editor import edit_video
+    edit_video(ctx["main"], ctx["satisfying"], os.path.join(ctx["workdir"], "edit_video.mp4"),
+               start=0, duration=ctx["clip_duration"])
+
+
+@benchmark("edit_video_blur_background")
+def bench_edit_video_blur_background(ctx):
+    from video_editor import edit_video_blur_background
+    edit_video_blur_background(ctx["clip"], os.path.join(ctx["workdir"], "blur.mp4"),
+                               duration=ctx["clip_duration"], workdir=ctx["workdir"])
+
+
+@benchmark("merge_videos")
+def bench_merge_videos(ctx):
+    from video_editor import merge_videos, ENDING_PATH
+    merge_videos([ctx["clip"], ENDING_PATH], os.path.join(ctx["workdir"], "merged.mp4"))
+
+
+@benchmark("add_subtitles_to_video")
+def bench_add_subtitles(ctx):
+    from subtitle import add_subtitles_to_video
+    add_subtitles_to_video(ctx["clip"], ctx["clip_srt"], os.path.join(ctx["workdir"], "subs.mp4"),
+                           FONT_SIZE=20, MARGIN_V=70, ALIGN='5', Coulour='&H0000FFFF')
+
+
+@benchmark("render_blur_clip_single_pass")
+def bench_blur_single_pass(ctx):
+    from subtitle import build_subtitle_filter
+    from video_editor import render_blur_clip_single_pass
+    render_blur_clip_single_pass(ctx["main"], os.path.join(ctx["workdir"], "single_pass.mp4"),
+                                 start=0, duration=ctx["clip_duration"],
+                                 subtitle_filter=build_subtitle_filter(ctx["clip_srt"], FONT_SIZE=20))
+
+
+@benchmark("render_blur_track")
+def bench_blur_track(ctx):
+    '''Blurred background of the whole source, rendered once and shared by its clips.'''
+    from video_editor import render_blur_track
+    render_blur_track(ctx["main"], os.path.join(ctx["workdir"], f"blur_track_{time.perf_counter_ns()}.mp4"))
+
+
+def run_workflow_clips(ctx, name, render_fn, **options):
+    '''
+    Every clip of the source through the same calls as main.split_video() and
+    main.split_blured_video(): split points, segment_video(), build_clip_jobs(),
+    run_clip_jobs() with the real renderer (moviepy/ffmpeg path, not single pass).
+    '''
+    from clip_executor import run_clip_jobs
+    from main import build_clip_jobs
+    from segmenter import segment_video
+    output_dir = os.path.join(ctx["workdir"], f"{name}_{time.perf_counter_ns()}")
+    for d in ["video_sub", "script", "segments"]:
+        os.makedirs(os.path.join(output_dir, d))
+    split_points = ctx["cue_store"].split_points(min_duration=ctx["min_duration"])
+    segments = segment_video(ctx["main"], split_points, os.path.join(output_dir, "segments"))
+    jobs = build_clip_jobs(ctx["cue_store"], split_points, segments, output_dir=output_dir,
+                           video_path=ctx["main"], single_pass=False, **options)
+    run_clip_jobs(jobs, render_fn, max_workers=1)
+
+
+@benchmark("end_to_end_blur_clips")
+def bench_end_to_end(ctx):
+    '''Every clip of the source with main.render_blured_clip and a shared blurred track.'''
+    from main import BLURED_SUBTITLE_STYLE, render_blured_clip
+    from video_editor import render_blur_track
+    blur_track = render_blur_track(ctx["main"], os.path.join(ctx["workdir"], f"e2e_blur_{time.perf_counter_ns()}.mp4"))
+    run_workflow_clips(ctx, "e2e_blur", render_blured_clip,
+                       subtitle_style=BLURED_SUBTITLE_STYLE, blur_track=blur_track)
+
+
+@benchmark("end_to_end_satisfying_clips")
+def bench_end_to_end_satisfying(ctx):
+    '''Every clip of the source with main.render_satisfying_clip on a synthetic satisfying background.'''
+    from main import SATISFYING_SUBTITLE_STYLE, render_satisfying_clip
+    run_workflow_clips(ctx, "e2e_satisfying", render_satisfying_clip,
+                       subtitle_style=SATISFYING_SUBTITLE_STYLE, satisfying_path=ctx["satisfying_full"])
+
+
+@benchmark("cli_startup", media=False)
+def bench_cli_startup(ctx):
+    '''Start a fresh interpreter, import the command line and main.py, fail if a heavy module got loaded.'''
+    code = f"import sys, cli, main; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    loaded = subprocess.run([sys.executable, "-c", code], cwd=REPO_DIR, check=True,
+                            capture_output=True, text=True).stdout.strip()
+    if loaded:
+        raise RuntimeError(f"Modules lourds importés au démarrage : {loaded}")
+
+
+def prepare(workdir, duration, clip_duration, min_duration, seed):
+    '''Generate the synthetic inputs shared by all benchmarks.'''
+    from cue_store import CueStore
+    ctx = {"workdir": workdir, "clip_duration": clip_duration, "min_duration": min_duration}
+    ctx["main"] = make_source(os.path.join(workdir, "main.mp4"), duration, "1280x720")
+    ctx["satisfying"] = make_source(os.path.join(workdir, "satisfying.mp4"), max(60, clip_duration), "1080x960",
+                                    pattern="mandelbrot", frequency=220)
+    ctx["clip"] = make_source(os.path.join(workdir, "clip.mp4"), clip_duration, "1280x720")
+    # Satisfying background as long as the source, as prepare_satisfying_background() builds it
+    ctx["satisfying_full"] = make_source(os.path.join(workdir, "satisfying_full.mp4"), duration, "1080x960",
+                                         pattern="mandelbrot", frequency=220)
+    store = CueStore.from_whisper_result(make_whisper_result(duration, seed))
+    ctx["cue_store"] = store
+    ctx["srt"] = store.write_srt(os.path.join(workdir, "full.srt"))
+    ctx["clip_srt"] = store.write_srt(os.path.join(workdir, "clip.srt"), 0, clip_duration)
+    ctx["split_points"] = store.split_points(min_duration)
+    return ctx
+
+
+def compare(results, baseline, threshold):
+    '''Return the benchmarks whose median got slower than baseline by more than threshold.'''
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        ratio = result["median"] / base["median"] if base["median"] else 1.0
+        result["baseline_median"] = base["median"]
+        result["ratio"] = round(ratio, 3)
+        if ratio > 1 + threshold:
+            regressions.append((name, ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark of the clip pipeline")
+    parser.add_argument("--duration", type=float, default=180.0, help="synthetic source length (s)")
+    parser.add_argument("--clip-duration", type=float, default=20.0, help="clip length for single-clip benchmarks (s)")
+    parser.add_argument("--min-duration", type=float, default=60.0, help="min_duration for split points (s)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="*", help="benchmark names to run")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="JSON file from a previous run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown vs baseline (0.10 = 10%%)")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="clip_bench_")
+    try:
+        selected = [(name, fn, media) for name, fn, media in BENCHMARKS if not args.only or name in args.only]
+        ctx = {"workdir": workdir}
+        if any(media for _, _, media in selected):
+            ctx = prepare(workdir, args.duration, args.clip_duration, args.min_duration, args.seed)
+        results = {}
+        from media_readers import READERS
+        for name, fn, _ in selected:
+            runs = time_runs(fn, ctx, args.repeat)
+            # A benchmark leaving a moviepy reader checked out fails the run
+            READERS.check_leaks()
+            READERS.close_all()
+            results[name] = {"median": statistics.median(runs), "min": min(runs), "runs": runs,
+                             "readers": READERS.stats()}
+            print(f"{name:32s} {results[name]['median']:8.3f}s")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "params": vars(args),
+        "results": results,
+    }
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        report["regressions"] = [{"name": n, "ratio": round(r, 3)} for n, r in regressions]
+        for name, ratio in regressions:
+            print(f"⚠️ Régression : {name} x{ratio:.2f} par rapport à la référence")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+chunked_transcription.py
+Audio-only, chunked parallel transcription with Whisper.
+- Extract a 16 kHz mono audio stream once
+- Split it into chunks at the quietest point near each chunk boundary
+- Transcribe the chunks in parallel worker processes
+- Stitch the segments back together with corrected timestamps
+"""
+
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+
+from audio_analysis import SAMPLE_RATE, iter_pcm_blocks, quietest_point
+from subtitle import get_whisper_model
+
+_worker_model = None
+
+
+def split_audio_chunks(media_path, outdir, chunk_seconds=300.0, search_seconds=20.0, window_seconds=0.1):
+    '''
+    Decode media_path once and write it as .npy chunks of about chunk_seconds into outdir.
+    Each cut is placed at the quietest window of the last search_seconds before the boundary.
+    Yields (offset_seconds, chunk_path); memory stays bounded to about one chunk.
+    '''
+    chunk_samples = int(chunk_seconds * SAMPLE_RATE)
+    search_samples = int(search_seconds * SAMPLE_RATE)
+    window_size = max(1, int(window_seconds * SAMPLE_RATE))
+    buffer = np.zeros(0, dtype=np.float32)
+    offset = 0
+    index = 0
+
+    def write_chunk(samples):
+        nonlocal index
+        path = os.path.join(outdir, f"chunk_{index:05d}.npy")
+        np.save(path, samples)
+        index += 1
+        return path
+
+    for block in iter_pcm_blocks(media_path):
+        buffer = np.concatenate([buffer, block])
+        while len(buffer) >= chunk_samples:
+            cut = quietest_point(buffer, chunk_samples - search_samples, chunk_samples, window_size)
+            cut = max(cut, window_size)
+            yield offset / SAMPLE_RATE, write_chunk(buffer[:cut])
+            offset += cut
+            buffer = buffer[cut:]
+    if len(buffer):
+        yield offset / SAMPLE_RATE, write_chunk(buffer)
+
+
+def _init_worker(model_name, device, threads):
+    '''Load the model once per worker process and share the CPU between workers.'''
+    global _worker_model
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    _worker_model = get_whisper_model(model_name, device)
+
+
+def _transcribe_chunk(chunk_path, offset, options):
+    '''Transcribe one chunk and shift its timestamps by the chunk offset.'''
+    audio = np.load(chunk_path)
+    os.remove(chunk_path)
+    result = _worker_model.transcribe(audio, **options)
+    segments = []
+    for seg in result["segments"]:
+        seg = dict(seg)
+        seg["start"] = float(seg["start"]) + offset
+        seg["end"] = float(seg["end"]) + offset
+        if "words" in seg:
+            seg["words"] = [
+                dict(w, start=float(w["start"]) + offset, end=float(w["end"]) + offset)
+                for w in seg["words"]
+            ]
+        segments.append(seg)
+    return {"text": result["text"], "segments": segments, "language": result.get("language")}
+
+
+def transcribe_chunked(media_path, model_name="base", device=None, workers=None,
+                       chunk_seconds=300.0, search_seconds=20.0, **options):
+    '''
+    Transcribe media_path chunk by chunk in `workers` processes.
+    Returns a dict shaped like whisper's transcribe() result (text, segments, language).
+    At most two chunks per worker wait on disk at any time, so memory does not grow
+    with the source length. Pass language= to avoid a language detection per chunk.
+    '''
+    if workers is None:
+        workers = max(1, min(4, (os.cpu_count() or 1) // 4))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    chunk_dir = tempfile.mkdtemp(prefix="whisper_chunks_")
+    results = {}
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(model_name, device, threads)
+        ) as pool:
+            pending = {}
+            for index, (offset, chunk_path) in enumerate(split_audio_chunks(media_path, chunk_dir, chunk_seconds, search_seconds)):
+                while len(pending) >= workers * 2:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        results[pending.pop(future)] = future.result()
+                pending[pool.submit(_transcribe_chunk, chunk_path, offset, options)] = index
+            for future in pending:
+                results[pending[future]] = future.result()
+    finally:
+        shutil.rmtree(chunk_dir, ignore_errors=True)
+
+    text = []
+    segments = []
+    language = None
+    for index in sorted(results):
+        chunk = results[index]
+        text.append(chunk["text"].strip())
+        language = language or chunk["language"]
+        for seg in chunk["segments"]:
+            seg["id"] = len(segments)
+            segments.append(seg)
+    return {"text": " ".join(t for t in text if t), "segments": segments, "language": language}
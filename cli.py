@@ -0,0 +1,204 @@
+"""
+cli.py
+Command-line entry point of the clip generator.
+- Subcommands: download, transcribe, split-points, render, preview, promote, upload, batch
+- Heavy modules (whisper/torch, moviepy, yt_dlp, upload clients) are only imported
+  by the command that needs them, so short steps start quickly
+
+Usage:
+    python cli.py download https://www.youtube.com/watch?v=...
+    python cli.py transcribe downloads/video/video.mp4 --srt output/script/full_subtitles.srt
+    python cli.py split-points downloads/video/video.mp4 --min-duration 60
+    python cli.py render --layout blur --single-pass
+    python cli.py preview --layouts blur satisfying
+    python cli.py promote --layout blur
+    python cli.py upload output/jobs/<job>/video_sub --platform youtube --title "Clip"
+    python cli.py batch --count 5 --layout blur
+    python cli.py batch --count 5 --split-source audio
+
+Startup time: `python -X importtime cli.py --help`, or `python benchmark.py --only cli_startup`.
+"""
+
+import argparse
+import glob
+import os
+import sys
+
+
+def cmd_download(args):
+    from video_downloader import download_video
+    print(download_video(args.url, outdir=args.outdir, min_height=args.min_height))
+
+
+def cmd_transcribe(args):
+    from subtitle import generate_cue_store
+    cue_store = generate_cue_store(
+        args.media,
+        transcript_path=args.transcript,
+        srt_path=args.srt,
+        model_name=args.model,
+        device=args.device,
+        chunked=args.chunked,
+        workers=args.workers,
+        language=args.language,
+        use_cache=not args.no_cache
+    )
+    print(f"✅ {len(cue_store)} sous-titres générés.")
+
+
+def cmd_split_points(args):
+    if args.srt:
+        from subtitle import get_split_points_from_srt
+        split_points = get_split_points_from_srt(args.srt, min_duration=args.min_duration)
+    else:
+        from audio_analysis import get_split_points_from_audio
+        split_points = get_split_points_from_audio(args.media, min_duration=args.min_duration)
+    print(f"📌 Points de découpe trouvés: {[round(p, 2) for p in split_points]}")
+
+
+def cmd_render(args):
+    import main
+    if args.layout == "blur":
+        main.split_blured_video(single_pass=args.single_pass, max_workers=args.workers,
+                                resume=not args.no_resume, blur_quality=args.blur_quality,
+                                split_source=args.split_source)
+    else:
+        main.split_video(single_pass=args.single_pass, max_workers=args.workers, resume=not args.no_resume)
+
+
+def cmd_preview(args):
+    from main import preview_video
+    preview_video(layouts=args.layouts, max_workers=args.workers, resume=not args.no_resume)
+
+
+def cmd_promote(args):
+    from main import promote_preview
+    promote_preview(layout=args.layout, job_id=args.job, single_pass=not args.two_pass,
+                    max_workers=args.workers, blur_quality=args.blur_quality)
+
+
+def cmd_upload(args):
+    paths = []
+    for path in args.paths:
+        paths.extend(sorted(glob.glob(os.path.join(path, "*.mp4"))) if os.path.isdir(path) else [path])
+    if args.platform == "youtube":
+        from youtube_uploader import UploadService, UPLOAD_URL
+        credentials = None
+        if args.endpoint:
+            from google.auth.credentials import AnonymousCredentials
+            credentials = AnonymousCredentials()
+        service = UploadService(credentials=credentials, upload_url=args.endpoint or UPLOAD_URL,
+                                chunk_size=args.chunk_size * 1024 * 1024)
+        title_fn = (lambda path: args.title) if args.title else None
+        results = service.upload_many(paths, max_workers=args.workers, title_fn=title_fn,
+                                      description=args.description, tags=args.tags, privacy_status=args.privacy)
+        if any(isinstance(result, Exception) for result in results.values()):
+            raise SystemExit(1)
+    else:
+        from tiktok_uploader import TikTokUploader, UPLOAD_URL as TIKTOK_UPLOAD_URL
+        with TikTokUploader(upload_url=args.endpoint or TIKTOK_UPLOAD_URL) as uploader:
+            report = uploader.upload_many([(path, args.description) for path in paths])
+        if not all(clip["ok"] for clip in report):
+            raise SystemExit(1)
+
+
+def cmd_batch(args):
+    from main import run_batch
+    run_batch(
+        count=args.count,
+        layout=args.layout,
+        download_workers=args.download_workers,
+        transcribe_workers=args.transcribe_workers,
+        render_workers=args.render_workers,
+        video_urls=args.urls,
+        split_source=args.split_source
+    )
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="Automated YouTube/TikTok clip generator")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("download", help="download a YouTube video")
+    p.add_argument("url")
+    p.add_argument("--outdir", default="downloads/video")
+    p.add_argument("--min-height", type=int, default=1080, help="smallest format at least this high")
+    p.set_defaults(func=cmd_download)
+
+    p = commands.add_parser("transcribe", help="transcribe a media file to SRT/transcript")
+    p.add_argument("media")
+    p.add_argument("--srt")
+    p.add_argument("--transcript")
+    p.add_argument("--model", default="base")
+    p.add_argument("--device")
+    p.add_argument("--language")
+    p.add_argument("--chunked", action="store_true", help="transcribe silence-split chunks in parallel")
+    p.add_argument("--workers", type=int)
+    p.add_argument("--no-cache", action="store_true")
+    p.set_defaults(func=cmd_transcribe)
+
+    p = commands.add_parser("split-points", help="find the clip split points of a media file")
+    p.add_argument("media")
+    p.add_argument("--min-duration", type=float, default=60.0, help="minimum clip length (s)")
+    p.add_argument("--srt", help="cut at the sentence ends of this SRT instead of the audio pauses")
+    p.set_defaults(func=cmd_split_points)
+
+    p = commands.add_parser("render", help="split the trending video into subtitled clips")
+    p.add_argument("--layout", choices=["blur", "satisfying"], default="blur")
+    p.add_argument("--single-pass", action="store_true", help="one ffmpeg run per clip")
+    p.add_argument("--workers", type=int, help="clips rendered concurrently (default: based on CPU count)")
+    p.add_argument("--no-resume", action="store_true", help="start a new job instead of resuming the last one")
+    p.add_argument("--blur-quality", choices=["fast", "balanced", "high"], default="balanced",
+                   help="resolution of the blurred background (blur layout)")
+    p.add_argument("--split-source", choices=["subtitles", "audio"], default="subtitles",
+                   help="cut at the sentence ends, or at the audio pauses without transcription or subtitles (blur layout)")
+    p.set_defaults(func=cmd_render)
+
+    p = commands.add_parser("preview", help="low resolution preview of the clips, in each layout")
+    p.add_argument("--layouts", nargs="+", choices=["blur", "satisfying"], default=["blur", "satisfying"])
+    p.add_argument("--workers", type=int, help="clips rendered concurrently (default: based on CPU count)")
+    p.add_argument("--no-resume", action="store_true", help="start a new preview instead of resuming the last one")
+    p.set_defaults(func=cmd_preview)
+
+    p = commands.add_parser("promote", help="full render of an approved preview, without redoing its analysis")
+    p.add_argument("--layout", choices=["blur", "satisfying"], default="blur")
+    p.add_argument("--job", help="preview job id (default: the last preview)")
+    p.add_argument("--two-pass", action="store_true", help="intermediate moviepy/ffmpeg encodes instead of one ffmpeg run per clip")
+    p.add_argument("--workers", type=int, help="clips rendered concurrently (default: based on CPU count)")
+    p.add_argument("--blur-quality", choices=["fast", "balanced", "high"], default="balanced",
+                   help="resolution of the blurred background (blur layout)")
+    p.set_defaults(func=cmd_promote)
+
+    p = commands.add_parser("upload", help="upload finished clips (files or directories)")
+    p.add_argument("paths", nargs="+")
+    p.add_argument("--platform", choices=["youtube", "tiktok"], default="youtube")
+    p.add_argument("--title", help="YouTube title (default: file name)")
+    p.add_argument("--description", default="", help="YouTube description / TikTok caption")
+    p.add_argument("--tags", nargs="*")
+    p.add_argument("--privacy", default="private", choices=["private", "unlisted", "public"])
+    p.add_argument("--workers", type=int, default=3, help="concurrent YouTube uploads")
+    p.add_argument("--chunk-size", type=int, default=8, help="YouTube upload chunk size in MiB")
+    p.add_argument("--endpoint", help="upload endpoint / page, e.g. a local stand-in (YouTube: no OAuth)")
+    p.set_defaults(func=cmd_upload)
+
+    p = commands.add_parser("batch", help="process several trending videos through the staged pipeline")
+    p.add_argument("--count", type=int, default=3)
+    p.add_argument("--layout", choices=["blur", "satisfying"], default="blur")
+    p.add_argument("--urls", nargs="*", help="source URLs (default: the most popular videos)")
+    p.add_argument("--download-workers", type=int, default=2)
+    p.add_argument("--transcribe-workers", type=int, default=1)
+    p.add_argument("--render-workers", type=int, default=4)
+    p.add_argument("--split-source", choices=["subtitles", "audio"], default="subtitles",
+                   help="cut at the sentence ends, or at the audio pauses without transcription or subtitles")
+    p.set_defaults(func=cmd_batch)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
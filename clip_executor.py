@@ -0,0 +1,88 @@
+"""
+clip_executor.py
+Parallel clip rendering for the split workflows.
+- Run clip jobs in a process pool with a concurrency limit
+- Give each job its own scratch directory
+- Collect results in clip order
+"""
+
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from media_readers import READERS
+
+DEFAULT_WORKDIR_ROOT = os.path.join("output", "tmp")
+
+
+def default_max_workers():
+    '''
+    Default number of concurrent clip jobs.
+    ffmpeg/x264 already uses several threads per encode, so we run about one
+    job per four cores rather than one per core.
+    '''
+    return max(1, (os.cpu_count() or 1) // 4)
+
+
+def run_clip_job(render_fn, job, workdir_root=DEFAULT_WORKDIR_ROOT, keep_workdir=False):
+    '''
+    Run a single clip job inside a fresh scratch directory.
+    render_fn is called as render_fn(job, workdir) and must only write temporary
+    files inside workdir. The directory is removed afterwards unless keep_workdir.
+    Fails if the job left one of its moviepy readers open (see media_readers.py);
+    readers used by jobs running in other threads are not counted.
+    '''
+    os.makedirs(workdir_root, exist_ok=True)
+    workdir = tempfile.mkdtemp(prefix=f"clip_{job.get('index', 0)}_", dir=workdir_root)
+    try:
+        with READERS.scope():
+            result = render_fn(job, workdir)
+    finally:
+        if not keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    READERS.report(clip=job.get("index"), video=job.get("video_id"))
+    return result
+
+
+def run_clip_jobs(jobs, render_fn, max_workers=None, workdir_root=DEFAULT_WORKDIR_ROOT, keep_workdir=False, on_done=None):
+    '''
+    Render a list of clip jobs, up to max_workers at a time.
+    render_fn must be a module-level function (it is sent to worker processes).
+    on_done(job, result) is called in this process as soon as each job succeeds.
+    A failing job does not stop the others; the first error is raised once all
+    jobs have finished. Returns the results in the same order as jobs.
+    With max_workers=1 the jobs run sequentially in the current process.
+    '''
+    jobs = list(jobs)
+    if max_workers is None:
+        max_workers = default_max_workers()
+    max_workers = max(1, min(max_workers, len(jobs) or 1))
+    results = [None] * len(jobs)
+    first_error = None
+
+    def finished(i, result):
+        results[i] = result
+        if on_done is not None:
+            on_done(jobs[i], result)
+
+    if max_workers == 1:
+        for i, job in enumerate(jobs):
+            try:
+                finished(i, run_clip_job(render_fn, job, workdir_root, keep_workdir))
+            except Exception as e:
+                first_error = first_error or e
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = {
+                pool.submit(run_clip_job, render_fn, job, workdir_root, keep_workdir): i
+                for i, job in enumerate(jobs)
+            }
+            for future in as_completed(futures):
+                try:
+                    finished(futures[future], future.result())
+                except Exception as e:
+                    first_error = first_error or e
+    if first_error is not None:
+        raise first_error
+    return results
@@ -0,0 +1,176 @@
+"""
+cue_store.py
+In-memory, indexed subtitle cues.
+- Build the cues once from a Whisper result (or parse an SRT file once)
+- Answer time-range queries by bisection
+- Compute split points and emit per-clip SRT / transcript text without touching disk
+"""
+
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import List
+
+SENTENCE_END = re.compile(r'[.!?]\s*$')
+
+GROUP_WORDS = {
+    "a", "an", "the", "of", "to", "in", "on", "at", "by", "for", "with", "and", "or", "but",
+    "my", "your", "his", "her", "its", "our", "their", "this", "that", "these", "those",
+    "some", "any", "each", "every", "no", "one", "two"
+}
+
+
+def format_time(t):
+    '''Format seconds to SRT time string.'''
+    h = int(t // 3600)
+    m = int((t % 3600) // 60)
+    s = t % 60
+    return f"{h:02}:{m:02}:{s:06.3f}".replace('.', ',')
+
+
+def parse_srt_time(srt_time: str) -> float:
+    '''Parse SRT time string to seconds.'''
+    h, m, rest = srt_time.split(':')
+    s, ms = rest.split(',')
+    return int(h) * 3600 + int(m) * 60 + int(s) + int(ms) / 1000
+
+
+def group_words_func(words):
+    '''Group determiners and short words with the next word for better subtitle segmentation.'''
+    grouped = []
+    i = 0
+    n = len(words)
+    while i < n:
+        word = words[i]
+        if word.lower() in GROUP_WORDS and i + 1 < n:
+            grouped.append(f"{word} {words[i+1]}")
+            i += 2
+        else:
+            grouped.append(word)
+            i += 1
+    return grouped
+
+
+class Cue:
+    '''One subtitle entry: times in seconds and its text lines joined by newlines.'''
+    __slots__ = ("start", "end", "text")
+
+    def __init__(self, start, end, text):
+        self.start = start
+        self.end = end
+        self.text = text
+
+    def __repr__(self):
+        return f"Cue({self.start!r}, {self.end!r}, {self.text!r})"
+
+
+class CueStore:
+    '''
+    Subtitle cues sorted by start time, with array-backed start/end times for bisection.
+    '''
+
+    def __init__(self, cues):
+        # Bisection needs the starts in order; the sort is stable for equal starts
+        self.cues = sorted(cues, key=lambda c: c.start)
+        self.starts = array('d', (c.start for c in self.cues))
+        self.ends = array('d', (c.end for c in self.cues))
+        # Running maximum of the end times, so range queries stay correct even if cues overlap
+        self._max_ends = array('d')
+        max_end = float('-inf')
+        for end in self.ends:
+            max_end = max(max_end, end)
+            self._max_ends.append(max_end)
+        self._sentence_ends = array('d', sorted(
+            c.end for c in self.cues if SENTENCE_END.search(" ".join(c.text.split('\n')).strip())
+        ))
+
+    def __len__(self):
+        return len(self.cues)
+
+    @classmethod
+    def from_whisper_result(cls, result):
+        '''
+        Build cues from a Whisper result, splitting each segment into grouped words
+        spread evenly over the segment duration.
+        '''
+        cues = []
+        for seg in result["segments"]:
+            start = seg['start']
+            end = seg['end']
+            words = seg['text'].strip().split()
+            if not words:
+                continue
+            grouped = group_words_func(words)
+            group_duration = (end - start) / len(grouped)
+            for j, chunk in enumerate(grouped):
+                chunk_start = start + j * group_duration
+                chunk_end = min(start + (j + 1) * group_duration, end)
+                # Millisecond precision, as if read back from the SRT file
+                cues.append(Cue(round(chunk_start, 3), round(chunk_end, 3), chunk))
+        return cls(cues)
+
+    @classmethod
+    def from_srt_text(cls, text):
+        '''Parse SRT text into a CueStore.'''
+        cues = []
+        for entry in re.split(r'\n\s*\n', text):
+            lines = entry.strip().split('\n')
+            if len(lines) < 2 or '-->' not in lines[1]:
+                continue
+            start_str, end_str = [x.strip() for x in lines[1].split('-->')]
+            cues.append(Cue(parse_srt_time(start_str), parse_srt_time(end_str), "\n".join(l.rstrip() for l in lines[2:])))
+        return cls(cues)
+
+    @classmethod
+    def from_srt(cls, srt_path):
+        '''Read and parse an SRT file into a CueStore.'''
+        with open(srt_path, encoding="utf-8") as f:
+            return cls.from_srt_text(f.read())
+
+    def range(self, start_time, end_time):
+        '''Cues overlapping ]start_time, end_time[, in order.'''
+        lo = bisect_right(self._max_ends, start_time)
+        hi = bisect_left(self.starts, end_time)
+        return [self.cues[i] for i in range(lo, hi) if self.ends[i] > start_time]
+
+    def split_points(self, min_duration: float = 60.0) -> List[float]:
+        '''
+        Split points (in seconds) at sentence ends, each at least min_duration after the previous one.
+        '''
+        split_points = []
+        last_split = 0.0
+        while True:
+            i = bisect_left(self._sentence_ends, last_split + min_duration)
+            if i >= len(self._sentence_ends):
+                return split_points
+            last_split = self._sentence_ends[i]
+            split_points.append(last_split)
+
+    def to_srt(self, start_time=0.0, end_time=float('inf')):
+        '''SRT text of the cues within [start_time, end_time], rebased so the clip starts at 0.'''
+        parts = []
+        for idx, cue in enumerate(self.range(start_time, end_time), 1):
+            new_s = max(cue.start, start_time) - start_time
+            new_e = min(cue.end, end_time) - start_time
+            text = cue.text + "\n" if cue.text else ""
+            parts.append(f"{idx}\n{format_time(new_s)} --> {format_time(new_e)}\n{text}\n")
+        return "".join(parts)
+
+    def transcript(self, start_time=0.0, end_time=float('inf')):
+        '''Transcript of the cues within [start_time, end_time], one cue per line.'''
+        lines = []
+        for cue in self.range(start_time, end_time):
+            line = cue.text.split('\n', 1)[0].strip()
+            if line:
+                lines.append(line + '\n')
+        return "".join(lines)
+
+    def write_srt(self, out_path, start_time=0.0, end_time=float('inf')):
+        with open(out_path, 'w', encoding='utf-8') as f:
+            f.write(self.to_srt(start_time, end_time))
+        return out_path
+
+    def write_transcript(self, out_path, start_time=0.0, end_time=float('inf')):
+        with open(out_path, 'w', encoding='utf-8') as f:
+            f.write(self.transcript(start_time, end_time))
+        return out_path
@@ -0,0 +1,183 @@
+"""
+download_cache.py
+Cache of downloaded videos keyed by (video ID, format selector).
+- Stable file names: <video id>_<format hash>.<ext>, no title-based collisions
+- JSON index with metadata (title, duration, source), size and SHA-256
+- Hits are answered from the index without any network access
+- Disk quota with eviction of the least recently used files
+- Index shared by concurrent processes (file lock); files held by a job are never evicted
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+
+from file_lock import locked, write_json_atomic
+
+CACHE_DIR = os.path.join("downloads", "cache")
+MAX_CACHE_BYTES = 20 * 1024 ** 3
+INDEX_FILE = "index.json"
+# A hold not released (e.g. crashed process) stops protecting the file after this
+HOLD_SECONDS = 12 * 60 * 60
+
+_held = {}  # cached path -> [(cache_dir, key, hold token)] taken by this process
+_held_lock = threading.Lock()
+
+
+def cache_key(video_id, format_selector):
+    return f"{video_id}_{hashlib.sha256(format_selector.encode('utf-8')).hexdigest()[:12]}"
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_index(cache_dir=CACHE_DIR):
+    path = os.path.join(cache_dir, INDEX_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_index(index, cache_dir=CACHE_DIR):
+    '''Write the cache index atomically (call with the index locked, see _locked_index).'''
+    write_json_atomic(os.path.join(cache_dir, INDEX_FILE), index, indent=2)
+
+
+def _locked_index(cache_dir):
+    '''Lock on the index shared by all the threads and processes using cache_dir.'''
+    return locked(os.path.join(cache_dir, INDEX_FILE))
+
+
+def _hold(index, key, path, cache_dir):
+    '''Record a hold on index[key] for this process (the index must be locked and saved after).'''
+    token = uuid.uuid4().hex
+    index[key].setdefault("holds", {})[token] = time.time() + HOLD_SECONDS
+    with _held_lock:
+        _held.setdefault(path, []).append((cache_dir, key, token))
+
+
+def is_held(entry, now=None):
+    now = now or time.time()
+    return any(expires > now for expires in entry.get("holds", {}).values())
+
+
+def hold(path, cache_dir=CACHE_DIR):
+    '''
+    Protect an already cached file (e.g. the source of a resumed job) from eviction
+    until release(path). Returns False when path is not in the cache.
+    '''
+    file_name = os.path.basename(path)
+    with _locked_index(cache_dir):
+        index = load_index(cache_dir)
+        key = next((key for key, entry in index.items() if entry["file"] == file_name), None)
+        if key is None:
+            return False
+        _hold(index, key, path, cache_dir)
+        save_index(index, cache_dir)
+    return True
+
+
+def release(path):
+    '''Release one hold this process took on the cached file path (no-op if none).'''
+    with _held_lock:
+        holds = _held.get(path)
+        if not holds:
+            return
+        cache_dir, key, token = holds.pop()
+        if not holds:
+            del _held[path]
+    with _locked_index(cache_dir):
+        index = load_index(cache_dir)
+        entry = index.get(key)
+        if entry and entry.get("holds", {}).pop(token, None) is not None:
+            save_index(index, cache_dir)
+
+
+def lookup(video_id, format_selector, verify=False, cache_dir=CACHE_DIR, hold=False):
+    '''
+    Path of the cached download, or None on a miss.
+    The file must still exist with its recorded size (and checksum if verify);
+    otherwise the entry is dropped.
+    hold: protect the file from eviction until release(path) (or HOLD_SECONDS).
+    '''
+    key = cache_key(video_id, format_selector)
+    with _locked_index(cache_dir):
+        index = load_index(cache_dir)
+        entry = index.get(key)
+        if entry is None:
+            return None
+        path = os.path.join(cache_dir, entry["file"])
+        valid = os.path.exists(path) and os.path.getsize(path) == entry["size"]
+        if valid and verify:
+            valid = file_sha256(path) == entry["sha256"]
+        if not valid:
+            del index[key]
+        else:
+            entry["last_used"] = time.time()
+            if hold:
+                _hold(index, key, path, cache_dir)
+        save_index(index, cache_dir)
+    return path if valid else None
+
+
+def store(video_id, format_selector, path, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES, hold=False, **metadata):
+    '''
+    Move a finished download into the cache, record it and evict old entries above
+    max_bytes. Returns the cached path (the caller must not delete it).
+    hold: protect the file from eviction until release(path) (or HOLD_SECONDS).
+    '''
+    key = cache_key(video_id, format_selector)
+    os.makedirs(cache_dir, exist_ok=True)
+    file_name = key + os.path.splitext(path)[1]
+    cached_path = os.path.join(cache_dir, file_name)
+    shutil.move(path, cached_path)
+    entry = dict(
+        metadata,
+        video_id=video_id,
+        format=format_selector,
+        file=file_name,
+        size=os.path.getsize(cached_path),
+        sha256=file_sha256(cached_path),
+        created=time.time(),
+        last_used=time.time()
+    )
+    with _locked_index(cache_dir):
+        index = load_index(cache_dir)
+        index[key] = entry
+        if hold:
+            _hold(index, key, cached_path, cache_dir)
+        evict(index, cache_dir, max_bytes, keep=key)
+        save_index(index, cache_dir)
+    return cached_path
+
+
+def evict(index, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES, keep=None):
+    '''
+    Delete the least recently used files (except `keep` and held files) until the
+    cache fits in max_bytes. Expired holds are dropped.
+    '''
+    now = time.time()
+    for entry in index.values():
+        if "holds" in entry:
+            entry["holds"] = {token: expires for token, expires in entry["holds"].items() if expires > now}
+    total = sum(entry["size"] for entry in index.values())
+    for key, entry in sorted(index.items(), key=lambda item: item[1]["last_used"]):
+        if total <= max_bytes:
+            break
+        if key == keep or is_held(entry, now):
+            continue
+        path = os.path.join(cache_dir, entry["file"])
+        if os.path.exists(path):
+            os.remove(path)
+        del index[key]
+        total -= entry["size"]
@@ -0,0 +1,72 @@
+"""
+file_lock.py
+Sharing JSON state files between processes (e.g. a scheduled batch and the CLI).
+- Exclusive lock on a `<path>.lock` file, held across read-modify-write cycles
+  (msvcrt on Windows, fcntl elsewhere), or tried without waiting (LockHeld)
+- Atomic writes through a unique temporary file in the same directory
+"""
+
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+    import fcntl
+
+
+class LockHeld(Exception):
+    '''Raised by locked(path, blocking=False) when someone else holds the lock.'''
+
+
+@contextmanager
+def locked(path, blocking=True):
+    '''
+    Hold an exclusive lock on path (through path + ".lock") for the whole block.
+    blocking=False: raise LockHeld instead of waiting when the lock is taken.
+    '''
+    lock_path = path + ".lock"
+    os.makedirs(os.path.dirname(lock_path) or ".", exist_ok=True)
+    with open(lock_path, "a+b") as f:
+        if msvcrt:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:  # LK_LOCK gives up after 10 s
+                    if not blocking:
+                        raise LockHeld(path) from None
+                    time.sleep(0.1)
+        else:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise LockHeld(path) from None
+        try:
+            yield
+        finally:
+            if msvcrt:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def write_json_atomic(path, data, **dump_options):
+    '''Write data as JSON to path through a unique temporary file, then rename it.'''
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, **dump_options)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,178 @@
+"""
+job_manifest.py
+Per-job manifest on disk, so an interrupted run restarts where it failed.
+- Source URL/ID, produced artifacts, split points
+- Completion state of each step and of each clip
+- Failed jobs (permanent error, or too many attempts) are not resumed
+- A run holds its job's lock, so a second run (e.g. cron) never takes over a job in progress
+- Promotion of a finished preview job to a full render job
+"""
+
+import glob
+import json
+import os
+import time
+
+from file_lock import LockHeld, locked, write_json_atomic
+
+JOBS_DIR = os.path.join("output", "jobs")
+# A job still unfinished after this many runs is left alone by find_incomplete()
+MAX_ATTEMPTS = 3
+RUN_LOCK = "run"  # <job dir>/run.lock, held by the run working on the job
+
+
+class JobManifest:
+    '''
+    JSON manifest of one job (one source video rendered with one workflow).
+    Every change is written to disk immediately and atomically.
+    '''
+
+    def __init__(self, path, data):
+        self.path = path
+        self.data = data
+        self._run_lock = None
+
+    @classmethod
+    def create(cls, kind, source_url, video_id, jobs_dir=JOBS_DIR):
+        '''Start a new job for source_url with the given workflow kind, claimed by this run.'''
+        job_id = f"{kind}_{video_id}_{time.strftime('%Y%m%d-%H%M%S')}"
+        path = os.path.join(jobs_dir, job_id, "manifest.json")
+        manifest = cls(path, {
+            "job_id": job_id,
+            "kind": kind,
+            "source_url": source_url,
+            "video_id": video_id,
+            "status": "running",
+            "attempts": 0,
+            "created": time.time(),
+            "steps": {},
+            "artifacts": {},
+            "split_points": None,
+            "clips": {},
+        })
+        manifest.save()
+        manifest.claim()
+        return manifest
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls(path, json.load(f))
+
+    @classmethod
+    def find_incomplete(cls, kind, jobs_dir=JOBS_DIR, max_attempts=MAX_ATTEMPTS):
+        '''
+        Most recent unfinished job of this kind that is worth resuming, claimed by
+        this run (see claim()), or None.
+        Failed jobs, jobs already run max_attempts times and jobs another run is
+        working on are skipped.
+        '''
+        def resumable(manifest):
+            return (manifest.data["kind"] == kind and manifest.data["status"] == "running"
+                    and manifest.data.get("attempts", 0) < max_attempts)
+
+        manifests = [cls.load(p) for p in glob.glob(os.path.join(jobs_dir, "*", "manifest.json"))]
+        for manifest in sorted(filter(resumable, manifests), key=lambda m: m.data["created"], reverse=True):
+            if manifest.claim():
+                # The run that held the lock may have finished the job since it was read
+                manifest.data = cls.load(manifest.path).data
+                if resumable(manifest):
+                    return manifest
+                manifest.release()
+        return None
+
+    @classmethod
+    def find_latest(cls, kind, jobs_dir=JOBS_DIR, status=None):
+        '''Most recent job of this kind (with this status if given), or None.'''
+        manifests = [cls.load(p) for p in glob.glob(os.path.join(jobs_dir, "*", "manifest.json"))]
+        matching = [m for m in manifests if m.data["kind"] == kind and status in (None, m.data["status"])]
+        return max(matching, key=lambda m: m.data["created"], default=None)
+
+    @classmethod
+    def find(cls, job_id, jobs_dir=JOBS_DIR):
+        return cls.load(os.path.join(jobs_dir, job_id, "manifest.json"))
+
+    @property
+    def job_dir(self):
+        return os.path.dirname(self.path)
+
+    def save(self):
+        self.data["updated"] = time.time()
+        write_json_atomic(self.path, self.data, indent=2)
+
+    def claim(self):
+        '''
+        Take the job's run lock, held until release() or the end of the process.
+        Returns False when another run holds it.
+        '''
+        if self._run_lock is None:
+            run_lock = locked(os.path.join(self.job_dir, RUN_LOCK), blocking=False)
+            try:
+                run_lock.__enter__()
+            except LockHeld:
+                return False
+            self._run_lock = run_lock
+        return True
+
+    def release(self):
+        '''Release the run lock taken by claim() (no-op if not claimed).'''
+        if self._run_lock is not None:
+            run_lock, self._run_lock = self._run_lock, None
+            run_lock.__exit__(None, None, None)
+
+    def step_done(self, name):
+        '''True if the step completed and all the artifacts it produced are still on disk.'''
+        step = self.data["steps"].get(name)
+        return bool(step) and all(os.path.exists(self.data["artifacts"][a]) for a in step["artifacts"])
+
+    def complete_step(self, name, **artifacts):
+        '''Mark a step completed, recording the paths of the artifacts it produced.'''
+        self.data["artifacts"].update(artifacts)
+        self.data["steps"][name] = {"done": time.time(), "artifacts": sorted(artifacts)}
+        self.save()
+
+    def artifact(self, name):
+        return self.data["artifacts"].get(name)
+
+    def set_split_points(self, split_points):
+        self.data["split_points"] = list(split_points)
+        self.save()
+
+    def clip_done(self, index):
+        clip = self.data["clips"].get(str(index))
+        return bool(clip) and clip["status"] == "done" and os.path.exists(clip["output"])
+
+    def complete_clip(self, index, output):
+        self.data["clips"][str(index)] = {"status": "done", "output": output, "done": time.time()}
+        self.save()
+
+    def start_attempt(self):
+        '''Count one more run of this job (see MAX_ATTEMPTS).'''
+        self.data["attempts"] = self.data.get("attempts", 0) + 1
+        self.save()
+
+    def fail(self, error):
+        '''Mark the job as failed for good, so it is not resumed again.'''
+        self.data["status"] = "failed"
+        self.data["error"] = str(error)
+        self.save()
+
+    def finish(self):
+        self.data["status"] = "done"
+        self.save()
+
+    def promote(self, kind, jobs_dir=JOBS_DIR):
+        '''
+        Start a `kind` job on the same source carrying over this job's completed steps,
+        artifacts and split points, but not its clips (e.g. a preview approved for the
+        full render). The artifacts stay in this job's directory.
+        '''
+        manifest = JobManifest.create(kind, self.data["source_url"], self.data["video_id"], jobs_dir)
+        manifest.data.update(
+            steps=dict(self.data["steps"]),
+            artifacts=dict(self.data["artifacts"]),
+            split_points=self.data["split_points"],
+            promoted_from=self.data["job_id"]
+        )
+        manifest.save()
+        return manifest
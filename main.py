@@ -1,220 +1,737 @@
 # main.py
 '''
-Main script for automated YouTube/TikTok clip generation.
+Main script for automated YouTube/TikTok clip generation (command line: cli.py).
 - Download a trending YouTube video
 - Generate subtitles and transcript
 - Split and edit video (with or without satisfying background)
 - Add subtitles to each segment
 - Output ready-to-upload TikTok clips
+- Low resolution previews of both layouts, promoted to a full render once approved
 '''
-from video_downloader import download_video, get_trending_video_url, get_satisfying_video_url
-from video_editor import edit_video, merge_videos, edit_video_blur_background
-from moviepy.editor import VideoFileClip
-from subtitle import generate_subtitles, add_subtitles_to_video, get_split_points_from_srt, slice_srt, slice_transcript
+from video_downloader import download_audio, download_video_stream, mux_audio_video, cached_muxed_video, cache_muxed_video, get_trending_video_url, get_trending_video_urls, video_id_from_url, acquire_satisfying_videos
+from video_editor import edit_video, edit_video_blur_background, render_blur_clip_single_pass, render_blur_track, render_stacked_clip_single_pass, temp_audiofile_for, probe_duration
+from media_readers import READERS
+from subtitle import generate_cue_store, add_subtitles_to_video, build_subtitle_filter
+from clip_executor import run_clip_job, run_clip_jobs
+from pipeline import Stage, StagedPipeline
+from metrics import stage
+from segmenter import segment_video
+from background_library import add_clip, build_background, library_duration
+from job_manifest import JobManifest
+from cue_store import CueStore
+import download_cache
 import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-def split_video():
+SATISFYING_SUBTITLE_STYLE = dict(
+    FONT_SIZE=20,
+    MARGIN_V=130,
+    ALIGN='5',
+    BorderColour='00000000',
+    Coulour='&H0000FFFF',
+    FontName='Arial'
+)
+BLURED_SUBTITLE_STYLE = dict(SATISFYING_SUBTITLE_STYLE, MARGIN_V=70) # bottom center
+# One background library top-up at a time (run_batch prepares backgrounds in several threads)
+_library_lock = threading.Lock()
+# Preview renders: a third of the output size and the fastest x264 preset. Subtitle
+# sizes and margins are scaled with the video by libass, so their placement is kept.
+PREVIEW_RENDER = dict(width=360, height=640, preset="ultrafast")
+PREVIEW_LAYOUTS = ("blur", "satisfying")
+# "subtitles": cut at the sentence ends of the Whisper transcript and burn subtitles;
+# "audio": cut at the audio pauses, without transcription or subtitles
+SPLIT_SOURCES = ("subtitles", "audio")
+
+def download_and_transcribe(video_url, transcript_path, srt_path, outdir="downloads/video", hold=False, **transcribe_options):
     '''
-    Split and edit a trending YouTube video with a satisfying background.
-    Steps:
-    1. Download main and satisfying videos
-    2. Merge satisfying videos
-    3. Generate subtitles and transcript
-    4. Split video by subtitle timing
-    5. Edit and add subtitles to each segment
+    Download the audio track first, then transcribe it while the video stream downloads.
+    The video is fetched in the smallest format covering the 1080px output and muxed
+    with the audio track without re-encoding. The muxed video is kept in the download
+    cache: a video already fetched is transcribed straight from the cache.
+    hold: keep the cached video from being evicted until download_cache.release(video_path).
+    Returns: (video_path, cue_store)
     '''
-    print("▶ Téléchargement de la vidéo principale...")
-    trending_url = get_trending_video_url()
-    video_path = download_video(trending_url, outdir="downloads/video")
-    main_clip = VideoFileClip(video_path)
-    main_duration = main_clip.duration
-    print(f"Durée de la vidéo principale : {main_duration:.2f}s")
-
-    satisfying_dir = "downloads/satisfying"
-    os.makedirs(satisfying_dir, exist_ok=True)
-    satisfying_paths = []
-    total_satisfying_duration = 0.0
-    # Download satisfying videos until total duration matches main video
-    while total_satisfying_duration < main_duration:
-        satisfying_url = get_satisfying_video_url()
-        sat_path = download_video(satisfying_url, outdir=satisfying_dir)
-        try:
-            sat_clip = VideoFileClip(sat_path)
-            satisfying_paths.append(sat_path)
-            total_satisfying_duration += sat_clip.duration
-            print(f"Ajoutée : {sat_path} ({sat_clip.duration:.2f}s), total = {total_satisfying_duration:.2f}s")
-            sat_clip.close()
-        except Exception as e:
-            print(f"Erreur lors de la lecture de {sat_path} : {e}")
-            continue
-
-    merged_satisfying = os.path.join(satisfying_dir, "merged_satisfying.mp4")
-    merge_videos(satisfying_paths, merged_satisfying)
-    print(f"Vidéo satisfaisante fusionnée : {merged_satisfying}")
+    video_path = cached_muxed_video(video_url, hold=hold)
+    if video_path:
+        print(f"Vidéo en cache : {video_path}")
+        return video_path, generate_cue_store(video_path, transcript_path=transcript_path, srt_path=srt_path, **transcribe_options)
+    audio_path = download_audio(video_url, outdir=outdir)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        transcription = pool.submit(
+            generate_cue_store,
+            audio_path,
+            transcript_path=transcript_path,
+            srt_path=srt_path,
+            **transcribe_options
+        )
+        video_only_path = download_video_stream(video_url, outdir=outdir)
+        video_path = os.path.splitext(video_only_path)[0].removesuffix(".video") + ".mp4"
+        mux_audio_video(video_only_path, audio_path, video_path)
+        cue_store = transcription.result()
+    for p in [video_only_path, audio_path]:
+        if os.path.exists(p):
+            os.remove(p)
+    return cache_muxed_video(video_url, video_path, hold=hold), cue_store
 
-    # Clean up individual satisfying videos
-    for p in satisfying_paths:
+def download_source(video_url, outdir="downloads/video", hold=False):
+    '''
+    Download the video without transcribing it (split_source="audio"): same format,
+    mux and download cache as download_and_transcribe().
+    Returns: video_path
+    '''
+    video_path = cached_muxed_video(video_url, hold=hold)
+    if video_path:
+        print(f"Vidéo en cache : {video_path}")
+        return video_path
+    audio_path = download_audio(video_url, outdir=outdir)
+    video_only_path = download_video_stream(video_url, outdir=outdir)
+    video_path = os.path.splitext(video_only_path)[0].removesuffix(".video") + ".mp4"
+    mux_audio_video(video_only_path, audio_path, video_path)
+    for p in [video_only_path, audio_path]:
         if os.path.exists(p):
             os.remove(p)
+    return cache_muxed_video(video_url, video_path, hold=hold)
 
-    os.makedirs("output/video", exist_ok=True)
-    os.makedirs("output/video_sub", exist_ok=True)
-    os.makedirs("output/script", exist_ok=True)
+def build_clip_jobs(cue_store, split_points, segments=None, output_dir="output", **common):
+    '''
+    Build one job description per clip from the split points.
+    Each job carries its clip index, time range, its slice of the subtitles and
+    transcript, output paths and the shared options in `common`.
+    segments: pre-cut main segments from segmenter.segment_video(); their actual cut
+    times replace the split points so the subtitles match the cut.
+    '''
+    jobs = []
+    start_time = 0.0
+    for idx, end_time in enumerate(split_points):
+        segment_path = None
+        if segments:
+            start_time, end_time = segments[idx]["start"], segments[idx]["end"]
+            segment_path = segments[idx]["path"]
+        jobs.append(dict(
+            common,
+            index=idx + 1,
+            start=start_time,
+            end=end_time,
+            segment_path=segment_path,
+            srt_text=cue_store.to_srt(start_time, end_time),
+            transcript_text=cue_store.transcript(start_time, end_time),
+            segment_srt=f"{output_dir}/script/subtitles_{idx+1}.srt",
+            segment_transcript=f"{output_dir}/script/transcript_{idx+1}.txt",
+            subtitled_output=f"{output_dir}/video_sub/final_video_{idx+1}_with_subs.mp4"
+        ))
+        start_time = end_time
+    return jobs
+
+def write_segment_scripts(job):
+    '''Write the clip's SRT and transcript slices to their output files.'''
+    with open(job["segment_srt"], "w", encoding="utf-8") as f:
+        f.write(job["srt_text"])
+    with open(job["segment_transcript"], "w", encoding="utf-8") as f:
+        f.write(job["transcript_text"])
+
+def write_segment(video_path, start, end, output_path):
+    '''Cut [start, end] out of video_path and encode it to output_path.'''
+    with READERS.open(video_path) as source:
+        segment = source.subclip(start, end)
+        segment.write_videofile(output_path, codec="libx264", audio_codec="aac", temp_audiofile=temp_audiofile_for(output_path))
+    return output_path
 
-    print("📝 Génération des sous-titres complets...")
-    full_srt = "output/script/full_subtitles.srt"
-    full_transcript = "output/script/full_transcript.txt"
-    generate_subtitles(
+def clip_subtitle_filter(job):
+    '''Subtitle filter of the clip, or None for a job rendered without subtitles.'''
+    if not job.get("subtitles", True):
+        return None
+    return build_subtitle_filter(job["segment_srt"], **job["subtitle_style"])
+
+def burn_clip_subtitles(job, video_path):
+    '''Burn the clip's subtitles into video_path; without subtitles it becomes the clip as is.'''
+    if not job.get("subtitles", True):
+        shutil.move(video_path, job["subtitled_output"])
+        return job["subtitled_output"]
+    return add_subtitles_to_video(
         video_path=video_path,
-        transcript_path=full_transcript,
-        srt_path=full_srt
+        srt_path=job["segment_srt"],
+        output_video=job["subtitled_output"],
+        **job["subtitle_style"]
     )
 
-    print("🔍 Analyse des sous-titres pour déterminer les points de découpe...")
-    split_points = get_split_points_from_srt(full_srt, min_duration=60.0)
-    if not split_points:
-        raise ValueError("❌ Aucun point de découpe trouvé avec des phrases de plus de 60s.")
+def render_satisfying_clip(job, workdir):
+    '''Render one clip of split_video() inside its own scratch directory.'''
+    with stage("render_clip", clip=job["index"], video=job.get("video_id")):
+        return _render_satisfying_clip(job, workdir)
 
-    print(f"📌 Points de découpe trouvés: {[round(p, 2) for p in split_points]}")
+def _render_satisfying_clip(job, workdir):
+    idx, start_time, end_time = job["index"], job["start"], job["end"]
+    duration = end_time - start_time
+    print(f"✂️ Clip {idx} : {round(start_time, 2)}s -> {round(end_time, 2)}s")
 
-    start_time = 0.0
-    for idx, end_time in enumerate(split_points):
-        duration = end_time - start_time
-        part_output = f"output/video/final_video_{idx+1}.mp4"
-        print(f"✂️ Clip {idx+1} : {round(start_time, 2)}s -> {round(end_time, 2)}s")
-
-        # Extract and save main and satisfying segments
-        main_clip_segment = VideoFileClip(video_path).subclip(start_time, end_time)
-        satisfying_clip_segment = VideoFileClip(merged_satisfying).subclip(start_time, end_time)
-        main_clip_segment_path = f"output/video/main_segment_{idx+1}.mp4"
-        satisfying_clip_segment_path = f"output/video/satisfying_segment_{idx+1}.mp4"
-        main_clip_segment.write_videofile(main_clip_segment_path, codec="libx264", audio_codec="aac")
-        satisfying_clip_segment.write_videofile(satisfying_clip_segment_path, codec="libx264", audio_codec="aac")
-        main_clip_segment.close()
-        satisfying_clip_segment.close()
-
-        # Edit and merge segments
-        edit_video(
-            main_clip_path=main_clip_segment_path,
-            satisfying_clip_path=satisfying_clip_segment_path,
-            output_path=part_output,
-            start=0,
-            duration=duration
+    # Write SRT and transcript for this segment
+    write_segment_scripts(job)
+
+    if job["single_pass"]:
+        # Stack both sources and burn subtitles in one ffmpeg run
+        return render_stacked_clip_single_pass(
+            main_clip_path=job["video_path"],
+            satisfying_clip_path=job["satisfying_path"],
+            output_path=job["subtitled_output"],
+            main_start=start_time,
+            satisfying_start=start_time,
+            duration=duration,
+            subtitle_filter=clip_subtitle_filter(job),
+            **job.get("render_options", {})
         )
 
-        # Slice SRT and transcript for this segment
-        segment_srt = f"output/script/subtitles_{idx+1}.srt"
-        segment_transcript = f"output/script/transcript_{idx+1}.txt"
-        slice_srt(full_srt, segment_srt, start_time, end_time)
-        slice_transcript(full_transcript, segment_transcript, start_time, end_time, segment_srt)
-
-        # Add subtitles to the edited video clip
-        subtitled_output = f"output/video_sub/final_video_{idx+1}_with_subs.mp4"
-        add_subtitles_to_video(
-            video_path=part_output,
-            srt_path=segment_srt,
-            output_video=subtitled_output,
-            FONT_SIZE=20,
-            MARGIN_V=130,
-            ALIGN='5',
-            BorderColour='00000000',
-            Coulour='&H0000FFFF',
-            FontName='Arial'
+    # Extract and save main and satisfying segments
+    main_clip_segment_path = job["segment_path"] or write_segment(job["video_path"], start_time, end_time, os.path.join(workdir, "main_segment.mp4"))
+    satisfying_clip_segment_path = write_segment(job["satisfying_path"], start_time, end_time, os.path.join(workdir, "satisfying_segment.mp4"))
+
+    # Edit and merge segments
+    part_output = os.path.join(workdir, f"final_video_{idx}.mp4")
+    edit_video(
+        main_clip_path=main_clip_segment_path,
+        satisfying_clip_path=satisfying_clip_segment_path,
+        output_path=part_output,
+        start=0,
+        duration=duration
+    )
+
+    # Add subtitles to the edited video clip
+    return burn_clip_subtitles(job, part_output)
+
+def render_blured_clip(job, workdir):
+    '''Render one clip of split_blured_video() inside its own scratch directory.'''
+    with stage("render_clip", clip=job["index"], video=job.get("video_id")):
+        return _render_blured_clip(job, workdir)
+
+def _render_blured_clip(job, workdir):
+    idx, start_time, end_time = job["index"], job["start"], job["end"]
+    duration = end_time - start_time
+    print(f"✂️ Clip {idx} : {round(start_time, 2)}s -> {round(end_time, 2)}s")
+
+    # Write SRT and transcript for this segment
+    write_segment_scripts(job)
+
+    if job["single_pass"]:
+        # Seek, blur, overlay, subtitles and ending in one ffmpeg run
+        return render_blur_clip_single_pass(
+            input_path=job["video_path"],
+            output_path=job["subtitled_output"],
+            start=start_time,
+            duration=duration,
+            subtitle_filter=clip_subtitle_filter(job),
+            blur_quality=job.get("blur_quality", "balanced"),
+            blur_track=job.get("blur_track"),
+            **job.get("render_options", {})
         )
-        # Clean up temp files
-        for f in [main_clip_segment_path, satisfying_clip_segment_path, part_output]:
-            if os.path.exists(f):
-                os.remove(f)
-        start_time = end_time
+
+    # Extract and save main segment
+    main_clip_segment_path = job["segment_path"] or write_segment(job["video_path"], start_time, end_time, os.path.join(workdir, "main_segment.mp4"))
+
+    # Edit with blurred background
+    part_output = os.path.join(workdir, f"final_video_{idx}.mp4")
+    edit_video_blur_background(
+        input_path=main_clip_segment_path,
+        output_path=part_output,
+        duration=duration,
+        workdir=workdir,
+        blur_quality=job.get("blur_quality", "balanced"),
+        blur_track=job.get("blur_track"),
+        blur_start=start_time
+    )
+
+    # Add subtitles to the edited video clip
+    return burn_clip_subtitles(job, part_output)
+
+def render_preview_clip(job, workdir):
+    '''Render one clip of preview_video() with the renderer of its layout.'''
+    render_fn = render_blured_clip if job["layout"] == "blur" else render_satisfying_clip
+    return render_fn(job, workdir)
+
+def prepare_satisfying_background(main_duration, output_path=None, satisfying_dir="downloads/satisfying"):
+    '''
+    Assemble a satisfying background of main_duration seconds, downloading more
+    footage into the background library first if it is too short.
+    Returns the background path.
+    '''
+    os.makedirs(satisfying_dir, exist_ok=True)
+    # Top up the background library until it holds enough footage for the main video.
+    # Serialized, so concurrent callers do not download the same shortfall twice.
+    with _library_lock:
+        missing_duration = main_duration - library_duration()
+        if missing_duration > 0:
+            for video in acquire_satisfying_videos(missing_duration, outdir=satisfying_dir):
+                try:
+                    entry = add_clip(video["path"], tags=["satisfying"], source=video["url"])
+                    print(f"Ajoutée à la bibliothèque : {video['path']} ({entry['duration']:.2f}s)")
+                except Exception as e:
+                    print(f"Erreur lors de la lecture de {video['path']} : {e}")
+                finally:
+                    # The normalized copy is kept in the library, the download is not needed anymore
+                    if os.path.exists(video["path"]):
+                        os.remove(video["path"])
+
+    merged_satisfying = output_path or os.path.join(satisfying_dir, "merged_satisfying.mp4")
+    if build_background(main_duration, merged_satisfying) is None:
+        raise ValueError("❌ Pas assez de vidéos satisfaisantes dans la bibliothèque.")
+    print(f"Vidéo satisfaisante assemblée : {merged_satisfying}")
+    return merged_satisfying
+
+def start_or_resume_job(kind, resume=True):
+    '''
+    Return the manifest of the last unfinished `kind` job when resume is set,
+    otherwise start a new job on the current trending video. Failed jobs, jobs
+    that already failed job_manifest.MAX_ATTEMPTS times and jobs another run is
+    working on are not resumed. The job stays claimed by this run until
+    manifest.release() (or the end of the process).
+    '''
+    manifest = JobManifest.find_incomplete(kind) if resume else None
+    if manifest is not None:
+        print(f"↻ Reprise du job {manifest.data['job_id']} ({manifest.data['source_url']})")
+    else:
+        trending_url = get_trending_video_url()
+        manifest = JobManifest.create(kind, trending_url, video_id_from_url(trending_url))
+    manifest.start_attempt()
+    return manifest
+
+def job_output_dir(manifest):
+    '''
+    Directory of the job's clips (video_sub/), scripts (script/) and segments: each
+    job writes its own files, so resuming a job never picks up another job's clips.
+    '''
+    for d in ["video_sub", "script", "segments"]:
+        os.makedirs(os.path.join(manifest.job_dir, d), exist_ok=True)
+    return manifest.job_dir
+
+def download_and_transcribe_step(manifest, transcript_path, srt_path):
+    '''
+    Download and transcribe the job's source, unless a previous run already did.
+    A copy of the full SRT is kept in the job directory, so a resumed job does not
+    depend on files another job may overwrite.
+    The cached video is held against eviction: release it with
+    download_cache.release(video_path) once the job is done with it.
+    Returns: (video_path, cue_store)
+    '''
+    if manifest.step_done("download_transcribe"):
+        print("↻ Vidéo et sous-titres déjà disponibles, étape ignorée.")
+        download_cache.hold(manifest.artifact("video"))
+        return manifest.artifact("video"), CueStore.from_srt(manifest.artifact("srt"))
+    with stage("download_transcribe"):
+        video_path, cue_store = download_and_transcribe(manifest.data["source_url"], transcript_path, srt_path, hold=True)
+    job_srt = cue_store.write_srt(os.path.join(manifest.job_dir, "full_subtitles.srt"))
+    manifest.complete_step("download_transcribe", video=video_path, srt=job_srt)
+    return video_path, cue_store
+
+def download_step(manifest):
+    '''
+    Download the job's source without transcribing it (split_source="audio"), unless
+    a previous run already did. The cached video is held as in download_and_transcribe_step().
+    '''
+    for step in ["download", "download_transcribe"]:
+        if manifest.step_done(step):
+            print("↻ Vidéo déjà disponible, étape ignorée.")
+            download_cache.hold(manifest.artifact("video"))
+            return manifest.artifact("video")
+    with stage("download"):
+        video_path = download_source(manifest.data["source_url"], hold=True)
+    manifest.complete_step("download", video=video_path)
+    return video_path
+
+def satisfying_background_step(manifest, main_duration):
+    '''Satisfying background of the job, assembled once and then read back from the manifest.'''
+    if manifest.step_done("satisfying_background"):
+        return manifest.artifact("satisfying")
+    with stage("satisfying_background"):
+        merged_satisfying = prepare_satisfying_background(
+            main_duration, os.path.join(manifest.job_dir, "merged_satisfying.mp4")
+        )
+    manifest.complete_step("satisfying_background", satisfying=merged_satisfying)
+    return merged_satisfying
+
+def find_split_points(manifest, cue_store, media_path=None):
+    '''
+    Split points of the job, computed once and then read back from the manifest.
+    media_path: cut at the pauses of its audio instead of the subtitles.
+    '''
+    if manifest.data["split_points"] is not None:
+        return manifest.data["split_points"]
+    if media_path:
+        # Imported here: numpy is only needed by the jobs cut on the audio
+        from audio_analysis import get_split_points_from_audio
+        print("🔍 Analyse des pauses de l'audio pour déterminer les points de découpe...")
+        split_points = get_split_points_from_audio(media_path, min_duration=60.0)
+    else:
+        print("🔍 Analyse des sous-titres pour déterminer les points de découpe...")
+        split_points = cue_store.split_points(min_duration=60.0)
+    if not split_points:
+        # Resuming would find the same transcript: the job is given up
+        error = ValueError("❌ Aucun point de découpe trouvé avec des phrases de plus de 60s.")
+        manifest.fail(error)
+        raise error
+    manifest.set_split_points(split_points)
+    return split_points
+
+def render_pending_clips(manifest, jobs, render_fn, max_workers):
+    '''Render the clips the manifest does not list as done, recording each one as it finishes.'''
+    pending = [job for job in jobs if not manifest.clip_done(job.get("clip_key", job["index"]))]
+    if len(pending) < len(jobs):
+        print(f"↻ {len(jobs) - len(pending)} clips déjà terminés, ignorés.")
+    with stage("render"):
+        run_clip_jobs(
+            pending,
+            render_fn,
+            max_workers=max_workers,
+            on_done=lambda job, _: manifest.complete_clip(job.get("clip_key", job["index"]), job["subtitled_output"])
+        )
+    READERS.close_all()
+    READERS.report(job=manifest.data["job_id"])
+    manifest.finish()
+
+def split_video(single_pass=False, max_workers=1, resume=True, manifest=None):
+    '''
+    Split and edit a trending YouTube video with a satisfying background.
+    Steps:
+    1. Download main video, transcribing its audio while the video stream downloads
+    2. Download satisfying videos if the background library is short
+    3. Assemble the satisfying background from the library
+    4. Split video by subtitle timing
+    5. Edit and add subtitles to each segment
+    single_pass: stack both sources and burn subtitles with a single ffmpeg run per
+    clip, without the intermediate segment files.
+    max_workers: number of clips rendered concurrently (None = based on CPU count).
+    resume: continue the last unfinished job (see job_manifest.py) instead of
+    starting over on a new trending video; finished steps and clips are skipped.
+    manifest: job to run instead (e.g. a preview promoted by promote_preview()).
+    '''
+    print("▶ Téléchargement de la vidéo principale et génération des sous-titres complets...")
+    manifest = manifest or start_or_resume_job("satisfying", resume)
+    output_dir = job_output_dir(manifest)
+    video_path, cue_store = download_and_transcribe_step(
+        manifest, os.path.join(output_dir, "script", "full_transcript.txt"), os.path.join(output_dir, "script", "full_subtitles.srt")
+    )
+    segments = None
+    try:
+        main_duration = probe_duration(video_path)
+        print(f"Durée de la vidéo principale : {main_duration:.2f}s")
+
+        merged_satisfying = satisfying_background_step(manifest, main_duration)
+
+        split_points = find_split_points(manifest, cue_store)
+        print(f"📌 Points de découpe trouvés: {[round(p, 2) for p in split_points]}")
+
+        if not single_pass:
+            print("✂️ Découpage des segments (copie de flux)...")
+            with stage("segment"):
+                segments = segment_video(video_path, split_points, os.path.join(output_dir, "segments"))
+            print(f"📌 Points de découpe effectifs: {[round(seg['end'], 2) for seg in segments]}")
+
+        jobs = build_clip_jobs(
+            cue_store,
+            split_points,
+            segments,
+            output_dir=output_dir,
+            video_path=video_path,
+            satisfying_path=merged_satisfying,
+            single_pass=single_pass,
+            subtitle_style=SATISFYING_SUBTITLE_STYLE
+        )
+        render_pending_clips(manifest, jobs, render_satisfying_clip, max_workers)
+    finally:
+        download_cache.release(video_path)
+        manifest.release()
+        for segment in segments or []:
+            if os.path.exists(segment["path"]):
+                os.remove(segment["path"])
 
     print("✅ Tous les clips ont été traités !")
 
-def split_blured_video():
+def split_blured_video(single_pass=False, max_workers=1, resume=True, blur_quality="balanced", manifest=None, split_source="subtitles"):
     '''
     Split and edit a trending YouTube video with a blurred background.
     Steps:
     1. Download main video
-    2. Generate subtitles and transcript
+    2. Generate subtitles and transcript (while the video stream downloads)
     3. Split video by subtitle timing
     4. Edit and add subtitles to each segment (with blurred background)
+    single_pass: render each clip (seek, blur, overlay, subtitles, ending) with a
+    single ffmpeg run instead of the intermediate moviepy/ffmpeg encodes.
+    max_workers: number of clips rendered concurrently (None = based on CPU count).
+    resume: continue the last unfinished job (see job_manifest.py) instead of
+    starting over on a new trending video; finished steps and clips are skipped.
+    blur_quality: "fast", "balanced" or "high" resolution of the blurred background,
+    which is rendered once for the whole source and shared by the clips.
+    manifest: job to run instead (e.g. a preview promoted by promote_preview()).
+    split_source: "subtitles", or "audio" to cut at the audio pauses without running
+    Whisper; the clips then have no subtitles (see SPLIT_SOURCES).
     '''
-    print("▶ Téléchargement de la vidéo principale...")
-    trending_url = get_trending_video_url()
-    video_path = download_video(trending_url, outdir="downloads/video")
-    main_clip = VideoFileClip(video_path)
-    main_duration = main_clip.duration
-    print(f"Durée de la vidéo principale : {main_duration:.2f}s")
-
-    os.makedirs("output/video", exist_ok=True)
-    os.makedirs("output/video_sub", exist_ok=True)
-    os.makedirs("output/script", exist_ok=True)
-
-    print("📝 Génération des sous-titres complets...")
-    full_srt = "output/script/full_subtitles.srt"
-    full_transcript = "output/script/full_transcript.txt"
-    generate_subtitles(
-        video_path=video_path,
-        transcript_path=full_transcript,
-        srt_path=full_srt
-    )
+    if split_source not in SPLIT_SOURCES:
+        raise ValueError(f"❌ split_source inconnu : {split_source} (attendu : {', '.join(SPLIT_SOURCES)})")
+    manifest = manifest or start_or_resume_job("blur", resume)
+    output_dir = job_output_dir(manifest)
+    if split_source == "audio":
+        print("▶ Téléchargement de la vidéo principale (découpe sur l'audio, sans sous-titres)...")
+        video_path, cue_store = download_step(manifest), CueStore([])
+    else:
+        print("▶ Téléchargement de la vidéo principale et génération des sous-titres complets...")
+        video_path, cue_store = download_and_transcribe_step(
+            manifest, os.path.join(output_dir, "script", "full_transcript.txt"), os.path.join(output_dir, "script", "full_subtitles.srt")
+        )
+    segments = None
+    try:
+        main_duration = probe_duration(video_path)
+        print(f"Durée de la vidéo principale : {main_duration:.2f}s")
 
-    print("🔍 Analyse des sous-titres pour déterminer les points de découpe...")
-    split_points = get_split_points_from_srt(full_srt, min_duration=60.0)
-    if not split_points:
-        raise ValueError("❌ Aucun point de découpe trouvé avec des phrases de plus de 60s.")
-    print(f"📌 Points de découpe trouvés: {[round(p, 2) for p in split_points]}")
+        split_points = find_split_points(manifest, cue_store, video_path if split_source == "audio" else None)
+        print(f"📌 Points de découpe trouvés: {[round(p, 2) for p in split_points]}")
 
-    start_time = 0.0
-    for idx, end_time in enumerate(split_points):
-        duration = end_time - start_time
-        part_output = f"output/video/final_video_{idx+1}.mp4"
-        print(f"✂️ Clip {idx+1} : {round(start_time, 2)}s -> {round(end_time, 2)}s")
-
-        # Extract and save main segment
-        main_clip_segment = VideoFileClip(video_path).subclip(start_time, end_time)
-        main_clip_segment_path = f"output/video/main_segment_{idx+1}.mp4"
-        main_clip_segment.write_videofile(main_clip_segment_path, codec="libx264", audio_codec="aac")
-        main_clip_segment.close()
-
-        # Edit with blurred background
-        edit_video_blur_background(
-            input_path=main_clip_segment_path,
-            output_path=part_output,
-            duration=duration
-        )
+        print("🌫️ Fond flouté de la vidéo complète...")
+        with stage("blur_track"):
+            blur_track = render_blur_track(video_path, os.path.join(manifest.job_dir, f"blur_{blur_quality}.mp4"), blur_quality)
+
+        if not single_pass:
+            print("✂️ Découpage des segments (copie de flux)...")
+            with stage("segment"):
+                segments = segment_video(video_path, split_points, os.path.join(output_dir, "segments"))
+            print(f"📌 Points de découpe effectifs: {[round(seg['end'], 2) for seg in segments]}")
 
-        # Slice SRT and transcript for this segment
-        segment_srt = f"output/script/subtitles_{idx+1}.srt"
-        segment_transcript = f"output/script/transcript_{idx+1}.txt"
-        slice_srt(full_srt, segment_srt, start_time, end_time)
-        slice_transcript(full_transcript, segment_transcript, start_time, end_time, segment_srt)
-
-        # Add subtitles to the edited video clip
-        subtitled_output = f"output/video_sub/final_video_{idx+1}_with_subs.mp4"
-        add_subtitles_to_video(
-            video_path=part_output,
-            srt_path=segment_srt,
-            output_video=subtitled_output,
-            FONT_SIZE=20,
-            MARGIN_V=70, # bottom center
-            ALIGN='5',
-            BorderColour='00000000',
-            Coulour='&H0000FFFF',
-            FontName='Arial'
+        jobs = build_clip_jobs(
+            cue_store,
+            split_points,
+            segments,
+            output_dir=output_dir,
+            video_path=video_path,
+            single_pass=single_pass,
+            subtitle_style=BLURED_SUBTITLE_STYLE,
+            subtitles=split_source != "audio",
+            blur_quality=blur_quality,
+            blur_track=blur_track
         )
-        # Clean up temp files
-        for f in [main_clip_segment_path, part_output]:
-            if os.path.exists(f):
-                os.remove(f)
-        start_time = end_time
+        render_pending_clips(manifest, jobs, render_blured_clip, max_workers)
+    finally:
+        download_cache.release(video_path)
+        manifest.release()
+        for segment in segments or []:
+            if os.path.exists(segment["path"]):
+                os.remove(segment["path"])
 
     print("✅ Tous les clips floutés ont été traités !")
 
+def preview_video(layouts=PREVIEW_LAYOUTS, max_workers=None, resume=True):
+    '''
+    Render a low resolution preview of every clip of a trending video, in each of
+    the layouts ("blur", "satisfying"), to check the split points and the subtitle
+    placement before paying for the full render.
+    The clips are rendered in a single ffmpeg run each, at PREVIEW_RENDER size and
+    preset, with burned subtitles, from the same transcript and split points as the
+    full render. The previews of a layout go to <job dir>/preview_<layout>/video_sub.
+    Approve them with promote_preview(), which reuses the download, transcript,
+    background and split points of the preview job.
+    Returns the preview manifest.
+    '''
+    manifest = start_or_resume_job("preview", resume)
+    print("▶ Téléchargement de la vidéo principale et génération des sous-titres complets...")
+    video_path, cue_store = download_and_transcribe_step(
+        manifest,
+        os.path.join(manifest.job_dir, "full_transcript.txt"),
+        os.path.join(manifest.job_dir, "full_subtitles.srt")
+    )
+    try:
+        split_points = find_split_points(manifest, cue_store)
+        print(f"📌 Points de découpe trouvés: {[round(p, 2) for p in split_points]}")
+
+        jobs = []
+        for layout in layouts:
+            output_dir = os.path.join(manifest.job_dir, f"preview_{layout}")
+            for d in ["video_sub", "script"]:
+                os.makedirs(os.path.join(output_dir, d), exist_ok=True)
+            if layout == "blur":
+                options = dict(subtitle_style=BLURED_SUBTITLE_STYLE, blur_quality="fast")
+            else:
+                options = dict(
+                    subtitle_style=SATISFYING_SUBTITLE_STYLE,
+                    satisfying_path=satisfying_background_step(manifest, probe_duration(video_path))
+                )
+            layout_jobs = build_clip_jobs(
+                cue_store,
+                split_points,
+                output_dir=output_dir,
+                video_path=video_path,
+                single_pass=True,
+                layout=layout,
+                render_options=PREVIEW_RENDER,
+                **options
+            )
+            for job in layout_jobs:
+                job["clip_key"] = f"{layout}_{job['index']}"
+            jobs.extend(layout_jobs)
+
+        print(f"👀 Aperçu de {len(split_points)} clips ({', '.join(layouts)})...")
+        render_pending_clips(manifest, jobs, render_preview_clip, max_workers)
+    finally:
+        download_cache.release(video_path)
+        manifest.release()
+    print(f"✅ Aperçus prêts dans {manifest.job_dir}")
+    return manifest
+
+def promote_preview(layout="blur", job_id=None, single_pass=True, max_workers=None, blur_quality="balanced"):
+    '''
+    Full render of an approved preview (the last preview job unless job_id is given).
+    The new job starts from the preview's download, transcript, split points and
+    satisfying background; only the clips are rendered.
+    '''
+    preview = JobManifest.find(job_id) if job_id else JobManifest.find_latest("preview")
+    if preview is None or preview.data["split_points"] is None:
+        raise ValueError("❌ Aucun aperçu à promouvoir (lancer preview_video() d'abord).")
+    manifest = preview.promote("blur" if layout == "blur" else "satisfying")
+    print(f"⬆ Aperçu {preview.data['job_id']} promu en rendu complet : {manifest.data['job_id']}")
+    if layout == "blur":
+        split_blured_video(single_pass=single_pass, max_workers=max_workers, blur_quality=blur_quality, manifest=manifest)
+    else:
+        split_video(single_pass=single_pass, max_workers=max_workers, manifest=manifest)
+    return manifest
+
+def run_batch(
+    count=3,
+    layout="blur",
+    download_workers=2,
+    transcribe_workers=1,
+    subtitle_workers=1,
+    render_workers=4,
+    upload_workers=1,
+    uploader=None,
+    video_urls=None,
+    split_source="subtitles"
+):
+    '''
+    Process several source videos through a staged pipeline:
+    download -> transcription -> subtitles (split points, per-clip SRT) -> render -> upload.
+    Each stage has its own worker count and a bounded queue in front of it, so the
+    downloads and transcription of one video overlap with the renders of another.
+    layout: "blur" (blurred background) or "satisfying" (stacked satisfying background).
+    uploader: optional callable(clip_path, job) run on each finished clip.
+    video_urls: sources to process (default: the `count` most popular videos).
+    split_source: "subtitles", or "audio" to cut at the audio pauses without running
+    Whisper; the clips then have no subtitles (see SPLIT_SOURCES).
+    Returns the finished clip jobs.
+    '''
+    if split_source not in SPLIT_SOURCES:
+        raise ValueError(f"❌ split_source inconnu : {split_source} (attendu : {', '.join(SPLIT_SOURCES)})")
+    render_fn = render_blured_clip if layout == "blur" else render_satisfying_clip
+    subtitle_style = BLURED_SUBTITLE_STYLE if layout == "blur" else SATISFYING_SUBTITLE_STYLE
+    video_urls = video_urls or get_trending_video_urls(count)
+
+    def download(item):
+        print(f"▶ [{item['video_id']}] Téléchargement...")
+        item["audio_path"] = None
+        item["video_path"] = cached_muxed_video(item["url"], hold=True)
+        if item["video_path"]:
+            print(f"▶ [{item['video_id']}] Vidéo en cache : {item['video_path']}")
+            return item
+        outdir = os.path.join("downloads", "video", item["video_id"])
+        item["audio_path"] = download_audio(item["url"], outdir=outdir)
+        video_only_path = download_video_stream(item["url"], outdir=outdir)
+        video_path = os.path.join(outdir, f"{item['video_id']}.mp4")
+        mux_audio_video(video_only_path, item["audio_path"], video_path)
+        os.remove(video_only_path)
+        item["video_path"] = cache_muxed_video(item["url"], video_path, hold=True)
+        return item
+
+    def transcribe(item):
+        print(f"📝 [{item['video_id']}] {'Analyse audio' if split_source == 'audio' else 'Transcription'}...")
+        for d in ["video_sub", "script"]:
+            os.makedirs(os.path.join(item["output_dir"], d), exist_ok=True)
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            # The shared blurred background is rendered while Whisper runs
+            blur_track = None
+            if layout == "blur":
+                blur_track = pool.submit(render_blur_track, item["video_path"], os.path.join(item["output_dir"], "blur_track.mp4"))
+            if split_source == "audio":
+                # Imported here: numpy is only needed by the jobs cut on the audio
+                from audio_analysis import get_split_points_from_audio
+                item["cue_store"] = CueStore([])
+                item["split_points"] = get_split_points_from_audio(item["audio_path"] or item["video_path"], min_duration=60.0)
+            else:
+                item["cue_store"] = generate_cue_store(
+                    item["audio_path"] or item["video_path"],
+                    transcript_path=os.path.join(item["output_dir"], "script", "full_transcript.txt"),
+                    srt_path=os.path.join(item["output_dir"], "script", "full_subtitles.srt")
+                )
+                item["split_points"] = item["cue_store"].split_points(min_duration=60.0)
+            item["blur_track"] = blur_track.result() if blur_track else None
+        if item["audio_path"]:
+            os.remove(item["audio_path"])
+        return item
+
+    def subtitles(item):
+        split_points = item["split_points"]
+        if not split_points:
+            raise ValueError(f"❌ [{item['video_id']}] Aucun point de découpe trouvé.")
+        print(f"📌 [{item['video_id']}] {len(split_points)} clips : {[round(p, 2) for p in split_points]}")
+        satisfying_path = None
+        if layout != "blur":
+            satisfying_path = prepare_satisfying_background(
+                split_points[-1], os.path.join(item["output_dir"], "merged_satisfying.mp4")
+            )
+        jobs = build_clip_jobs(
+            item["cue_store"],
+            split_points,
+            output_dir=item["output_dir"],
+            video_id=item["video_id"],
+            video_path=item["video_path"],
+            satisfying_path=satisfying_path,
+            single_pass=True,
+            subtitle_style=subtitle_style,
+            subtitles=split_source != "audio",
+            blur_track=item["blur_track"]
+        )
+        for job in jobs:
+            write_segment_scripts(job)
+        return jobs
+
+    def render(job):
+        run_clip_job(render_fn, job)
+        return job
+
+    def upload(job):
+        uploader(job["subtitled_output"], job)
+        return job
+
+    stages = [
+        Stage("download", download, workers=download_workers),
+        Stage("transcribe", transcribe, workers=transcribe_workers),
+        Stage("subtitles", subtitles, workers=subtitle_workers, fan_out=True),
+        Stage("render", render, workers=render_workers, queue_size=render_workers * 2),
+    ]
+    if uploader is not None:
+        stages.append(Stage("upload", upload, workers=upload_workers))
+
+    items = []
+    for url in video_urls:
+        video_id = video_id_from_url(url)
+        if video_id is None:
+            print(f"⚠️ URL ignorée, identifiant de vidéo introuvable : {url}")
+            continue
+        items.append({"url": url, "video_id": video_id, "output_dir": os.path.join("output", "batch", video_id)})
+
+    pipeline = StagedPipeline(stages)
+    try:
+        finished = pipeline.run(items)
+    finally:
+        # The sources stay in the download cache but may now be evicted
+        for item in items:
+            if item.get("video_path"):
+                download_cache.release(item["video_path"])
+    print(f"✅ Lot terminé : {len(finished)} clips, {len(pipeline.errors)} erreurs.")
+    return finished
+
 if __name__ == "__main__":
     '''
     Entry point. Uncomment the workflow you want to run:
     - split_video(): with satisfying background
     - split_blured_video(): with blurred background only
+    - run_batch(): several trending videos through the staged pipeline
+    - preview_video() / promote_preview(): check the clips at low resolution first
     '''
-    # split_video()  # For version with satisfying videos
-    split_blured_video()  # For blurred version without satisfying videos
\ No newline at end of file
+    # split_video(single_pass=True, max_workers=None)  # For version with satisfying videos
+    split_blured_video(single_pass=True, max_workers=None)  # For blurred version without satisfying videos
+    # run_batch(count=5, layout="blur")  # For several videos at once
@@ -0,0 +1,157 @@
+"""
+media_merge.py
+Join video files without re-encoding the ones that already match.
+- Probe each input (codecs, resolution, fps, pixel format, time base, audio layout)
+- Conform mismatched inputs to the target format once; conformed copies are cached
+  (e.g. the ending card, conformed once per output format, even by concurrent workers)
+- Join with the ffmpeg concat demuxer using stream copy
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+import tempfile
+
+from file_lock import locked
+
+CONFORM_DIR = os.path.join("downloads", "conformed")
+
+VIDEO_ENCODERS = {"h264": "libx264", "hevc": "libx265"}
+AUDIO_ENCODERS = {"aac": "aac", "mp3": "libmp3lame", "opus": "libopus"}
+H264_PROFILES = {"Baseline": "baseline", "Constrained Baseline": "baseline", "Main": "main", "High": "high"}
+
+# Used when the first input itself cannot be re-encoded to (unknown codec)
+DEFAULT_SPEC = {"vcodec": "h264", "profile": "High", "pix_fmt": "yuv420p", "acodec": "aac",
+                "sample_rate": 44100, "channels": 2}
+
+
+def probe_spec(path):
+    '''
+    Format of the first video and audio streams of path, as compared by the concat demuxer.
+    Raises ValueError when path has no video stream.
+    '''
+    result = subprocess.run([
+        "ffprobe", "-v", "error",
+        "-show_entries",
+        "stream=codec_type,codec_name,profile,width,height,pix_fmt,r_frame_rate,time_base,sample_rate,channels",
+        "-of", "json",
+        path
+    ], capture_output=True, text=True, check=True)
+    streams = json.loads(result.stdout).get("streams", [])
+    video = next((s for s in streams if s["codec_type"] == "video"), None)
+    if video is None:
+        raise ValueError(f"❌ Aucun flux vidéo dans {path}")
+    audio = next((s for s in streams if s["codec_type"] == "audio"), None)
+    return {
+        "vcodec": video["codec_name"],
+        "profile": video.get("profile"),
+        "width": video["width"],
+        "height": video["height"],
+        "pix_fmt": video.get("pix_fmt"),
+        "fps": video["r_frame_rate"],
+        "time_base": video["time_base"],
+        "acodec": audio["codec_name"] if audio else None,
+        "sample_rate": int(audio["sample_rate"]) if audio else None,
+        "channels": audio["channels"] if audio else None,
+    }
+
+
+def can_encode(spec):
+    return spec["vcodec"] in VIDEO_ENCODERS and (spec["acodec"] is None or spec["acodec"] in AUDIO_ENCODERS)
+
+
+def conform(path, target, cache_dir=CONFORM_DIR):
+    '''
+    Re-encode path to the target format (scaled and padded to its size).
+    The copy is cached per (source file, target format) and reused. Concurrent
+    callers (e.g. clip workers all conforming the ending card) wait for the first
+    one under a file lock instead of encoding the same copy.
+    '''
+    stat = os.stat(path)
+    key = hashlib.sha1(
+        f"{os.path.abspath(path)}|{stat.st_size}|{int(stat.st_mtime)}|{json.dumps(target, sort_keys=True)}".encode()
+    ).hexdigest()[:16]
+    output_path = os.path.join(cache_dir, f"{os.path.splitext(os.path.basename(path))[0]}_{key}.mp4")
+    if os.path.exists(output_path):
+        return output_path
+    with locked(output_path):
+        if not os.path.exists(output_path):
+            _encode_conformed(path, target, output_path)
+    return output_path
+
+
+def _encode_conformed(path, target, output_path):
+    '''Encode the conformed copy through a unique temporary file, then rename it.'''
+    width, height = target["width"], target["height"]
+    command = ["ffmpeg", "-y", "-v", "error", "-i", path]
+    source_has_audio = probe_spec(path)["acodec"] is not None
+    if target["acodec"] and not source_has_audio:
+        command += ["-f", "lavfi", "-i", f"anullsrc=r={target['sample_rate']}:cl=stereo"]
+    command += [
+        "-map", "0:v:0",
+        "-vf", (
+            f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,"
+            f"fps={target['fps']},format={target['pix_fmt']}"
+        ),
+        "-c:v", VIDEO_ENCODERS[target["vcodec"]],
+        "-video_track_timescale", target["time_base"].split("/")[1],
+    ]
+    if target["vcodec"] == "h264" and target.get("profile") in H264_PROFILES:
+        command += ["-profile:v", H264_PROFILES[target["profile"]]]
+    if target["acodec"]:
+        command += [
+            "-map", "0:a:0" if source_has_audio else "1:a:0", "-shortest",
+            "-c:a", AUDIO_ENCODERS[target["acodec"]],
+            "-ar", str(target["sample_rate"]), "-ac", str(target["channels"]),
+        ]
+    else:
+        command += ["-an"]
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(output_path), suffix=".part.mp4")
+    os.close(fd)
+    try:
+        subprocess.run(command + ["-movflags", "+faststart", tmp_path], check=True)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def concat_copy(paths, output_path):
+    '''Join same-format files with the concat demuxer, without re-encoding.'''
+    list_path = output_path + ".txt"
+    with open(list_path, "w", encoding="utf-8") as f:
+        for path in paths:
+            f.write(f"file '{os.path.abspath(path)}'\n")
+    try:
+        subprocess.run([
+            "ffmpeg", "-y", "-v", "error",
+            "-f", "concat", "-safe", "0", "-i", list_path,
+            "-c", "copy",
+            "-movflags", "+faststart",
+            output_path
+        ], check=True)
+    finally:
+        os.remove(list_path)
+    return output_path
+
+
+def merge(video_paths, output_path, cache_dir=CONFORM_DIR):
+    '''
+    Join video_paths into output_path. The first input sets the format; the other
+    inputs are used as is when they match it, or conformed (and cached) otherwise.
+    Only the mismatched inputs are re-encoded.
+    '''
+    specs = [probe_spec(path) for path in video_paths]
+    target = specs[0]
+    parts = list(video_paths)
+    if not can_encode(target):
+        # Nothing can be conformed to this format: bring every input to H.264/AAC
+        target = dict(target, **DEFAULT_SPEC)
+        parts[0] = conform(parts[0], target, cache_dir)
+    for i, spec in enumerate(specs[1:], start=1):
+        if spec != target:
+            parts[i] = conform(parts[i], target, cache_dir)
+    return concat_copy(parts, output_path)
@@ -0,0 +1,179 @@
+"""
+media_readers.py
+Shared moviepy readers.
+- Each source is opened once and shared by all the subclips taken from it
+- Cap on the number of open readers (each one holds an ffmpeg decoder process and its buffers)
+- Open/peak reader counts and peak memory
+- Leak check scoped to one job: readers it checked out and did not release, and
+  moviepy readers opened outside the pool (a bare VideoFileClip) left running
+
+Use `with READERS.open(path) as clip: clip.subclip(...)`. Never close a subclip of a
+shared reader: moviepy subclips share the reader, closing one closes it for everybody.
+"""
+
+import atexit
+import gc
+import os
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from metrics import _usage, log_event
+
+MAX_READERS = 4
+
+
+class ReaderLeak(Exception):
+    '''Readers are still checked out after the work that used them finished.'''
+
+
+class ReaderManager:
+    '''
+    Pool of VideoFileClip readers keyed by file path.
+    A released reader stays open (keep=True) so the next request for the same file
+    reuses it; idle readers are closed, least recently used first, when max_readers
+    are open. When all of them are in use, open() waits for one to be released.
+    '''
+
+    def __init__(self, max_readers=MAX_READERS):
+        self.max_readers = max_readers
+        self._readers = OrderedDict()  # path -> {"clip", "users", "keep"}
+        self._cond = threading.Condition()
+        self._local = threading.local()  # readers checked out by this thread in scope()
+        self.opened_total = 0
+        self.peak_open = 0
+
+    @contextmanager
+    def open(self, path, keep=True):
+        '''
+        Yield the shared VideoFileClip of path.
+        keep=False closes it as soon as nobody uses it (e.g. temporary files about to be deleted).
+        '''
+        key = os.path.abspath(path)
+        with self._cond:
+            while key not in self._readers and not self._make_room():
+                self._cond.wait()
+            entry = self._readers.get(key)
+            if entry is None:
+                from moviepy.editor import VideoFileClip
+                entry = self._readers[key] = {"clip": VideoFileClip(path), "users": 0, "keep": keep}
+                self.opened_total += 1
+                self.peak_open = max(self.peak_open, len(self._readers))
+            self._readers.move_to_end(key)
+            entry["users"] += 1
+            entry["keep"] = entry["keep"] and keep
+        checkouts = getattr(self._local, "checkouts", None)
+        if checkouts is not None:
+            checkouts.append(key)
+        try:
+            yield entry["clip"]
+        finally:
+            if checkouts is not None:
+                checkouts.remove(key)
+            with self._cond:
+                entry["users"] -= 1
+                if entry["users"] == 0 and not entry["keep"]:
+                    self._close(key)
+                self._cond.notify_all()
+
+    def _make_room(self):
+        '''Close idle readers until one more can be opened. False if all are in use.'''
+        for key in list(self._readers):
+            if len(self._readers) < self.max_readers:
+                break
+            if self._readers[key]["users"] == 0:
+                self._close(key)
+        return len(self._readers) < self.max_readers
+
+    def _close(self, key):
+        entry = self._readers.pop(key)
+        entry["clip"].close()
+
+    def close_all(self):
+        '''Close every idle reader; readers still in use are left open (see check_leaks).'''
+        with self._cond:
+            for key in [k for k, entry in self._readers.items() if entry["users"] == 0]:
+                self._close(key)
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            in_use = sum(1 for entry in self._readers.values() if entry["users"])
+            open_readers = len(self._readers)
+        _, peak_rss = _usage()
+        fd_dir = "/proc/self/fd"
+        return {
+            "open": open_readers,
+            "in_use": in_use,
+            "peak_open": self.peak_open,
+            "opened_total": self.opened_total,
+            "open_fds": len(os.listdir(fd_dir)) if os.path.isdir(fd_dir) else None,
+            "peak_rss_bytes": peak_rss,
+        }
+
+    def report(self, **labels):
+        '''Log the reader statistics as a structured event and return them.'''
+        stats = self.stats()
+        log_event("media_readers", **stats, **labels)
+        return stats
+
+    def unmanaged_readers(self):
+        '''moviepy video readers still running that do not belong to a pooled clip.'''
+        ffmpeg_reader = sys.modules.get("moviepy.video.io.ffmpeg_reader")
+        if ffmpeg_reader is None:
+            return []
+        with self._cond:
+            managed = {id(getattr(entry["clip"], "reader", None)) for entry in self._readers.values()}
+            return [
+                obj for obj in gc.get_objects()
+                if isinstance(obj, ffmpeg_reader.FFMPEG_VideoReader)
+                and getattr(obj, "proc", None) is not None and id(obj) not in managed
+            ]
+
+    @contextmanager
+    def scope(self):
+        '''
+        Leak check around one job: when the block ends, raise ReaderLeak if readers
+        this thread checked out in it are still out, or if moviepy readers opened
+        outside the pool meanwhile are still running. Readers other threads are
+        using do not count, so concurrent jobs can each check their own.
+        '''
+        checkouts = []
+        previous = getattr(self._local, "checkouts", None)
+        self._local.checkouts = checkouts
+        before = weakref.WeakSet(self.unmanaged_readers())
+        try:
+            yield
+        finally:
+            self._local.checkouts = previous
+        unmanaged = [reader for reader in self.unmanaged_readers() if reader not in before]
+        if checkouts or unmanaged:
+            raise ReaderLeak(
+                f"Lecteurs vidéo non libérés : {checkouts}, "
+                f"{len(unmanaged)} lecteur(s) ouvert(s) hors de READERS"
+            )
+
+    def check_leaks(self):
+        '''
+        Raise ReaderLeak if any reader of the process is still checked out or running
+        outside the pool. Only meaningful when no other thread is rendering; use
+        scope() around a job otherwise.
+        '''
+        with self._cond:
+            leaked = [key for key, entry in self._readers.items() if entry["users"]]
+        unmanaged = self.unmanaged_readers()
+        if leaked or unmanaged:
+            raise ReaderLeak(f"Lecteurs vidéo non libérés : {leaked}, {len(unmanaged)} lecteur(s) ouvert(s) hors de READERS")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close_all()
+
+
+# Readers of this process (each clip worker process has its own)
+READERS = ReaderManager()
+atexit.register(READERS.close_all)
@@ -0,0 +1,326 @@
+"""
+metrics.py
+Per-stage timing instrumentation and ffmpeg progress metrics.
+- Wall time, CPU time and peak RSS per stage and per clip
+- Live fps/speed parsed from ffmpeg `-progress` output, one gauge per render
+- Structured JSON log lines and a Prometheus textfile (node_exporter textfile collector)
+
+CPU time and RSS are measured for the whole process: the CPU time of a stage is the
+process CPU used while it ran, and its peak RSS is sampled while it runs. The ffmpeg
+and moviepy child processes, which do the rendering, are reported apart: their total
+RSS is sampled too (Linux /proc), and the peak of the largest child that exited during
+the stage (RUSAGE_CHILDREN) covers children too short-lived to be sampled. Stages
+running at the same time in threads (run_batch) are not separated, each one counts
+the others' work too; thread_cpu_s is the CPU time of the stage's own thread only.
+
+Configured with environment variables, so clip worker processes inherit it:
+    CLIPGEN_METRICS_LOG=output/metrics.jsonl   JSON lines (default: stderr)
+    CLIPGEN_PROM_FILE=/var/lib/node_exporter/clipgen.prom
+"""
+
+import glob
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+METRICS_LOG_ENV = "CLIPGEN_METRICS_LOG"
+PROM_FILE_ENV = "CLIPGEN_PROM_FILE"
+
+_lock = threading.Lock()
+_stages = {}
+_ffmpeg = {}
+_last_prom_write = 0.0
+# Labels of the innermost running stage, added to the ffmpeg progress of that stage
+_stage_labels = ContextVar("stage_labels", default={})
+RSS_SAMPLE_INTERVAL = 0.2
+
+
+def _maxrss_bytes(usage):
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    return usage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+
+
+def _usage():
+    '''(cpu seconds, peak rss bytes) of this process and its finished children.'''
+    if resource is None:
+        return time.process_time(), None
+    self_usage = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = self_usage.ru_utime + self_usage.ru_stime + children.ru_utime + children.ru_stime
+    return cpu, max(_maxrss_bytes(self_usage), _maxrss_bytes(children))
+
+
+def finished_children_peak_rss():
+    '''Peak RSS of the largest child process waited for so far, in bytes (None on Windows).'''
+    if resource is None:
+        return None
+    return _maxrss_bytes(resource.getrusage(resource.RUSAGE_CHILDREN))
+
+
+def _rss(pid="self"):
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def current_rss():
+    '''Resident memory of this process now, in bytes (None where unknown: only read on Linux).'''
+    return _rss()
+
+
+def _descendants(pid):
+    '''PIDs of the running children of pid and of their own children (Linux /proc).'''
+    found = []
+    pending = [pid]
+    while pending:
+        for path in glob.glob(f"/proc/{pending.pop()}/task/*/children"):
+            try:
+                with open(path) as f:
+                    children = [int(child) for child in f.read().split()]
+            except (OSError, ValueError):
+                continue
+            found.extend(children)
+            pending.extend(children)
+    return found
+
+
+def children_rss():
+    '''Total resident memory of the running child processes (ffmpeg...), in bytes (None where unknown).'''
+    if current_rss() is None:
+        return None
+    return sum(rss for rss in map(_rss, _descendants(os.getpid())) if rss is not None)
+
+
+class _RssSampler:
+    '''
+    Highest resident memory of the process, and total of its child processes, seen
+    while a stage runs, sampled in a thread.
+    '''
+
+    def __init__(self, interval=RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.start_rss = self.peak = current_rss()
+        self.peak_children = children_rss()
+        self._stop = threading.Event()
+        self._thread = None
+        if self.start_rss is not None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self):
+        rss = current_rss()
+        if rss is not None:
+            self.peak = max(self.peak, rss)
+        rss = children_rss()
+        if rss is not None:
+            self.peak_children = max(self.peak_children or 0, rss)
+
+    def stop(self):
+        '''Stop sampling. Returns (start rss, peak rss, peak rss of the children).'''
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._sample()
+        return self.start_rss, self.peak, self.peak_children
+
+
+def log_event(event, **fields):
+    '''Write one structured JSON log line.'''
+    record = {"ts": round(time.time(), 3), "event": event, "pid": os.getpid(), **fields}
+    line = json.dumps(record, ensure_ascii=False, default=str)
+    path = os.environ.get(METRICS_LOG_ENV)
+    with _lock:
+        if path:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        else:
+            print(line, file=sys.stderr, flush=True)
+
+
+@contextmanager
+def stage(name, **labels):
+    '''
+    Time a pipeline stage: `with stage("render", clip=3): ...`.
+    Records wall time, process CPU time used meanwhile (including finished ffmpeg
+    child processes), the stage thread's CPU time, the peak RSS sampled during the
+    stage and the peak RSS of its child processes (see the module docstring for
+    how children are measured and for stages running concurrently).
+    The labels are also attached to the ffmpeg progress of commands run in the stage.
+    '''
+    cpu_start, _ = _usage()
+    finished_children_start = finished_children_peak_rss()
+    thread_cpu_start = time.thread_time()
+    wall_start = time.perf_counter()
+    sampler = _RssSampler()
+    token = _stage_labels.set(dict(_stage_labels.get(), **labels))
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        _stage_labels.reset(token)
+        wall = time.perf_counter() - wall_start
+        thread_cpu = time.thread_time() - thread_cpu_start
+        cpu_end, _ = _usage()
+        cpu = cpu_end - cpu_start
+        start_rss, peak_rss, peak_children_rss = sampler.stop()
+        finished_children = finished_children_peak_rss()
+        if finished_children is not None and finished_children > finished_children_start:
+            # A child that exited during the stage peaked higher than any child before it
+            peak_children_rss = max(peak_children_rss or 0, finished_children)
+        with _lock:
+            totals = _stages.setdefault(name, {"runs": 0, "errors": 0, "wall": 0.0, "cpu": 0.0,
+                                               "peak_rss": 0, "peak_children_rss": 0})
+            totals["runs"] += 1
+            totals["errors"] += status == "error"
+            totals["wall"] += wall
+            totals["cpu"] += cpu
+            totals["peak_rss"] = max(totals["peak_rss"], peak_rss or 0)
+            totals["peak_children_rss"] = max(totals["peak_children_rss"], peak_children_rss or 0)
+        log_event("stage", stage=name, status=status, wall_s=round(wall, 3), cpu_s=round(cpu, 3),
+                  thread_cpu_s=round(thread_cpu, 3), start_rss_bytes=start_rss, peak_rss_bytes=peak_rss,
+                  peak_children_rss_bytes=peak_children_rss, **labels)
+        write_prometheus_textfile(min_interval=0)
+
+
+def _parse_progress(stream, name, labels, on_progress):
+    '''Read `key=value` blocks from ffmpeg -progress output and publish fps/speed (gauges keyed by name and labels).'''
+    key = _gauge_key(name, labels)
+    block = {}
+    last_log = 0.0
+    for line in stream:
+        field, _, value = line.strip().partition("=")
+        if not field:
+            continue
+        block[field] = value
+        if field != "progress":
+            continue
+        fps = _to_float(block.get("fps"))
+        speed = _to_float(block.get("speed", "").rstrip("x"))
+        out_time = _to_float(block.get("out_time_us")) / 1e6 if block.get("out_time_us") else None
+        now = time.time()
+        with _lock:
+            _ffmpeg[key] = {"fps": fps, "speed": speed, "out_time": out_time, "updated": now}
+        if on_progress:
+            on_progress(dict(block))
+        if value == "end" or now - last_log >= 10:
+            last_log = now
+            log_event("ffmpeg_progress", name=name, fps=fps, speed=speed, out_time_s=out_time,
+                      state=value, **labels)
+            write_prometheus_textfile()
+        block = {}
+
+
+def _gauge_key(name, labels):
+    return (("name", name),) + tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def _prom_labels(key):
+    '''Prometheus label set from (label, value) pairs, values escaped.'''
+    escaped = (
+        (label, value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n"))
+        for label, value in key
+    )
+    return ",".join(f'{label}="{value}"' for label, value in escaped)
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def run_ffmpeg(command, name="ffmpeg", check=False, on_progress=None, **labels):
+    '''
+    Run an ffmpeg command like subprocess.run(), reporting its progress.
+    `-progress pipe:1 -nostats` is added so fps, speed and output time can be
+    followed live (JSON log every 10s, Prometheus gauges); stderr is left as is.
+    The labels of the current stage (clip, video...) are added to `labels`, so
+    concurrent renders get their own gauges; they are dropped once ffmpeg exits.
+    '''
+    labels = dict(_stage_labels.get(), **labels)
+    command = [command[0], "-progress", "pipe:1", "-nostats", *command[1:]]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    try:
+        _parse_progress(process.stdout, name, labels, on_progress)
+    finally:
+        returncode = process.wait()
+        with _lock:
+            _ffmpeg.pop(_gauge_key(name, labels), None)
+        write_prometheus_textfile()
+    if check and returncode != 0:
+        raise subprocess.CalledProcessError(returncode, command)
+    return subprocess.CompletedProcess(command, returncode)
+
+
+def write_prometheus_textfile(path=None, min_interval=1.0):
+    '''
+    Write the stage totals and last ffmpeg progress in Prometheus text format.
+    Only the main process writes it: clip worker processes report through the JSON log.
+    '''
+    global _last_prom_write
+    path = path or os.environ.get(PROM_FILE_ENV)
+    if not path or multiprocessing.parent_process() is not None:
+        return
+    now = time.time()
+    with _lock:
+        if now - _last_prom_write < min_interval:
+            return
+        _last_prom_write = now
+        stages = {k: dict(v) for k, v in _stages.items()}
+        ffmpeg = {k: dict(v) for k, v in _ffmpeg.items()}
+
+    lines = []
+
+    def metric(metric_name, kind, help_text, samples):
+        lines.append(f"# HELP {metric_name} {help_text}")
+        lines.append(f"# TYPE {metric_name} {kind}")
+        for label_value, value in samples:
+            if value is not None:
+                lines.append(f'{metric_name}{{{label_value}}} {value}')
+
+    metric("clipgen_stage_runs_total", "counter", "Completed runs per stage.",
+           [(f'stage="{s}"', v["runs"]) for s, v in stages.items()])
+    metric("clipgen_stage_errors_total", "counter", "Failed runs per stage.",
+           [(f'stage="{s}"', v["errors"]) for s, v in stages.items()])
+    metric("clipgen_stage_wall_seconds_total", "counter", "Wall time spent per stage.",
+           [(f'stage="{s}"', round(v["wall"], 3)) for s, v in stages.items()])
+    metric("clipgen_stage_cpu_seconds_total", "counter", "Process CPU time (incl. children) used while each stage ran.",
+           [(f'stage="{s}"', round(v["cpu"], 3)) for s, v in stages.items()])
+    metric("clipgen_stage_peak_rss_bytes", "gauge", "Peak process resident memory sampled during a stage.",
+           [(f'stage="{s}"', v["peak_rss"]) for s, v in stages.items()])
+    metric("clipgen_stage_peak_children_rss_bytes", "gauge",
+           "Peak resident memory of the child processes (ffmpeg...) during a stage.",
+           [(f'stage="{s}"', v["peak_children_rss"]) for s, v in stages.items()])
+    metric("clipgen_ffmpeg_fps", "gauge", "Last reported ffmpeg encoding fps.",
+           [(_prom_labels(k), v["fps"]) for k, v in ffmpeg.items()])
+    metric("clipgen_ffmpeg_speed", "gauge", "Last reported ffmpeg speed (x realtime).",
+           [(_prom_labels(k), v["speed"]) for k, v in ffmpeg.items()])
+    metric("clipgen_ffmpeg_last_progress_timestamp_seconds", "gauge",
+           "Time of the last ffmpeg progress report (stall detection).",
+           [(_prom_labels(k), round(v["updated"], 3)) for k, v in ffmpeg.items()])
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
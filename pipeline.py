@@ -0,0 +1,108 @@
+"""
+pipeline.py
+Staged pipeline scheduler for batch processing.
+- Each stage has its own worker threads
+- Bounded queues between stages, so a fast stage cannot run far ahead of a slow one
+- Stages may fan out (one video -> several clips)
+- Failed items are reported without stopping the other items
+"""
+
+import queue
+import threading
+import traceback
+
+import metrics
+
+_DONE = object()
+
+
+class Stage:
+    '''
+    One pipeline stage.
+    fn(item) returns the item passed to the next stage, or an iterable of items
+    when fan_out is True. Returning None drops the item.
+    '''
+
+    def __init__(self, name, fn, workers=1, queue_size=4, fan_out=False):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.queue_size = queue_size
+        self.fan_out = fan_out
+
+
+class StagedPipeline:
+    '''Run items through a list of stages, each stage working concurrently with the others.'''
+
+    def __init__(self, stages):
+        self.stages = stages
+        self.errors = []
+        self._lock = threading.Lock()
+
+    def _worker(self, stage, inbox, outbox, remaining):
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                break
+            try:
+                with metrics.stage(stage.name):
+                    result = stage.fn(item)
+            except Exception as e:
+                with self._lock:
+                    self.errors.append((stage.name, item, e))
+                print(f"❌ Étape {stage.name} en échec : {e}")
+                traceback.print_exc()
+                continue
+            if result is None:
+                continue
+            for out in (result if stage.fan_out else [result]):
+                outbox.put(out)
+        # The last worker of a stage tells every worker of the next stage to stop
+        with self._lock:
+            remaining[stage.name] -= 1
+            last = remaining[stage.name] == 0
+        if last:
+            for _ in range(self._next_workers(stage)):
+                outbox.put(_DONE)
+
+    def _next_workers(self, stage):
+        index = self.stages.index(stage)
+        if index + 1 < len(self.stages):
+            return self.stages[index + 1].workers
+        return 1
+
+    def run(self, items):
+        '''
+        Feed items into the first stage and wait until every stage has drained.
+        Returns the items produced by the last stage; failures are in self.errors.
+        '''
+        queues = [queue.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        results_queue = queue.Queue()
+        remaining = {stage.name: stage.workers for stage in self.stages}
+        threads = []
+        for i, stage in enumerate(self.stages):
+            outbox = queues[i + 1] if i + 1 < len(self.stages) else results_queue
+            for n in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._worker,
+                    args=(stage, queues[i], outbox, remaining),
+                    name=f"{stage.name}-{n}",
+                    daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+
+        for item in items:
+            queues[0].put(item)
+        for _ in range(self.stages[0].workers):
+            queues[0].put(_DONE)
+        for thread in threads:
+            thread.join()
+
+        results = []
+        while True:
+            item = results_queue.get()
+            if item is _DONE:
+                break
+            results.append(item)
+        return results
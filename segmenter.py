@@ -0,0 +1,270 @@
+"""
+segmenter.py
+Keyframe-aware segment extraction.
+- Read keyframe times from the container without decoding
+- Cut every segment in a single stream-copy pass over the source
+- Re-encode only the short head of a segment whose cut does not fall on a keyframe,
+  with the source's profile, level and pixel format so it joins the copied body
+- Encode a segment whole when it has no keyframe to copy from, or when the head
+  cannot match the source
+- Report the actual cut timestamps, so subtitles can be sliced to match
+"""
+
+import csv
+import json
+import os
+import shutil
+import subprocess
+from bisect import bisect_left
+
+# Encoders able to produce a head that can be concatenated with the copied body
+HEAD_ENCODERS = {
+    "h264": "libx264",
+    "hevc": "libx265",
+    "vp9": "libvpx-vp9",
+    "av1": "libaom-av1",
+}
+AUDIO_ENCODERS = {
+    "aac": "aac",
+    "opus": "libopus",
+    "mp3": "libmp3lame",
+}
+# ffprobe profile names -> encoder profiles
+H264_PROFILES = {"Baseline": "baseline", "Constrained Baseline": "baseline", "Main": "main", "High": "high",
+                 "High 10": "high10", "High 4:2:2": "high422", "High 4:4:4 Predictive": "high444"}
+HEVC_PROFILES = {"Main": "main", "Main 10": "main10", "Main Still Picture": "mainstillpicture"}
+# Codecs whose parameter sets (SPS/PPS) are repeated in the copied packets, so a
+# re-encoded head with its own parameter sets can be joined to them
+INBAND_PARAMETER_SETS = ("h264", "hevc")
+
+
+def probe_keyframes(video_path):
+    '''Return the sorted presentation times of the video keyframes, from packet flags only.'''
+    result = subprocess.run([
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,flags",
+        "-of", "csv=p=0",
+        video_path
+    ], capture_output=True, text=True, check=True)
+    keyframes = []
+    for line in result.stdout.splitlines():
+        pts_time, _, flags = line.partition(",")
+        if "K" in flags and pts_time not in ("", "N/A"):
+            keyframes.append(float(pts_time))
+    return sorted(keyframes)
+
+
+def probe_streams(video_path):
+    '''
+    Parameters of the first video and audio streams that a re-encoded head must match
+    to be joined to copied packets: {"video": {...}, "audio": {...} or None}.
+    '''
+    result = subprocess.run([
+        "ffprobe", "-v", "error",
+        "-show_entries", "stream=codec_type,codec_name,profile,level,width,height,pix_fmt,time_base,sample_rate,channels",
+        "-of", "json",
+        video_path
+    ], capture_output=True, text=True, check=True)
+    streams = json.loads(result.stdout).get("streams", [])
+    video = next((s for s in streams if s["codec_type"] == "video"), None)
+    if video is None:
+        raise ValueError(f"Pas de flux vidéo dans {video_path}")
+    audio = next((s for s in streams if s["codec_type"] == "audio"), None)
+    return {
+        "video": {k: video.get(k) for k in ("codec_name", "profile", "level", "width", "height", "pix_fmt", "time_base")},
+        "audio": {k: audio.get(k) for k in ("codec_name", "sample_rate", "channels")} if audio else None,
+    }
+
+
+def plan_cuts(split_points, keyframes, tolerance=0.5):
+    '''
+    For each requested cut, return (cut_time, body_start):
+    - a keyframe within `tolerance` seconds: cut there, body_start == cut_time (pure copy)
+    - otherwise: cut at the requested time and copy from the next keyframe, the gap
+      [cut_time, body_start) being re-encoded
+    - no keyframe after the cut: (cut_time, None), nothing can be copied from there.
+    '''
+    plan = []
+    for t in split_points:
+        i = bisect_left(keyframes, t)
+        candidates = keyframes[max(0, i - 1):i + 1]
+        nearest = min(candidates, key=lambda k: abs(k - t)) if candidates else None
+        if nearest is not None and abs(nearest - t) <= tolerance:
+            plan.append((nearest, nearest))
+        elif i < len(keyframes):
+            plan.append((t, keyframes[i]))
+        else:
+            plan.append((t, None))
+    return plan
+
+
+def encoder_options(source):
+    '''ffmpeg output options re-encoding to the codec, profile, level and format of source (probe_streams()).'''
+    video = source["video"]
+    codec = video["codec_name"]
+    options = ["-c:v", HEAD_ENCODERS[codec], "-pix_fmt", video["pix_fmt"]]
+    if codec in ("h264", "hevc"):
+        options += ["-preset", "veryfast"]
+    level = video.get("level")
+    if codec == "h264":
+        if video.get("profile") in H264_PROFILES:
+            options += ["-profile:v", H264_PROFILES[video["profile"]]]
+        if level and level > 0:
+            options += ["-level", f"{level / 10:.1f}"]
+    elif codec == "hevc":
+        if video.get("profile") in HEVC_PROFILES:
+            options += ["-profile:v", HEVC_PROFILES[video["profile"]]]
+        if level and level > 0:
+            options += ["-x265-params", f"level-idc={level / 30:.1f}"]
+    if video.get("time_base"):
+        options += ["-video_track_timescale", video["time_base"].split("/")[1]]
+    audio = source["audio"]
+    if audio:
+        options += ["-c:a", AUDIO_ENCODERS.get(audio["codec_name"], "aac"),
+                    "-ar", str(audio["sample_rate"]), "-ac", str(audio["channels"])]
+    return options
+
+
+def joinable(head_path, source):
+    '''True if the re-encoded head matches the source closely enough to be joined to copied packets.'''
+    head = probe_streams(head_path)
+    video, head_video = source["video"], head["video"]
+    same_video = all(head_video[k] == video[k] for k in ("codec_name", "profile", "width", "height", "pix_fmt", "time_base"))
+    level_ok = not video.get("level") or (head_video.get("level") or 0) <= video["level"]
+    same_audio = head["audio"] == source["audio"]
+    return same_video and level_ok and same_audio
+
+
+def _encode_range(video_path, start, end, output_path, source):
+    '''Re-encode [start, end) of video_path with the codec parameters of the source.'''
+    subprocess.run([
+        "ffmpeg", "-y", "-v", "error",
+        "-ss", f"{start:.6f}", "-i", video_path,
+        "-t", f"{end - start:.6f}",
+        "-map", "0:v:0", "-map", "0:a:0?",
+        *encoder_options(source),
+        "-avoid_negative_ts", "make_zero",
+        output_path
+    ], check=True)
+
+
+def _trim_copy(input_path, duration, output_path):
+    '''Stream-copy the first `duration` seconds of input_path.'''
+    subprocess.run([
+        "ffmpeg", "-y", "-v", "error",
+        "-i", input_path, "-t", f"{duration:.6f}",
+        "-map", "0", "-c", "copy",
+        output_path
+    ], check=True)
+
+
+def _concat_copy(paths, output_path, workdir):
+    '''Join files with identical codecs using the concat demuxer.'''
+    list_path = os.path.join(workdir, "concat.txt")
+    with open(list_path, "w", encoding="utf-8") as f:
+        for p in paths:
+            f.write(f"file '{os.path.abspath(p)}'\n")
+    subprocess.run([
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "concat", "-safe", "0", "-i", list_path,
+        "-map", "0", "-c", "copy",
+        output_path
+    ], check=True)
+
+
+def segment_video(video_path, split_points, outdir, tolerance=0.5, accurate=True):
+    '''
+    Cut video_path into the segments [0, p1], [p1, p2], ... [p(n-1), pn] in one pass.
+    Cuts within `tolerance` seconds of a keyframe snap to it and are stream-copied.
+    Other cuts re-encode only the head up to the next keyframe (accurate=True), or
+    snap to the nearest keyframe whatever the distance (accurate=False). A segment
+    without a keyframe to copy from, or whose head cannot match the source's codec
+    parameters, is re-encoded whole.
+    Returns a list of dicts {"path", "start", "end"} with the actual cut times.
+    '''
+    os.makedirs(outdir, exist_ok=True)
+    workdir = os.path.join(outdir, "_parts")
+    os.makedirs(workdir, exist_ok=True)
+
+    keyframes = probe_keyframes(video_path)
+    source = probe_streams(video_path)
+    video_codec = source["video"]["codec_name"]
+    audio_codec = source["audio"]["codec_name"] if source["audio"] else None
+    if video_codec not in HEAD_ENCODERS or (audio_codec and audio_codec not in AUDIO_ENCODERS):
+        if not keyframes:
+            raise ValueError(f"Impossible de découper {video_path} : ni image clé ni encodeur {video_codec}")
+        accurate = False
+    if not accurate:
+        tolerance = float("inf")
+    plan = [(0.0, 0.0)] + plan_cuts(split_points, keyframes, tolerance)
+    # A body copied from a keyframe at or after the segment end would be empty
+    for i in range(1, len(plan) - 1):
+        cut, body = plan[i]
+        if body is not None and body > cut and body >= plan[i + 1][0]:
+            plan[i] = (cut, None)
+
+    # Single stream-copy pass: one body part starting at each copy point
+    body_starts = [body for _, body in plan[1:] if body is not None]
+    list_path = os.path.join(workdir, "parts.csv")
+    # Parameter sets repeated in the packets, for the parts joined after a re-encoded head
+    inband = ["-bsf:v", "dump_extra=freq=keyframe"] if video_codec in INBAND_PARAMETER_SETS else []
+    subprocess.run([
+        "ffmpeg", "-y", "-v", "error",
+        "-i", video_path,
+        "-map", "0:v:0", "-map", "0:a:0?",
+        "-c", "copy",
+        *inband,
+        "-f", "segment",
+        # slightly before each keyframe so the muxer does not wait for the next one
+        "-segment_times", ",".join(f"{max(0.0, t - 0.001):.6f}" for t in body_starts),
+        "-segment_list", list_path,
+        "-segment_list_type", "csv",
+        "-reset_timestamps", "1",
+        "-avoid_negative_ts", "make_zero",
+        os.path.join(workdir, "body_%04d.mp4")
+    ], check=True)
+    with open(list_path, newline="", encoding="utf-8") as f:
+        parts = [(os.path.join(workdir, row[0]), float(row[1]), float(row[2])) for row in csv.reader(f)]
+
+    segments = []
+    for i in range(len(plan) - 1):
+        cut_start, body_start = plan[i]
+        cut_end, next_body = plan[i + 1]
+        output_path = os.path.join(outdir, f"segment_{i+1}.mp4")
+        if body_start is None:
+            # No keyframe before the segment ends: nothing to copy
+            _encode_range(video_path, cut_start, cut_end, output_path, source)
+            segments.append({"path": output_path, "start": cut_start, "end": cut_end})
+            continue
+
+        body_path, part_start, part_end = min(parts, key=lambda part: abs(part[1] - body_start))
+        if cut_start == body_start:
+            cut_start = part_start  # snapped: the muxer reports the exact keyframe time
+        if cut_end == next_body:
+            cut_end = part_end
+
+        pieces = []
+        if body_start > cut_start:
+            head_path = os.path.join(workdir, f"head_{i+1}.mp4")
+            _encode_range(video_path, cut_start, body_start, head_path, source)
+            if not joinable(head_path, source):
+                # The encoder could not reproduce the source parameters: encode the segment whole
+                _encode_range(video_path, cut_start, cut_end, output_path, source)
+                segments.append({"path": output_path, "start": cut_start, "end": cut_end})
+                continue
+            pieces.append(head_path)
+        if part_end > cut_end + 0.001:
+            trimmed_path = os.path.join(workdir, f"body_trimmed_{i+1}.mp4")
+            _trim_copy(body_path, cut_end - part_start, trimmed_path)
+            body_path = trimmed_path
+        pieces.append(body_path)
+
+        if len(pieces) == 1:
+            os.replace(pieces[0], output_path)
+        else:
+            _concat_copy(pieces, output_path, workdir)
+        segments.append({"path": output_path, "start": cut_start, "end": cut_end})
+
+    shutil.rmtree(workdir, ignore_errors=True)
+    return segments
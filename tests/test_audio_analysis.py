@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from audio_analysis import pause_split_points, window_rms
+
+WINDOW = 0.05
+
+
+def profile(duration, pauses=(), level=0.3, seed=0):
+    '''Energy profile of `duration` seconds of speech-like noise, silent during each (start, end) pause.'''
+    rng = np.random.default_rng(seed)
+    rms = level * (0.5 + rng.random(int(duration / WINDOW))).astype(np.float32)
+    for start, end in pauses:
+        rms[int(start / WINDOW):int(end / WINDOW)] = 0.001
+    return rms
+
+
+def test_cuts_in_the_middle_of_rare_pauses():
+    rms = profile(200, pauses=[(62.0, 63.0), (130.0, 130.6)])
+    points = pause_split_points(rms, WINDOW, min_duration=60.0)
+    assert points[:2] == [pytest.approx(62.5, abs=0.1), pytest.approx(130.3, abs=0.1)]
+
+
+def test_track_without_pauses_cuts_at_the_quietest_point():
+    rms = profile(200)
+    rms[int(68.0 / WINDOW)] = 0.01
+    points = pause_split_points(rms, WINDOW, min_duration=60.0, pause_seconds=0.05)
+    assert points[0] == pytest.approx(68.0, abs=0.1)
+    assert all(b - a >= 60.0 for a, b in zip([0.0] + points, points))
+
+
+def test_all_silence_track():
+    rms = np.zeros(int(200 / WINDOW), dtype=np.float32)
+    points = pause_split_points(rms, WINDOW, min_duration=60.0, search_seconds=10.0)
+    # The whole search range is one pause: cut in its middle
+    assert points == [pytest.approx(65.0, abs=0.1), pytest.approx(130.0, abs=0.1), pytest.approx(195.0, abs=0.1)]
+
+
+def test_short_and_empty_tracks():
+    assert pause_split_points(np.zeros(0, dtype=np.float32), WINDOW) == []
+    assert pause_split_points(profile(30), WINDOW, min_duration=60.0) == []
+
+
+def test_window_rms():
+    samples = np.array([1, -1, 1, -1, 2, 2, 2, 2, 5], dtype=np.float32)
+    assert window_rms(samples, 4).tolist() == [1.0, 2.0]
+    assert len(window_rms(samples[:3], 4)) == 0
@@ -0,0 +1,127 @@
+import json
+import random
+import shutil
+import subprocess
+import threading
+import time
+
+import pytest
+
+import background_library
+from background_library import add_clip, build_background, load_index, normalize_clip, pick_clips, save_index
+
+has_ffmpeg = pytest.mark.skipif(not (shutil.which("ffmpeg") and shutil.which("ffprobe")),
+                                reason="ffmpeg/ffprobe not installed")
+
+
+def library(tmp_path, durations, tags=None):
+    '''An index of existing (empty) clip files with the given durations.'''
+    clips = []
+    for i, duration in enumerate(durations):
+        path = tmp_path / f"clip{i}.mp4"
+        path.write_bytes(b"")
+        clips.append({"id": f"clip{i}", "path": str(path), "duration": duration,
+                      "tags": (tags or {}).get(i, [])})
+    save_index({"clips": clips}, str(tmp_path))
+    return clips
+
+
+def test_pick_clips_covers_the_duration(tmp_path):
+    library(tmp_path, [10.0, 20.0, 30.0, 40.0])
+    for seed in range(10):
+        picked = pick_clips(45.0, library_dir=str(tmp_path), rng=random.Random(seed))
+        total = sum(clip["duration"] for clip in picked)
+        assert total >= 45.0
+        # No clip more than needed: without the last pick the duration is not covered
+        assert total - picked[-1]["duration"] < 45.0
+        assert len({clip["id"] for clip in picked}) == len(picked)
+
+
+def test_pick_clips_not_enough_footage(tmp_path):
+    library(tmp_path, [10.0, 20.0, 30.0])
+    assert pick_clips(60.0, library_dir=str(tmp_path)) is not None
+    assert pick_clips(60.1, library_dir=str(tmp_path)) is None
+    # Clips whose file is gone do not count
+    (tmp_path / "clip2.mp4").unlink()
+    assert pick_clips(31.0, library_dir=str(tmp_path)) is None
+    assert background_library.library_duration(library_dir=str(tmp_path)) == 30.0
+
+
+def test_pick_clips_by_tags(tmp_path):
+    library(tmp_path, [10.0, 20.0, 30.0], tags={0: ["slime"], 1: ["sand", "asmr"]})
+    picked = pick_clips(30.0, tags=["slime", "sand"], library_dir=str(tmp_path))
+    assert sorted(clip["id"] for clip in picked) == ["clip0", "clip1"]
+    assert pick_clips(30.1, tags=["slime", "sand"], library_dir=str(tmp_path)) is None
+
+
+def test_concurrent_add_clip_keeps_every_entry(tmp_path, monkeypatch):
+    monkeypatch.setattr(background_library, "normalize_clip", lambda src, dst: shutil.copy(src, dst))
+    monkeypatch.setattr(background_library, "probe_duration", lambda path: 5.0)
+    read_index = background_library.load_index
+
+    def slow_load_index(library_dir):
+        # Widen the read-modify-write window
+        index = read_index(library_dir)
+        time.sleep(0.02)
+        return index
+
+    monkeypatch.setattr(background_library, "load_index", slow_load_index)
+    source = tmp_path / "source.mp4"
+    source.write_bytes(b"video")
+    library_dir = str(tmp_path / "library")
+    threads = [threading.Thread(target=add_clip, args=(str(source), ["slime"], f"video{i}", library_dir))
+               for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    index = read_index(library_dir)
+    assert sorted(clip["source"] for clip in index["clips"]) == [f"video{i}" for i in range(8)]
+    assert all(clip["tags"] == ["slime"] and clip["duration"] == 5.0 for clip in index["clips"])
+
+
+def probe(path):
+    result = subprocess.run([
+        "ffprobe", "-v", "error", "-show_entries",
+        "stream=codec_type,width,height,r_frame_rate,sample_rate,channels:format=duration", "-of", "json", path
+    ], capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+def make_video(path, size, duration, audio=True):
+    command = ["ffmpeg", "-y", "-v", "error", "-f", "lavfi",
+               "-i", f"testsrc=size={size}:rate=25:duration={duration}"]
+    if audio:
+        command += ["-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=48000:duration={duration}", "-ac", "1"]
+    subprocess.run(command + ["-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p",
+                              "-shortest", str(path)], check=True)
+    return str(path)
+
+
+@has_ffmpeg
+def test_normalize_clip_to_the_library_format(tmp_path):
+    for name, size, audio in [("wide", "1280x720", True), ("tall", "480x854", False)]:
+        source = make_video(tmp_path / f"{name}.mp4", size, 1, audio=audio)
+        info = probe(normalize_clip(source, str(tmp_path / f"{name}_normalized.mp4")))
+        video = next(s for s in info["streams"] if s["codec_type"] == "video")
+        audio_stream = next(s for s in info["streams"] if s["codec_type"] == "audio")
+        assert (video["width"], video["height"], video["r_frame_rate"]) == (1080, 960, "30/1")
+        # A silent track is added to clips without audio, so every clip can be joined
+        assert (int(audio_stream["sample_rate"]), audio_stream["channels"]) == (44100, 2)
+        assert float(info["format"]["duration"]) == pytest.approx(1.0, abs=0.1)
+
+
+@has_ffmpeg
+def test_build_background_joins_clips_by_stream_copy(tmp_path):
+    library_dir = str(tmp_path / "library")
+    for i, size in enumerate(["1280x720", "640x480"]):
+        add_clip(make_video(tmp_path / f"source{i}.mp4", size, 2), tags=["slime"], library_dir=library_dir)
+    assert len(load_index(library_dir)["clips"]) == 2
+
+    output = build_background(3.0, str(tmp_path / "background.mp4"), tags=["slime"], library_dir=library_dir)
+    info = probe(output)
+    video = next(s for s in info["streams"] if s["codec_type"] == "video")
+    assert (video["width"], video["height"]) == (1080, 960)
+    assert float(info["format"]["duration"]) == pytest.approx(3.0, abs=0.2)
+    assert not (tmp_path / "background.mp4.txt").exists()
+    assert build_background(5.0, str(tmp_path / "too_long.mp4"), library_dir=library_dir) is None
@@ -0,0 +1,114 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import cli
+
+REPO_DIR = os.path.dirname(os.path.abspath(cli.__file__))
+HEAVY_MODULES = ("whisper", "torch", "moviepy", "yt_dlp", "googleapiclient")
+
+
+def test_startup_imports_no_heavy_module():
+    code = (
+        "import sys, cli; cli.build_parser(); "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=REPO_DIR, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ""
+
+
+def test_help_does_not_import_heavy_modules():
+    code = (
+        "import sys, cli\n"
+        "try:\n    cli.main(['render', '--help'])\nexcept SystemExit:\n    pass\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules), file=sys.stderr)"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=REPO_DIR, capture_output=True, text=True, check=True)
+    assert "--split-source" in result.stdout
+    assert result.stderr.strip() == ""
+
+
+def parse(*argv):
+    return cli.build_parser().parse_args(list(argv))
+
+
+def test_download():
+    args = parse("download", "https://youtu.be/abc", "--min-height", "720")
+    assert (args.func, args.url, args.outdir, args.min_height) == (cli.cmd_download, "https://youtu.be/abc", "downloads/video", 720)
+
+
+def test_transcribe():
+    args = parse("transcribe", "video.mp4", "--srt", "out.srt", "--chunked", "--workers", "2", "--no-cache")
+    assert args.func is cli.cmd_transcribe
+    assert (args.media, args.srt, args.transcript, args.model) == ("video.mp4", "out.srt", None, "base")
+    assert args.chunked and args.no_cache and args.workers == 2
+
+
+def test_split_points():
+    args = parse("split-points", "video.mp4")
+    assert (args.func, args.min_duration, args.srt) == (cli.cmd_split_points, 60.0, None)
+    assert parse("split-points", "video.mp4", "--srt", "full.srt", "--min-duration", "45").min_duration == 45.0
+
+
+def test_render():
+    args = parse("render")
+    assert args.func is cli.cmd_render
+    assert (args.layout, args.single_pass, args.workers, args.no_resume) == ("blur", False, None, False)
+    assert (args.blur_quality, args.split_source) == ("balanced", "subtitles")
+    args = parse("render", "--layout", "satisfying", "--single-pass", "--workers", "3", "--no-resume",
+                 "--blur-quality", "fast", "--split-source", "audio")
+    assert (args.layout, args.single_pass, args.workers, args.no_resume) == ("satisfying", True, 3, True)
+    assert (args.blur_quality, args.split_source) == ("fast", "audio")
+
+
+def test_preview_and_promote():
+    args = parse("preview")
+    assert (args.func, args.layouts, args.workers) == (cli.cmd_preview, ["blur", "satisfying"], None)
+    assert parse("preview", "--layouts", "blur").layouts == ["blur"]
+    args = parse("promote", "--job", "preview_abc", "--two-pass")
+    assert (args.func, args.layout, args.job, args.two_pass) == (cli.cmd_promote, "blur", "preview_abc", True)
+
+
+def test_upload():
+    args = parse("upload", "a.mp4", "clips/", "--platform", "tiktok", "--tags", "fun", "clip", "--chunk-size", "4")
+    assert args.func is cli.cmd_upload
+    assert (args.paths, args.platform, args.tags, args.chunk_size) == (["a.mp4", "clips/"], "tiktok", ["fun", "clip"], 4)
+    assert (args.privacy, args.workers, args.endpoint) == ("private", 3, None)
+
+
+def test_batch():
+    args = parse("batch", "--count", "5", "--urls", "u1", "u2", "--split-source", "audio")
+    assert args.func is cli.cmd_batch
+    assert (args.count, args.layout, args.urls, args.split_source) == (5, "blur", ["u1", "u2"], "audio")
+    assert (args.download_workers, args.transcribe_workers, args.render_workers) == (2, 1, 4)
+
+
+@pytest.mark.parametrize("argv", [
+    [],
+    ["unknown"],
+    ["render", "--layout", "square"],
+    ["render", "--split-source", "video"],
+    ["upload"],
+    ["upload", "a.mp4", "--privacy", "secret"],
+    ["batch", "--count", "many"],
+])
+def test_invalid_arguments(argv, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        parse(*argv)
+    assert exit_info.value.code == 2
+
+
+def test_commands_call_the_workflows(monkeypatch):
+    import main
+    calls = []
+    monkeypatch.setattr(main, "split_blured_video", lambda **kwargs: calls.append(("blur", kwargs)))
+    monkeypatch.setattr(main, "split_video", lambda **kwargs: calls.append(("satisfying", kwargs)))
+    monkeypatch.setattr(main, "run_batch", lambda **kwargs: calls.append(("batch", kwargs)))
+    assert cli.main(["render", "--split-source", "audio", "--workers", "2"]) == 0
+    cli.main(["render", "--layout", "satisfying", "--no-resume"])
+    cli.main(["batch", "--count", "2"])
+    assert calls[0] == ("blur", dict(single_pass=False, max_workers=2, resume=True, blur_quality="balanced", split_source="audio"))
+    assert calls[1] == ("satisfying", dict(single_pass=False, max_workers=None, resume=False))
+    assert calls[2][0] == "batch" and calls[2][1]["count"] == 2 and calls[2][1]["split_source"] == "subtitles"
@@ -0,0 +1,61 @@
+import os
+import time
+
+import pytest
+
+from clip_executor import run_clip_jobs
+
+
+@pytest.fixture(autouse=True)
+def metrics_log(tmp_path, monkeypatch):
+    # Reader statistics go to a temporary log instead of stdout
+    monkeypatch.setenv("CLIPGEN_METRICS_LOG", str(tmp_path / "metrics.jsonl"))
+
+
+# Render functions are module-level: they are sent to the worker processes
+
+def render(job, workdir):
+    # Later jobs finish first, so completion order differs from job order
+    time.sleep(0.05 * (3 - job["index"]))
+    with open(os.path.join(workdir, "scratch.txt"), "w") as f:
+        f.write("temp")
+    return {"index": job["index"], "pid": os.getpid(), "workdir": workdir}
+
+
+def render_or_fail(job, workdir):
+    if job["index"] == 1:
+        raise ValueError("rendu impossible")
+    return render(job, workdir)
+
+
+def jobs(count):
+    return [{"index": i, "video_id": "abc"} for i in range(count)]
+
+
+@pytest.mark.parametrize("max_workers", [1, 3])
+def test_results_in_job_order_and_workdirs_removed(tmp_path, max_workers):
+    done = []
+    results = run_clip_jobs(jobs(4), render, max_workers=max_workers, workdir_root=str(tmp_path / "work"),
+                            on_done=lambda job, result: done.append(job["index"]))
+    assert [result["index"] for result in results] == [0, 1, 2, 3]
+    assert sorted(done) == [0, 1, 2, 3]
+    assert len({result["workdir"] for result in results}) == 4
+    assert os.listdir(tmp_path / "work") == []
+    pids = {result["pid"] for result in results}
+    assert (pids == {os.getpid()}) == (max_workers == 1)
+
+
+def test_keep_workdir(tmp_path):
+    result, = run_clip_jobs(jobs(1), render, max_workers=1, workdir_root=str(tmp_path / "work"),
+                            keep_workdir=True)
+    assert os.listdir(result["workdir"]) == ["scratch.txt"]
+
+
+@pytest.mark.parametrize("max_workers", [1, 3])
+def test_failing_job_does_not_stop_the_others(tmp_path, max_workers):
+    done = []
+    with pytest.raises(ValueError, match="rendu impossible"):
+        run_clip_jobs(jobs(4), render_or_fail, max_workers=max_workers, workdir_root=str(tmp_path / "work"),
+                      on_done=lambda job, result: done.append(job["index"]))
+    assert sorted(done) == [0, 2, 3]
+    assert os.listdir(tmp_path / "work") == []
@@ -0,0 +1,13 @@
+from cue_store import Cue, CueStore
+
+
+def test_unsorted_cues_are_sorted_by_start():
+    store = CueStore([Cue(4.0, 6.0, "trois."), Cue(0.0, 2.0, "un"), Cue(2.0, 4.0, "deux")])
+    assert [c.text for c in store.cues] == ["un", "deux", "trois."]
+    assert list(store.starts) == [0.0, 2.0, 4.0]
+    assert [c.text for c in store.range(1.0, 3.0)] == ["un", "deux"]
+
+
+def test_equal_starts_keep_their_order():
+    store = CueStore([Cue(1.0, 2.0, "b"), Cue(0.0, 1.0, "a"), Cue(1.0, 3.0, "c")])
+    assert [c.text for c in store.cues] == ["a", "b", "c"]
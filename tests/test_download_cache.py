@@ -0,0 +1,71 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import download_cache
+
+
+def make_download(tmp_path, name, size):
+    path = tmp_path / "downloads" / name
+    path.parent.mkdir(exist_ok=True)
+    path.write_bytes(b"x" * size)
+    return str(path)
+
+
+def store(tmp_path, video_id, size=100, max_bytes=250, **options):
+    return download_cache.store(
+        video_id, "mp4", make_download(tmp_path, f"{video_id}.mp4", size),
+        cache_dir=str(tmp_path / "cache"), max_bytes=max_bytes, **options
+    )
+
+
+def test_held_entry_is_not_evicted(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    held = store(tmp_path, "old", hold=True)
+    time.sleep(0.01)
+    store(tmp_path, "mid")
+    time.sleep(0.01)
+    store(tmp_path, "new")
+    # "old" is the least recently used but held: "mid" goes instead
+    assert os.path.exists(held)
+    assert download_cache.lookup("mid", "mp4", cache_dir=cache_dir) is None
+
+    download_cache.release(held)
+    store(tmp_path, "newer")
+    assert not os.path.exists(held)
+    assert download_cache.lookup("old", "mp4", cache_dir=cache_dir) is None
+
+
+def test_lookup_hold_and_hold_by_path(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    path = store(tmp_path, "a")
+    assert download_cache.lookup("a", "mp4", cache_dir=cache_dir, hold=True) == path
+    assert download_cache.hold(path, cache_dir=cache_dir)
+    assert not download_cache.hold(str(tmp_path / "cache" / "unknown.mp4"), cache_dir=cache_dir)
+    entry = download_cache.load_index(cache_dir)[download_cache.cache_key("a", "mp4")]
+    assert len(entry["holds"]) == 2
+
+    download_cache.release(path)
+    assert download_cache.is_held(download_cache.load_index(cache_dir)[download_cache.cache_key("a", "mp4")])
+    download_cache.release(path)
+    assert not download_cache.is_held(download_cache.load_index(cache_dir)[download_cache.cache_key("a", "mp4")])
+
+
+def test_expired_hold_does_not_protect(tmp_path, monkeypatch):
+    monkeypatch.setattr(download_cache, "HOLD_SECONDS", -1)
+    held = store(tmp_path, "old", hold=True)
+    time.sleep(0.01)
+    store(tmp_path, "mid")
+    time.sleep(0.01)
+    store(tmp_path, "new")
+    assert not os.path.exists(held)
+
+
+def test_concurrent_stores_keep_every_entry(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    video_ids = [f"v{i}" for i in range(16)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda video_id: store(tmp_path, video_id, max_bytes=10 ** 6), video_ids))
+    index = download_cache.load_index(cache_dir)
+    assert sorted(entry["video_id"] for entry in index.values()) == sorted(video_ids)
+    assert not [name for name in os.listdir(cache_dir) if name.endswith(".tmp")]
@@ -0,0 +1,109 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+import job_manifest
+from job_manifest import JobManifest, MAX_ATTEMPTS
+
+URL = "https://www.youtube.com/watch?v=abcdefghijk"
+
+
+def create(jobs_dir, kind="blur", created=0.0, **data):
+    manifest = JobManifest.create(kind, URL, "abcdefghijk", str(jobs_dir))
+    # Distinct job ids and creation times without waiting a second between jobs
+    job_dir = os.path.join(str(jobs_dir), f"{kind}_{created}")
+    manifest.release()
+    os.rename(manifest.job_dir, job_dir)
+    manifest = JobManifest(os.path.join(job_dir, "manifest.json"), dict(manifest.data, created=created, **data))
+    manifest.save()
+    return manifest
+
+
+def test_resumes_the_most_recent_running_job_of_its_kind(tmp_path):
+    create(tmp_path, created=1.0)
+    latest = create(tmp_path, created=2.0)
+    create(tmp_path, kind="satisfying", created=3.0)
+    create(tmp_path, created=4.0, status="done")
+    found = JobManifest.find_incomplete("blur", str(tmp_path))
+    assert found.path == latest.path
+    found.release()
+
+
+def test_failed_jobs_are_not_resumed(tmp_path):
+    manifest = create(tmp_path, created=1.0)
+    manifest.fail(ValueError("pas de points de découpe"))
+    assert JobManifest.load(manifest.path).data["error"] == "pas de points de découpe"
+    assert JobManifest.find_incomplete("blur", str(tmp_path)) is None
+
+
+def test_jobs_over_max_attempts_are_not_resumed(tmp_path):
+    manifest = create(tmp_path, created=1.0)
+    for attempt in range(MAX_ATTEMPTS):
+        found = JobManifest.find_incomplete("blur", str(tmp_path))
+        assert found is not None and found.path == manifest.path
+        found.start_attempt()
+        found.release()
+    assert JobManifest.load(manifest.path).data["attempts"] == MAX_ATTEMPTS
+    assert JobManifest.find_incomplete("blur", str(tmp_path)) is None
+
+
+def test_job_claimed_by_another_run_is_skipped(tmp_path):
+    older = create(tmp_path, created=1.0)
+    newer = create(tmp_path, created=2.0)
+    assert newer.claim()
+    found = JobManifest.find_incomplete("blur", str(tmp_path))
+    assert found.path == older.path
+    assert JobManifest.find_incomplete("blur", str(tmp_path)) is None
+    newer.release()
+    found.release()
+
+
+def test_job_claimed_by_another_process_is_skipped(tmp_path):
+    manifest = create(tmp_path, created=1.0)
+    holder = subprocess.Popen([sys.executable, "-c", textwrap.dedent(f"""
+        import sys
+        sys.path.insert(0, {os.path.dirname(os.path.dirname(os.path.abspath(job_manifest.__file__)))!r})
+        from job_manifest import JobManifest
+        held = JobManifest.load({manifest.path!r})
+        assert held.claim()
+        print("claimed", flush=True)
+        sys.stdin.readline()
+    """)], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    try:
+        assert holder.stdout.readline().strip() == "claimed"
+        assert JobManifest.find_incomplete("blur", str(tmp_path)) is None
+    finally:
+        holder.communicate("\n")
+    # The lock dies with the run holding it
+    found = JobManifest.find_incomplete("blur", str(tmp_path))
+    assert found.path == manifest.path
+    found.release()
+
+
+def test_job_finished_while_waiting_is_not_resumed(tmp_path, monkeypatch):
+    manifest = create(tmp_path, created=1.0)
+    claim = JobManifest.claim
+
+    def claim_after_the_other_run_finished(self):
+        # The run holding the lock finishes the job between the scan and the claim
+        manifest.finish()
+        return claim(self)
+
+    monkeypatch.setattr(JobManifest, "claim", claim_after_the_other_run_finished)
+    assert JobManifest.find_incomplete("blur", str(tmp_path)) is None
+
+
+def test_save_is_atomic_and_promote_carries_the_analysis(tmp_path):
+    preview = create(tmp_path, kind="preview", created=1.0)
+    preview.complete_step("download_transcribe", video=str(tmp_path / "v.mp4"))
+    preview.set_split_points([61.0, 125.0])
+    preview.complete_clip("blur_1", str(tmp_path / "clip.mp4"))
+    full = preview.promote("blur", str(tmp_path))
+    assert full.data["split_points"] == [61.0, 125.0]
+    assert full.data["promoted_from"] == preview.data["job_id"]
+    assert full.data["clips"] == {}
+    assert "download_transcribe" in full.data["steps"]
+    full.release()
+    leftovers = [name for _, _, files in os.walk(tmp_path) for name in files if name.endswith(".tmp")]
+    assert leftovers == []
@@ -0,0 +1,81 @@
+import os
+
+import pytest
+
+import main
+from cue_store import Cue, CueStore
+from job_manifest import JobManifest
+
+URL = "https://www.youtube.com/watch?v=abcdefghijk"
+
+
+@pytest.fixture
+def workflow(tmp_path, monkeypatch):
+    '''
+    The preview/promote workflow with downloads, analysis and rendering replaced by
+    stand-ins that record their calls. Jobs are written under tmp_path.
+    '''
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("CLIPGEN_METRICS_LOG", str(tmp_path / "metrics.jsonl"))
+    calls = {"download": 0, "split_points": 0, "blur_track": [], "rendered": []}
+
+    def download_and_transcribe(video_url, transcript_path, srt_path, **options):
+        calls["download"] += 1
+        video_path = str(tmp_path / "source.mp4")
+        open(video_path, "wb").close()
+        return video_path, CueStore([Cue(0.0, 61.0, "Première phrase."), Cue(61.0, 125.0, "Deuxième phrase.")])
+
+    def split_points(self, min_duration=60.0):
+        calls["split_points"] += 1
+        return [61.0, 125.0]
+
+    def render_blur_track(video_path, output_path, quality="balanced"):
+        calls["blur_track"].append(quality)
+        return output_path
+
+    def run_clip_jobs(jobs, render_fn, max_workers=None, on_done=None, **options):
+        for job in jobs:
+            calls["rendered"].append((render_fn.__name__, job))
+            on_done(job, job["subtitled_output"])
+        return [job["subtitled_output"] for job in jobs]
+
+    monkeypatch.setattr(main, "get_trending_video_url", lambda: URL)
+    monkeypatch.setattr(main, "download_and_transcribe", download_and_transcribe)
+    monkeypatch.setattr(CueStore, "split_points", split_points)
+    monkeypatch.setattr(main, "probe_duration", lambda path: 130.0)
+    monkeypatch.setattr(main, "render_blur_track", render_blur_track)
+    monkeypatch.setattr(main, "run_clip_jobs", run_clip_jobs)
+    monkeypatch.setattr(main.download_cache, "hold", lambda path: None)
+    monkeypatch.setattr(main.download_cache, "release", lambda path: None)
+    return calls
+
+
+def test_promote_reuses_the_preview_analysis(workflow):
+    preview = main.preview_video(layouts=("blur",), resume=False)
+    assert preview.data["status"] == "done" and preview.data["split_points"] == [61.0, 125.0]
+    preview_jobs = [job for name, job in workflow["rendered"] if name == "render_preview_clip"]
+    assert [(job["start"], job["end"]) for job in preview_jobs] == [(0.0, 61.0), (61.0, 125.0)]
+    assert all(job["render_options"] == main.PREVIEW_RENDER for job in preview_jobs)
+
+    full = main.promote_preview("blur", job_id=preview.data["job_id"])
+
+    # Neither downloaded, transcribed nor analysed again
+    assert workflow["download"] == 1 and workflow["split_points"] == 1
+    full = JobManifest.load(full.path)
+    assert full.data["promoted_from"] == preview.data["job_id"]
+    assert full.data["status"] == "done"
+    assert full.data["split_points"] == preview.data["split_points"]
+    assert full.data["artifacts"]["srt"] == preview.data["artifacts"]["srt"]
+    full_jobs = [job for name, job in workflow["rendered"] if name == "render_blured_clip"]
+    assert [(job["start"], job["end"]) for job in full_jobs] == [(0.0, 61.0), (61.0, 125.0)]
+    # Rendered at full size, into the new job's directory, with the preview's subtitles
+    assert all("render_options" not in job for job in full_jobs)
+    assert all(job["subtitled_output"].startswith(full.job_dir) for job in full_jobs)
+    assert [job["srt_text"] for job in full_jobs] == [job["srt_text"] for job in preview_jobs]
+    assert sorted(full.data["clips"]) == ["1", "2"]
+
+
+def test_promote_without_preview(workflow):
+    with pytest.raises(ValueError):
+        main.promote_preview("blur")
+    assert not os.path.exists(os.path.join("output", "jobs")) or os.listdir(os.path.join("output", "jobs")) == []
@@ -0,0 +1,79 @@
+import json
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import media_merge
+
+
+def fake_ffprobe(monkeypatch, streams):
+    def run(cmd, **kwargs):
+        return subprocess.CompletedProcess(cmd, 0, stdout=json.dumps({"streams": streams}))
+    monkeypatch.setattr(media_merge.subprocess, "run", run)
+
+
+def test_probe_spec_reads_first_video_and_audio_streams(monkeypatch):
+    fake_ffprobe(monkeypatch, [
+        {"codec_type": "audio", "codec_name": "aac", "sample_rate": "44100", "channels": 2},
+        {"codec_type": "video", "codec_name": "h264", "profile": "High", "width": 1080, "height": 1920,
+         "pix_fmt": "yuv420p", "r_frame_rate": "30/1", "time_base": "1/15360"},
+    ])
+    spec = media_merge.probe_spec("clip.mp4")
+    assert (spec["vcodec"], spec["width"], spec["acodec"], spec["sample_rate"]) == ("h264", 1080, "aac", 44100)
+
+
+def test_probe_spec_without_video_stream(monkeypatch):
+    fake_ffprobe(monkeypatch, [{"codec_type": "audio", "codec_name": "aac", "sample_rate": "44100", "channels": 2}])
+    with pytest.raises(ValueError, match="Aucun flux vidéo"):
+        media_merge.probe_spec("audio_only.m4a")
+
+
+TARGET = {"vcodec": "h264", "profile": "High", "width": 1080, "height": 1920, "pix_fmt": "yuv420p",
+          "fps": "30/1", "time_base": "1/15360", "acodec": "aac", "sample_rate": 44100, "channels": 2}
+
+
+def test_concurrent_conforms_encode_once(tmp_path, monkeypatch):
+    source = tmp_path / "ending.mp4"
+    source.write_bytes(b"ending")
+    encodes = []
+
+    def run(cmd, **kwargs):
+        if cmd[0] == "ffprobe":
+            streams = [{"codec_type": "video", "codec_name": "h264", "width": 720, "height": 1280,
+                        "r_frame_rate": "25/1", "time_base": "1/12800"},
+                       {"codec_type": "audio", "codec_name": "aac", "sample_rate": "48000", "channels": 2}]
+            return subprocess.CompletedProcess(cmd, 0, stdout=json.dumps({"streams": streams}))
+        encodes.append(cmd[-1])
+        with open(cmd[-1], "wb") as f:
+            f.write(b"conformed")
+            time.sleep(0.05)  # slow encode: the other workers arrive meanwhile
+        return subprocess.CompletedProcess(cmd, 0)
+
+    monkeypatch.setattr(media_merge.subprocess, "run", run)
+    cache_dir = str(tmp_path / "conformed")
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        paths = list(pool.map(lambda _: media_merge.conform(str(source), TARGET, cache_dir), range(4)))
+    assert len(set(paths)) == 1 and len(encodes) == 1
+    assert open(paths[0], "rb").read() == b"conformed"
+    assert sorted(os.listdir(cache_dir)) == sorted([os.path.basename(paths[0]), os.path.basename(paths[0]) + ".lock"])
+
+
+def test_failed_conform_leaves_no_partial_file(tmp_path, monkeypatch):
+    source = tmp_path / "ending.mp4"
+    source.write_bytes(b"ending")
+
+    def run(cmd, **kwargs):
+        if cmd[0] == "ffprobe":
+            streams = [{"codec_type": "video", "codec_name": "h264", "width": 720, "height": 1280,
+                        "r_frame_rate": "25/1", "time_base": "1/12800"}]
+            return subprocess.CompletedProcess(cmd, 0, stdout=json.dumps({"streams": streams}))
+        raise subprocess.CalledProcessError(1, cmd)
+
+    monkeypatch.setattr(media_merge.subprocess, "run", run)
+    cache_dir = str(tmp_path / "conformed")
+    with pytest.raises(subprocess.CalledProcessError):
+        media_merge.conform(str(source), TARGET, cache_dir)
+    assert [name for name in os.listdir(cache_dir) if not name.endswith(".lock")] == []
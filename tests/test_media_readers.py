@@ -0,0 +1,156 @@
+import os
+import sys
+import threading
+import types
+
+import pytest
+
+from media_readers import ReaderLeak, ReaderManager
+
+
+class FakeVideoReader:
+    '''Stands for moviepy's FFMPEG_VideoReader: holds a file descriptor like the ffmpeg pipe.'''
+
+    def __init__(self, path):
+        self.proc = open(path, "rb")
+
+    def close(self):
+        if self.proc is not None:
+            self.proc.close()
+            self.proc = None
+
+
+class FakeVideoFileClip:
+    opened = 0
+
+    def __init__(self, path):
+        FakeVideoFileClip.opened += 1
+        self.reader = FakeVideoReader(path)
+        self.duration = 10.0
+
+    def subclip(self, start, end):
+        return self
+
+    def close(self):
+        self.reader.close()
+
+
+@pytest.fixture(autouse=True)
+def fake_moviepy(monkeypatch):
+    FakeVideoFileClip.opened = 0
+    editor = types.ModuleType("moviepy.editor")
+    editor.VideoFileClip = FakeVideoFileClip
+    ffmpeg_reader = types.ModuleType("moviepy.video.io.ffmpeg_reader")
+    ffmpeg_reader.FFMPEG_VideoReader = FakeVideoReader
+    monkeypatch.setitem(sys.modules, "moviepy.editor", editor)
+    monkeypatch.setitem(sys.modules, "moviepy.video.io.ffmpeg_reader", ffmpeg_reader)
+
+
+@pytest.fixture
+def sources(tmp_path):
+    paths = []
+    for name in ["a.mp4", "b.mp4", "c.mp4"]:
+        path = tmp_path / name
+        path.write_bytes(b"\0" * 16)
+        paths.append(str(path))
+    return paths
+
+
+def open_fds():
+    if not os.path.isdir("/proc/self/fd"):
+        pytest.skip("needs /proc/self/fd")
+    return len(os.listdir("/proc/self/fd"))
+
+
+def test_readers_are_shared_and_released(sources):
+    readers = ReaderManager(max_readers=2)
+    fds = open_fds()
+    with readers.open(sources[0]) as first, readers.open(sources[0]) as second:
+        assert first is second
+        assert readers.stats()["in_use"] == 1
+        assert open_fds() == fds + 1
+    assert FakeVideoFileClip.opened == 1
+    # Kept open for the next job, closed by close_all()
+    assert readers.stats()["open"] == 1
+    readers.close_all()
+    assert readers.stats()["open"] == 0
+    assert open_fds() == fds
+
+
+def test_keep_false_closes_when_released(sources):
+    readers = ReaderManager()
+    fds = open_fds()
+    with readers.open(sources[0], keep=False):
+        assert open_fds() == fds + 1
+    assert readers.stats()["open"] == 0
+    assert open_fds() == fds
+
+
+def test_idle_readers_are_closed_at_the_cap(sources):
+    readers = ReaderManager(max_readers=2)
+    fds = open_fds()
+    for path in sources:
+        with readers.open(path):
+            pass
+    stats = readers.stats()
+    assert stats["open"] == 2
+    assert stats["peak_open"] == 2
+    assert stats["opened_total"] == 3
+    assert open_fds() == fds + 2
+    readers.close_all()
+    assert open_fds() == fds
+
+
+def test_scope_passes_when_readers_are_released(sources):
+    readers = ReaderManager()
+    with readers.scope():
+        with readers.open(sources[0]):
+            pass
+    readers.close_all()
+
+
+def test_scope_catches_reader_opened_outside_the_pool(sources):
+    readers = ReaderManager()
+    with pytest.raises(ReaderLeak):
+        with readers.scope():
+            clip = FakeVideoFileClip(sources[0])
+    clip.close()
+
+
+def test_scope_ignores_readers_of_other_threads(sources):
+    readers = ReaderManager()
+    opened = threading.Event()
+    done = threading.Event()
+
+    def other_job():
+        with readers.open(sources[1]):
+            opened.set()
+            done.wait(5)
+
+    thread = threading.Thread(target=other_job)
+    thread.start()
+    opened.wait(5)
+    try:
+        with readers.scope():
+            with readers.open(sources[0]):
+                pass
+        # The process-wide check sees the other thread's reader
+        with pytest.raises(ReaderLeak):
+            readers.check_leaks()
+    finally:
+        done.set()
+        thread.join()
+    readers.check_leaks()
+    readers.close_all()
+
+
+def test_scope_catches_reader_left_checked_out(sources):
+    readers = ReaderManager()
+    held = readers.open(sources[0])
+    with pytest.raises(ReaderLeak):
+        with readers.scope():
+            # Entered and not exited before the job ends
+            held.__enter__()
+    held.__exit__(None, None, None)
+    readers.check_leaks()
+    readers.close_all()
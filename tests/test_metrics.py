@@ -0,0 +1,97 @@
+import json
+import os
+import stat
+import subprocess
+import sys
+
+import pytest
+
+import metrics
+
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def metrics_files(tmp_path, monkeypatch):
+    '''Fresh metric totals, JSON log and Prometheus textfile in tmp_path.'''
+    monkeypatch.setattr(metrics, "_stages", {})
+    monkeypatch.setattr(metrics, "_ffmpeg", {})
+    monkeypatch.setattr(metrics, "_last_prom_write", 0.0)
+    log_path, prom_path = tmp_path / "metrics.jsonl", tmp_path / "clipgen.prom"
+    monkeypatch.setenv(metrics.METRICS_LOG_ENV, str(log_path))
+    monkeypatch.setenv(metrics.PROM_FILE_ENV, str(prom_path))
+    return log_path, prom_path
+
+
+def events(log_path, event):
+    with open(log_path, encoding="utf-8") as f:
+        return [record for record in map(json.loads, f) if record["event"] == event]
+
+
+def prom_samples(prom_path):
+    with open(prom_path, encoding="utf-8") as f:
+        return dict(line.rsplit(" ", 1) for line in f.read().splitlines() if not line.startswith("#"))
+
+
+def test_stage_logs_times_and_status(metrics_files):
+    log_path, _ = metrics_files
+    with metrics.stage("render_clip", clip=3, video="abc"):
+        sum(range(100000))
+    with pytest.raises(ValueError):
+        with metrics.stage("render_clip", clip=4):
+            raise ValueError("échec")
+    ok, error = events(log_path, "stage")
+    assert (ok["stage"], ok["status"], ok["clip"], ok["video"]) == ("render_clip", "ok", 3, "abc")
+    assert error["status"] == "error" and error["clip"] == 4
+    assert ok["wall_s"] >= 0 and ok["cpu_s"] >= 0 and ok["thread_cpu_s"] >= 0
+    assert metrics._stages["render_clip"]["runs"] == 2 and metrics._stages["render_clip"]["errors"] == 1
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="RSS is read from /proc")
+def test_stage_peak_includes_child_processes(metrics_files):
+    log_path, _ = metrics_files
+    child = "x = bytearray(100 * 1024 * 1024); import time; time.sleep(0.6)"
+    with metrics.stage("render"):
+        subprocess.run([sys.executable, "-c", child], check=True)
+    record, = events(log_path, "stage")
+    # The memory is used by the child, not by this process
+    assert record["peak_children_rss_bytes"] >= 90 * MB
+    assert record["peak_rss_bytes"] < record["start_rss_bytes"] + 50 * MB
+
+
+def fake_ffmpeg(tmp_path):
+    '''Executable printing two ffmpeg -progress blocks, whatever its arguments.'''
+    script = tmp_path / "ffmpeg"
+    script.write_text(
+        f"#!{sys.executable}\n"
+        "print('frame=30\\nfps=29.5\\nspeed=1.5x\\nout_time_us=1000000\\nprogress=continue', flush=True)\n"
+        "print('frame=60\\nfps=30.0\\nspeed=2.0x\\nout_time_us=2000000\\nprogress=end', flush=True)\n"
+    )
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    return [str(script), "-i", "in.mp4", "out.mp4"]
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="shebang script as the ffmpeg stand-in")
+def test_prometheus_textfile(metrics_files, tmp_path):
+    log_path, prom_path = metrics_files
+    during = []
+
+    def on_progress(block):
+        metrics.write_prometheus_textfile(min_interval=0)
+        during.append(prom_samples(prom_path))
+
+    with metrics.stage("render_clip", clip=2, video='a"b'):
+        metrics.run_ffmpeg(fake_ffmpeg(tmp_path), name="burn_subtitles", on_progress=on_progress)
+
+    gauge = 'clipgen_ffmpeg_fps{name="burn_subtitles",clip="2",video="a\\"b"}'
+    assert during[0][gauge] == "29.5"
+    assert during[1]['clipgen_ffmpeg_speed{name="burn_subtitles",clip="2",video="a\\"b"}'] == "2.0"
+    samples = prom_samples(prom_path)
+    # The gauges of a finished render are dropped
+    assert gauge not in samples
+    assert samples['clipgen_stage_runs_total{stage="render_clip"}'] == "1"
+    assert samples['clipgen_stage_errors_total{stage="render_clip"}'] == "0"
+    assert 'clipgen_stage_peak_children_rss_bytes{stage="render_clip"}' in samples
+    progress = events(log_path, "ffmpeg_progress")
+    assert progress[-1]["state"] == "end" and progress[-1]["clip"] == 2
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
@@ -0,0 +1,85 @@
+import threading
+import time
+
+import pytest
+
+from pipeline import Stage, StagedPipeline
+
+
+@pytest.fixture(autouse=True)
+def metrics_log(tmp_path, monkeypatch):
+    # Stage metrics go to a temporary log instead of stdout
+    monkeypatch.setenv("CLIPGEN_METRICS_LOG", str(tmp_path / "metrics.jsonl"))
+
+
+def run(stages, items, timeout=10):
+    '''Run the pipeline in a thread and fail instead of hanging if it does not shut down.'''
+    pipeline = StagedPipeline(stages)
+    outcome = {}
+    thread = threading.Thread(target=lambda: outcome.setdefault("results", pipeline.run(items)), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "pipeline did not shut down"
+    return outcome["results"], pipeline.errors
+
+
+def test_items_go_through_every_stage():
+    results, errors = run([
+        Stage("double", lambda x: x * 2, workers=2),
+        Stage("plus_one", lambda x: x + 1, workers=3),
+    ], range(10))
+    assert sorted(results) == [x * 2 + 1 for x in range(10)]
+    assert errors == []
+
+
+def test_fan_out_and_dropped_items():
+    results, _ = run([
+        Stage("clips", lambda video: [f"{video}_{n}" for n in range(video)], fan_out=True),
+        Stage("keep_first", lambda clip: clip if clip.endswith("_0") else None),
+    ], [1, 2, 3])
+    assert sorted(results) == ["1_0", "2_0", "3_0"]
+
+
+def test_bounded_queue_holds_back_a_fast_stage():
+    lock = threading.Lock()
+    counts = {"produced": 0, "consumed": 0, "lead": 0}
+
+    def produce(item):
+        with lock:
+            counts["produced"] += 1
+        return item
+
+    def consume(item):
+        with lock:
+            counts["consumed"] += 1
+            counts["lead"] = max(counts["lead"], counts["produced"] - counts["consumed"])
+        time.sleep(0.01)
+        return item
+
+    results, _ = run([Stage("fast", produce), Stage("slow", consume, queue_size=1)], range(20))
+    assert len(results) == 20
+    # One item in the queue and one waiting to be put: the fast stage is never further ahead
+    assert counts["lead"] <= 2
+
+
+def test_errors_are_collected_and_other_items_continue():
+    def check(item):
+        if item % 3 == 0:
+            raise ValueError(f"item {item}")
+        return item
+
+    results, errors = run([Stage("check", check, workers=2), Stage("same", lambda x: x)], range(7))
+    assert sorted(results) == [1, 2, 4, 5]
+    assert sorted((stage, item) for stage, item, _ in errors) == [("check", 0), ("check", 3), ("check", 6)]
+    assert all(isinstance(e, ValueError) for _, _, e in errors)
+
+
+def test_shuts_down_when_a_stage_fails_every_item():
+    later = []
+    results, errors = run([
+        Stage("download", lambda x: x, workers=2),
+        Stage("transcribe", lambda x: 1 / 0, workers=2),
+        Stage("render", later.append, workers=3),
+    ], range(5))
+    assert results == [] and later == []
+    assert len(errors) == 5 and {stage for stage, _, _ in errors} == {"transcribe"}
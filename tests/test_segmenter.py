@@ -0,0 +1,24 @@
+from segmenter import plan_cuts
+
+KEYFRAMES = [0.0, 2.0, 4.0, 6.0]
+
+
+def test_cut_on_a_keyframe_is_a_pure_copy():
+    assert plan_cuts([2.0, 4.0], KEYFRAMES) == [(2.0, 2.0), (4.0, 4.0)]
+
+
+def test_cut_near_a_keyframe_snaps_to_it():
+    # Within the tolerance, on either side
+    assert plan_cuts([1.7, 4.4], KEYFRAMES, tolerance=0.5) == [(2.0, 2.0), (4.0, 4.0)]
+
+
+def test_cut_between_keyframes_copies_from_the_next_one():
+    assert plan_cuts([3.0, 4.6], KEYFRAMES, tolerance=0.5) == [(3.0, 4.0), (4.6, 6.0)]
+    # A tolerance of 0 only keeps exact keyframes
+    assert plan_cuts([1.9], KEYFRAMES, tolerance=0) == [(1.9, 2.0)]
+
+
+def test_cut_after_the_last_keyframe_has_nothing_to_copy():
+    assert plan_cuts([6.2], KEYFRAMES, tolerance=0.5) == [(6.0, 6.0)]
+    assert plan_cuts([7.5], KEYFRAMES, tolerance=0.5) == [(7.5, None)]
+    assert plan_cuts([1.0], []) == [(1.0, None)]
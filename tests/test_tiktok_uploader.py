@@ -0,0 +1,163 @@
+import pytest
+
+pytest.importorskip("selenium")
+from selenium.common.exceptions import (NoSuchElementException, StaleElementReferenceException,
+                                        WebDriverException)
+from selenium.webdriver.common.by import By
+
+import tiktok_uploader
+from tiktok_uploader import SELECTORS, TikTokUploader
+
+
+class FakeElement:
+    def __init__(self, page, name, enabled=True):
+        self.page = page
+        self.name = name
+        self.enabled = enabled
+        self.stale = False
+        self.keys = []
+
+    def _check(self):
+        if self.stale:
+            raise StaleElementReferenceException(self.name)
+
+    def is_displayed(self):
+        self._check()
+        return True
+
+    def is_enabled(self):
+        self._check()
+        return self.enabled
+
+    def send_keys(self, value):
+        self._check()
+        self.keys.append(value)
+        self.page.on_keys(self, value)
+
+    def clear(self):
+        self.keys = []
+
+    def click(self):
+        self._check()
+        self.page.on_click(self)
+
+
+class FakeDriver:
+    '''
+    Stand-in for the TikTok upload page: the caption box appears once a file is
+    chosen, the post button is enabled after `processing_polls` checks, and the
+    page shows the confirmation once the post is clicked.
+    '''
+
+    def __init__(self, selectors=SELECTORS, processing_polls=2, caption_appears=True):
+        self.selectors = selectors
+        self.processing_polls = processing_polls
+        self.caption_appears = caption_appears
+        self.alive = True
+        self.visits = 0
+        self.posted = []
+        self.quit_called = False
+
+    def get(self, url):
+        self._check()
+        self.visits += 1
+        self.polls = 0
+        self.file = None
+        self.elements = {"file_input": FakeElement(self, "file_input")}
+
+    def find_element(self, by, value):
+        self._check()
+        for name, locator in self.selectors.items():
+            if locator == (by, value) and name in self.elements:
+                if name == "post_button" and not self.elements[name].enabled:
+                    self.polls += 1
+                    self.elements[name].enabled = self.polls >= self.processing_polls
+                return self.elements[name]
+        raise NoSuchElementException(value)
+
+    def on_keys(self, element, value):
+        if element.name == "file_input":
+            self.file = value
+            if self.caption_appears:
+                self.elements["caption"] = FakeElement(self, "caption")
+                self.elements["post_button"] = FakeElement(self, "post_button", enabled=False)
+
+    def on_click(self, element):
+        if element.name == "post_button":
+            self.posted.append((self.file, "".join(self.elements["caption"].keys)))
+            element.stale = True
+            del self.elements["post_button"]
+            self.elements["posted"] = FakeElement(self, "posted")
+
+    def _check(self):
+        if not self.alive:
+            raise WebDriverException("chrome not reachable")
+
+    @property
+    def current_url(self):
+        self._check()
+        return "https://www.tiktok.com/upload"
+
+    def quit(self):
+        self.quit_called = True
+
+
+@pytest.fixture
+def drivers(monkeypatch):
+    created = []
+
+    def chrome(options=None):
+        driver = FakeDriver()
+        created.append(driver)
+        return driver
+
+    monkeypatch.setattr(tiktok_uploader.webdriver, "Chrome", chrome)
+    return created
+
+
+def test_queue_uses_one_session(drivers, tmp_path):
+    with TikTokUploader(timeout=5) as uploader:
+        report = uploader.upload_many([("a.mp4", "first"), ("b.mp4", "second")])
+    assert [clip["ok"] for clip in report] == [True, True]
+    assert len(drivers) == 1
+    driver = drivers[0]
+    assert [(file.rsplit("/", 1)[-1], caption) for file, caption in driver.posted] == [("a.mp4", "first"), ("b.mp4", "second")]
+    assert driver.visits == 2
+    assert driver.quit_called
+
+
+def test_waits_for_processing_before_posting(drivers):
+    with TikTokUploader(timeout=5) as uploader:
+        drivers[0].processing_polls = 3
+        uploader.upload("a.mp4", "caption")
+        assert drivers[0].polls >= 3
+        assert len(drivers[0].posted) == 1
+
+
+def test_failed_clip_does_not_stop_the_queue(drivers):
+    with TikTokUploader(timeout=1) as uploader:
+        drivers[0].caption_appears = False
+        first = uploader.upload_many([("a.mp4", "first")])
+        drivers[0].caption_appears = True
+        second = uploader.upload_many([("b.mp4", "second")])
+    assert first[0]["ok"] is False
+    assert first[0]["error"].startswith("TimeoutException")
+    assert second[0]["ok"] is True
+
+
+def test_dead_browser_is_restarted(drivers):
+    with TikTokUploader(timeout=5) as uploader:
+        drivers[0].alive = False
+        report = uploader.upload_many([("a.mp4", "first"), ("b.mp4", "second")])
+    assert [clip["ok"] for clip in report] == [False, True]
+    assert len(drivers) == 2
+    assert len(drivers[1].posted) == 1
+
+
+def test_custom_selectors(monkeypatch):
+    selectors = dict(SELECTORS, caption=(By.CSS_SELECTOR, "div[contenteditable]"))
+    driver = FakeDriver(selectors=selectors)
+    monkeypatch.setattr(tiktok_uploader.webdriver, "Chrome", lambda options=None: driver)
+    with TikTokUploader(upload_url="file:///tmp/upload.html", timeout=5, selectors={"caption": selectors["caption"]}) as uploader:
+        uploader.upload("a.mp4", "caption")
+    assert driver.posted[0][1] == "caption"
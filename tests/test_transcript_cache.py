@@ -0,0 +1,79 @@
+import json
+import os
+
+import transcript_cache
+
+RESULT = {
+    "text": " Bonjour.",
+    "language": "fr",
+    "segments": [{"start": 0.0, "end": 1.0, "text": " Bonjour.", "words": [{"word": " Bonjour.", "start": 0.0, "end": 1.0, "probability": 0.9}]}],
+}
+
+
+def fake_hash(monkeypatch, calls):
+    def hash_audio_stream(media_path):
+        calls.append(media_path)
+        with open(media_path, "rb") as f:
+            return transcript_cache.hashlib.sha256(f.read()).hexdigest()
+    monkeypatch.setattr(transcript_cache, "hash_audio_stream", hash_audio_stream)
+
+
+def make_media(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_fingerprint_is_read_once_per_unchanged_file(tmp_path, monkeypatch):
+    calls = []
+    fake_hash(monkeypatch, calls)
+    cache_dir = str(tmp_path / "cache")
+    media = make_media(tmp_path, "a.mp4", b"audio a")
+    key = transcript_cache.cache_key(media, cache_dir=cache_dir)
+    assert transcript_cache.cache_key(media, cache_dir=cache_dir) == key
+    assert calls == [media]
+    assert transcript_cache.cache_key(media, model_name="small", cache_dir=cache_dir) != key
+    # Same audio at another path: same fingerprint prefix
+    copy = make_media(tmp_path, "b.mp4", b"audio a")
+    assert transcript_cache.cache_key(copy, cache_dir=cache_dir) == key
+
+
+def test_store_and_load_round_trip(tmp_path, monkeypatch):
+    fake_hash(monkeypatch, [])
+    cache_dir = str(tmp_path / "cache")
+    key = transcript_cache.cache_key(make_media(tmp_path, "a.mp4", b"audio a"), cache_dir=cache_dir)
+    assert transcript_cache.load(key, cache_dir) is None
+    transcript_cache.store(key, RESULT, cache_dir)
+    loaded = transcript_cache.load(key, cache_dir)
+    assert loaded["text"] == RESULT["text"]
+    assert loaded["segments"][0]["words"][0]["word"] == " Bonjour."
+    assert not [name for name in os.listdir(cache_dir) if name.endswith(".tmp")]
+
+
+def test_evicted_transcripts_take_their_fingerprints(tmp_path, monkeypatch):
+    fake_hash(monkeypatch, [])
+    cache_dir = str(tmp_path / "cache")
+    old_media = make_media(tmp_path, "old.mp4", b"old audio")
+    new_media = make_media(tmp_path, "new.mp4", b"new audio")
+    old_key = transcript_cache.cache_key(old_media, cache_dir=cache_dir)
+    transcript_cache.store(old_key, RESULT, cache_dir)
+    os.utime(transcript_cache._entry_path(old_key, cache_dir), (0, 0))
+    new_key = transcript_cache.cache_key(new_media, cache_dir=cache_dir)
+    entry_size = os.path.getsize(transcript_cache._entry_path(old_key, cache_dir))
+    transcript_cache.store(new_key, RESULT, cache_dir, max_bytes=entry_size + entry_size // 2)
+
+    assert transcript_cache.load(old_key, cache_dir) is None
+    assert transcript_cache.load(new_key, cache_dir) is not None
+    with open(os.path.join(cache_dir, transcript_cache.FINGERPRINTS_FILE), encoding="utf-8") as f:
+        assert list(json.load(f)) == [os.path.abspath(new_media)]
+
+
+def test_deleted_sources_are_forgotten(tmp_path, monkeypatch):
+    fake_hash(monkeypatch, [])
+    cache_dir = str(tmp_path / "cache")
+    media = make_media(tmp_path, "a.mp4", b"audio a")
+    key = transcript_cache.cache_key(media, cache_dir=cache_dir)
+    os.remove(media)
+    transcript_cache.store(key, RESULT, cache_dir)
+    with open(os.path.join(cache_dir, transcript_cache.FINGERPRINTS_FILE), encoding="utf-8") as f:
+        assert json.load(f) == {}
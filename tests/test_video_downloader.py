@@ -0,0 +1,137 @@
+import os
+import sys
+import threading
+import types
+
+import pytest
+
+import video_downloader
+
+
+class DownloadCancelled(Exception):
+    pass
+
+
+def fake_yt_dlp(monkeypatch, run):
+    '''Install a yt_dlp stand-in whose YoutubeDL runs run(outdir, hook) (yt_dlp is imported lazily).'''
+    class YoutubeDL:
+        def __init__(self, params):
+            self.params = params
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def extract_info(self, url, download=True):
+            outdir = os.path.dirname(self.params["outtmpl"])
+            return run(outdir, self.params["progress_hooks"][0])
+
+        def prepare_filename(self, info_dict):
+            return info_dict["filepath"]
+
+    yt_dlp = types.ModuleType("yt_dlp")
+    yt_dlp.YoutubeDL = YoutubeDL
+    utils = types.ModuleType("yt_dlp.utils")
+    utils.DownloadCancelled = DownloadCancelled
+    yt_dlp.utils = utils
+    monkeypatch.setitem(sys.modules, "yt_dlp", yt_dlp)
+    monkeypatch.setitem(sys.modules, "yt_dlp.utils", utils)
+
+
+def write(path):
+    with open(path, "wb") as f:
+        f.write(b"x")
+
+
+def test_cancelled_download_removes_partial_files(tmp_path, monkeypatch):
+    outdir = str(tmp_path)
+    kept = os.path.join(outdir, "other.mp4")
+    write(kept)
+    cancel_event = threading.Event()
+
+    def download(outdir, hook):
+        # Video stream finished, audio stream fragments in progress
+        video = os.path.join(outdir, "abc.f137.mp4")
+        write(video)
+        hook({"status": "finished", "filename": video})
+        audio = os.path.join(outdir, "abc.f140.m4a")
+        for leftover in [audio + ".part", audio + ".ytdl", audio + ".part-Frag1", audio + ".part-Frag2"]:
+            write(leftover)
+        cancel_event.set()
+        hook({"status": "downloading", "filename": audio, "tmpfilename": audio + ".part"})
+
+    fake_yt_dlp(monkeypatch, download)
+    with pytest.raises(DownloadCancelled):
+        video_downloader.download_video("https://www.youtube.com/watch?v=abc", outdir, cancel_event, use_cache=False)
+    assert os.listdir(outdir) == ["other.mp4"]
+
+
+def test_finished_download_is_kept(tmp_path, monkeypatch):
+    outdir = str(tmp_path)
+
+    def download(outdir, hook):
+        path = os.path.join(outdir, "abc.mp4")
+        write(path)
+        hook({"status": "finished", "filename": path})
+        return {"requested_downloads": [{"filepath": path}]}
+
+    fake_yt_dlp(monkeypatch, download)
+    path = video_downloader.download_video("https://www.youtube.com/watch?v=abc", outdir, threading.Event(), use_cache=False)
+    assert os.path.exists(path)
+
+
+def test_download_finishing_at_cancellation_is_kept(tmp_path, monkeypatch):
+    # c covers most of the budget, a completes it while b is still in flight
+    videos = [{"id": name, "url": name, "title": name, "duration": duration}
+              for name, duration in [("c", 50.0), ("b", 10.0), ("a", 10.0)]]
+    monkeypatch.setattr(video_downloader, "search_satisfying_videos", lambda: [dict(v) for v in videos])
+    monkeypatch.setattr(video_downloader.random, "shuffle", lambda items: None)
+    returned = []
+    monkeypatch.setattr(video_downloader.youtube_api, "client",
+                        lambda: types.SimpleNamespace(pool_add=lambda name, entries: returned.extend(entries)))
+    c_done = threading.Event()
+
+    def download_video(url, outdir, cancel_event, use_cache=True):
+        path = os.path.join(outdir, f"{url}.mp4")
+        if url == "a":
+            c_done.wait(5)
+        elif url == "b":
+            # Completes just as the run cancels the downloads still in flight
+            assert cancel_event.wait(5)
+        write(path)
+        if url == "c":
+            c_done.set()
+        return path
+
+    monkeypatch.setattr(video_downloader, "download_video", download_video)
+    result = video_downloader.acquire_satisfying_videos(60, outdir=str(tmp_path), max_workers=3, max_searches=1)
+    assert sorted(video["id"] for video in result) == ["a", "b", "c"]
+    assert all(os.path.exists(video["path"]) for video in result)
+    assert returned == []
+
+
+def test_download_finishing_after_a_failure_is_removed(tmp_path, monkeypatch):
+    searches = iter([[{"id": "b", "url": "b", "title": "b", "duration": 10.0}]])
+
+    def search_satisfying_videos():
+        try:
+            return next(searches)
+        except StopIteration:
+            raise RuntimeError("API indisponible")
+
+    monkeypatch.setattr(video_downloader, "search_satisfying_videos", search_satisfying_videos)
+    monkeypatch.setattr(video_downloader.youtube_api, "client",
+                        lambda: types.SimpleNamespace(pool_add=lambda name, entries: None))
+
+    def download_video(url, outdir, cancel_event, use_cache=True):
+        assert cancel_event.wait(5)
+        path = os.path.join(outdir, f"{url}.mp4")
+        write(path)
+        return path
+
+    monkeypatch.setattr(video_downloader, "download_video", download_video)
+    with pytest.raises(RuntimeError):
+        video_downloader.acquire_satisfying_videos(60, outdir=str(tmp_path), max_workers=3)
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,75 @@
+import json
+import shutil
+import subprocess
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("moviepy")
+if not (shutil.which("ffmpeg") and shutil.which("ffprobe")):
+    pytest.skip("ffmpeg/ffprobe not installed", allow_module_level=True)
+
+from benchmark import make_source
+from video_editor import edit_video, render_stacked_clip_single_pass
+
+WIDTH, HEIGHT = 1080, 1920
+DURATION = 2
+
+
+def probe(path):
+    result = subprocess.run([
+        "ffprobe", "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "stream=width,height:format=duration", "-of", "json", path
+    ], capture_output=True, text=True, check=True)
+    data = json.loads(result.stdout)
+    return data["streams"][0]["width"], data["streams"][0]["height"], float(data["format"]["duration"])
+
+
+def frame(path, t=1.0):
+    '''Gray frame of path at t seconds, as a HEIGHT x WIDTH array.'''
+    raw = subprocess.run([
+        "ffmpeg", "-v", "error", "-ss", str(t), "-i", path,
+        "-frames:v", "1", "-f", "rawvideo", "-pix_fmt", "gray", "-"
+    ], capture_output=True, check=True).stdout
+    return np.frombuffer(raw, dtype=np.uint8).reshape(HEIGHT, WIDTH).astype(np.float32)
+
+
+@pytest.fixture(scope="module")
+def renders(tmp_path_factory):
+    '''The same stacked clip rendered by moviepy (edit_video) and in a single ffmpeg run.'''
+    workdir = tmp_path_factory.mktemp("stacked")
+    # A wide main source (cropped to the width) over a satisfying source of another size and colour
+    main = make_source(str(workdir / "main.mp4"), DURATION, "1280x720")
+    satisfying = str(workdir / "satisfying.mp4")
+    subprocess.run([
+        "ffmpeg", "-y", "-v", "error", "-f", "lavfi", "-i", f"color=c=blue:size=1080x960:rate=30:duration={DURATION}",
+        "-f", "lavfi", "-i", f"sine=frequency=220:duration={DURATION}",
+        "-c:v", "libx264", "-pix_fmt", "yuv420p", "-c:a", "aac", "-shortest", satisfying
+    ], check=True)
+    moviepy_path = edit_video(main, satisfying, str(workdir / "moviepy.mp4"), start=0, duration=DURATION)
+    single_pass_path = render_stacked_clip_single_pass(main, satisfying, str(workdir / "single_pass.mp4"),
+                                                       duration=DURATION, preset="ultrafast")
+    return moviepy_path, single_pass_path
+
+
+def test_same_size_and_duration(renders):
+    moviepy_path, single_pass_path = renders
+    moviepy_width, moviepy_height, moviepy_duration = probe(moviepy_path)
+    width, height, duration = probe(single_pass_path)
+    assert (width, height) == (moviepy_width, moviepy_height) == (WIDTH, HEIGHT)
+    assert duration == pytest.approx(moviepy_duration, abs=0.1)
+
+
+def split_line(image):
+    '''First row of the uniform satisfying (blue) half: the rows below it stop changing.'''
+    row_spread = image.std(axis=1)
+    return int(np.argmax(row_spread[HEIGHT // 4:] < 2.0)) + HEIGHT // 4
+
+
+def test_same_split_line_and_picture(renders):
+    moviepy_frame, single_pass_frame = (frame(path) for path in renders)
+    assert split_line(single_pass_frame) == pytest.approx(HEIGHT // 2, abs=2)
+    assert split_line(single_pass_frame) == pytest.approx(split_line(moviepy_frame), abs=2)
+    # Same scaling and crop of each half, up to encoding noise
+    for half in (slice(0, HEIGHT // 2 - 4), slice(HEIGHT // 2 + 4, HEIGHT)):
+        assert np.abs(moviepy_frame[half] - single_pass_frame[half]).mean() < 8
@@ -0,0 +1,132 @@
+import types
+from datetime import datetime, timezone
+
+import pytest
+
+import video_downloader
+import youtube_api
+from youtube_api import QUOTA_COSTS, QuotaExceeded, YouTubeAPI
+
+
+class FakeSession:
+    '''Stand-in for requests.Session: records the calls and answers with `responses`.'''
+
+    def __init__(self, responses=None):
+        self.calls = []
+        self.responses = responses or []
+
+    def get(self, url, params=None, timeout=None):
+        self.calls.append((url.rsplit("/", 1)[1], dict(params)))
+        data = self.responses.pop(0) if self.responses else {"items": [{"id": len(self.calls)}]}
+        return types.SimpleNamespace(json=lambda: data)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    '''Controllable time.time() of youtube_api.'''
+    now = [1_000_000.0]
+    monkeypatch.setattr(youtube_api, "time", types.SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def pacific_now(monkeypatch, utc):
+    '''Make datetime.now(tz) in youtube_api return the moment `utc` (a UTC datetime).'''
+    class FixedDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return utc.astimezone(tz)
+
+    monkeypatch.setattr(youtube_api, "datetime", FixedDatetime)
+
+
+def make_api(tmp_path, session=None, **options):
+    api = YouTubeAPI(api_key="key", state_path=str(tmp_path / "youtube_api.json"), **options)
+    api.session = session or FakeSession()
+    return api
+
+
+def test_quota_day_rolls_over_at_midnight_pacific(monkeypatch):
+    # 23:59 in Los Angeles is already the next day in UTC
+    pacific_now(monkeypatch, datetime(2026, 1, 15, 7, 59, tzinfo=timezone.utc))
+    assert youtube_api.quota_day() == "2026-01-14"
+    pacific_now(monkeypatch, datetime(2026, 1, 15, 8, 0, tzinfo=timezone.utc))
+    assert youtube_api.quota_day() == "2026-01-15"
+    # Summer time: UTC-7
+    pacific_now(monkeypatch, datetime(2026, 7, 1, 7, 0, tzinfo=timezone.utc))
+    assert youtube_api.quota_day() == "2026-07-01"
+
+
+def test_quota_counts_units_and_stops_before_the_limit(tmp_path, clock):
+    api = make_api(tmp_path, daily_quota=350, quota_margin=50)
+    api.search("slime")
+    api.search("soap")
+    api.get("videos", id="abc")
+    assert api.quota_used() == 2 * QUOTA_COSTS["search"] + QUOTA_COSTS["videos"]
+    # 201 + 100 > 350 - 50: refused without calling the API
+    with pytest.raises(QuotaExceeded):
+        api.search("sand")
+    assert len(api.session.calls) == 3
+    # Units are counted in the state file shared with other processes
+    assert make_api(tmp_path).quota_used() == 201
+
+
+def test_quota_counter_resets_the_next_pacific_day(tmp_path, clock, monkeypatch):
+    pacific_now(monkeypatch, datetime(2026, 1, 15, 7, 0, tzinfo=timezone.utc))
+    api = make_api(tmp_path, daily_quota=250, quota_margin=0)
+    api.search("slime")
+    api.search("soap")
+    with pytest.raises(QuotaExceeded):
+        api.search("sand")
+    pacific_now(monkeypatch, datetime(2026, 1, 15, 8, 0, tzinfo=timezone.utc))
+    assert api.quota_used() == 0
+    api.search("sand")
+    assert api.quota_used() == QUOTA_COSTS["search"]
+
+
+def test_quota_exceeded_answer_uses_up_the_day(tmp_path, clock):
+    error = {"error": {"message": "quota", "errors": [{"reason": "quotaExceeded"}]}}
+    api = make_api(tmp_path, FakeSession([error]))
+    with pytest.raises(QuotaExceeded):
+        api.get("videos", id="abc")
+    assert api.quota_used() == api.daily_quota
+
+
+def test_cached_response_until_ttl(tmp_path, clock):
+    api = make_api(tmp_path)
+    first = api.search("slime", ttl=60)
+    clock[0] += 59
+    assert api.search("slime", ttl=60) == first
+    # Another process reads the cache from the state file
+    assert make_api(tmp_path).search("slime", ttl=60) == first
+    assert len(api.session.calls) == 1
+    clock[0] += 2
+    assert api.search("slime", ttl=60) != first
+    assert len(api.session.calls) == 2
+
+
+def test_stale_cache_is_used_when_the_quota_is_exhausted(tmp_path, clock):
+    api = make_api(tmp_path, daily_quota=100, quota_margin=0)
+    first = api.search("slime", ttl=60)
+    clock[0] += 120
+    assert api.search("slime", ttl=60) == first
+    with pytest.raises(QuotaExceeded):
+        api.search("soap", ttl=60)
+
+
+def test_satisfying_searches_share_the_cache_across_published_after(tmp_path, clock, monkeypatch):
+    api = make_api(tmp_path)
+    monkeypatch.setattr(youtube_api, "_client", api)
+    monkeypatch.setattr(video_downloader.random, "choice", lambda options: options[0])
+    dates = iter([0, 45])
+    monkeypatch.setattr(video_downloader.random, "randint", lambda low, high: next(dates))
+    api.session.responses = [
+        {"items": [{"id": {"videoId": "abc"}, "snippet": {"title": "Slime"}}]},
+        {"items": [{"id": "abc", "contentDetails": {"duration": "PT2M"}}]},
+    ]
+    first = video_downloader.fetch_satisfying_videos()
+    assert video_downloader.fetch_satisfying_videos() == first == [
+        {"id": "abc", "url": "https://www.youtube.com/watch?v=abc", "title": "Slime", "duration": 120.0}
+    ]
+    # One search and one durations lookup: the second run only hits the caches
+    assert [endpoint for endpoint, _ in api.session.calls] == ["search", "videos"]
+    assert "publishedAfter" in api.session.calls[0][1]
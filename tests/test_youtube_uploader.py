@@ -0,0 +1,204 @@
+import json
+import threading
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("googleapiclient")
+from google.auth.credentials import AnonymousCredentials
+
+import youtube_uploader
+from youtube_uploader import CHUNK_GRANULARITY, UploadError, UploadService
+
+
+class StandIn:
+    '''State of the local stand-in for the YouTube resumable upload endpoint.'''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sessions = {}  # session id -> received bytes
+        self.requests = []  # (method, content range)
+        self.fail_puts = []  # statuses answered to the next chunk PUTs instead of storing them
+        self.partial_ack = None  # store only this many bytes of the next chunk
+        self.expired = set()
+
+
+def make_handler(standin):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status, headers=(), body=None):
+            self.send_response(status)
+            for name, value in headers:
+                self.send_header(name, value)
+            payload = json.dumps(body).encode() if body is not None else b""
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            with standin.lock:
+                standin.requests.append(("POST", None))
+                session_id = str(len(standin.sessions) + 1)
+                standin.sessions[session_id] = bytearray()
+            host, port = self.server.server_address
+            self._reply(200, [("Location", f"http://{host}:{port}/session/{session_id}")])
+
+        def do_PUT(self):
+            session_id = self.path.rsplit("/", 1)[1]
+            data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            content_range = self.headers["Content-Range"]
+            with standin.lock:
+                standin.requests.append(("PUT", content_range))
+                if session_id in standin.expired:
+                    return self._reply(404)
+                received = standin.sessions[session_id]
+                size = int(content_range.rsplit("/", 1)[1])
+                if content_range.startswith("bytes */"):
+                    pass  # status query
+                elif standin.fail_puts:
+                    return self._reply(standin.fail_puts.pop(0))
+                else:
+                    start = int(content_range.split()[1].split("-")[0])
+                    assert start == len(received), "chunk does not continue the acknowledged bytes"
+                    if standin.partial_ack is not None:
+                        data, standin.partial_ack = data[:standin.partial_ack], None
+                    received.extend(data)
+                if len(received) == size:
+                    return self._reply(200, body={"id": f"video{session_id}"})
+                headers = [("Range", f"bytes=0-{len(received) - 1}")] if received else []
+                return self._reply(308, headers)
+
+    return Handler
+
+
+@pytest.fixture
+def standin():
+    state = StandIn()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(state))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address
+    state.url = f"http://{host}:{port}"
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(youtube_uploader, "time", types.SimpleNamespace(sleep=sleeps.append))
+    return sleeps
+
+
+@pytest.fixture
+def clip(tmp_path):
+    path = tmp_path / "clip.mp4"
+    path.write_bytes(bytes(range(256)) * (3 * CHUNK_GRANULARITY // 256) + b"tail")
+    return path
+
+
+def service(standin, tmp_path, **options):
+    return UploadService(credentials=AnonymousCredentials(), upload_url=standin.url,
+                         chunk_size=CHUNK_GRANULARITY, sessions_path=str(tmp_path / "sessions.json"), **options)
+
+
+def test_upload_in_chunks_and_skip_finished(standin, tmp_path, clip):
+    uploader = service(standin, tmp_path)
+    assert uploader.upload(str(clip), "Clip") == "video1"
+    assert bytes(standin.sessions["1"]) == clip.read_bytes()
+    assert [method for method, _ in standin.requests] == ["POST"] + ["PUT"] * 4
+
+    # A new service (e.g. restarted process) knows the file is already uploaded
+    requests_before = len(standin.requests)
+    assert service(standin, tmp_path).upload(str(clip), "Clip") == "video1"
+    assert len(standin.requests) == requests_before
+
+
+def test_retry_queries_offset_and_resumes(standin, tmp_path, clip, no_backoff):
+    standin.fail_puts = [503, 500]
+    assert service(standin, tmp_path).upload(str(clip), "Clip") == "video1"
+    assert bytes(standin.sessions["1"]) == clip.read_bytes()
+    assert len(no_backoff) == 2
+    # Each failure is followed by a status query before sending again
+    status_queries = [r for _, r in standin.requests if r and r.startswith("bytes */")]
+    assert len(status_queries) == 2
+
+
+def test_resume_from_acknowledged_byte(standin, tmp_path, clip):
+    standin.partial_ack = 1000
+    assert service(standin, tmp_path).upload(str(clip), "Clip") == "video1"
+    assert bytes(standin.sessions["1"]) == clip.read_bytes()
+    ranges = [r for method, r in standin.requests if method == "PUT"]
+    assert ranges[1].startswith("bytes 1000-")
+
+
+def test_saved_session_is_resumed_after_failure(standin, tmp_path, clip):
+    first = service(standin, tmp_path, max_retries=1)
+    original_put = first._put
+    calls = []
+
+    def put_then_fail(uri, data, content_range):
+        # The first chunk goes through, then the endpoint keeps failing
+        calls.append(content_range)
+        if len(calls) == 2:
+            standin.fail_puts = [503] * 10
+        return original_put(uri, data, content_range)
+
+    first._put = put_then_fail
+    with pytest.raises(UploadError):
+        first.upload(str(clip), "Clip")
+    assert len(standin.sessions["1"]) == CHUNK_GRANULARITY
+
+    standin.fail_puts = []
+    assert service(standin, tmp_path).upload(str(clip), "Clip") == "video1"
+    assert bytes(standin.sessions["1"]) == clip.read_bytes()
+    assert [method for method, _ in standin.requests].count("POST") == 1
+
+
+def test_expired_session_starts_over(standin, tmp_path, clip):
+    uploader = service(standin, tmp_path, max_retries=0)
+    standin.fail_puts = [503]
+    with pytest.raises(UploadError):
+        uploader.upload(str(clip), "Clip")
+    standin.expired.add("1")
+    assert service(standin, tmp_path).upload(str(clip), "Clip") == "video2"
+    assert bytes(standin.sessions["2"]) == clip.read_bytes()
+
+
+def test_rejected_upload_is_not_retried(standin, tmp_path, clip, no_backoff):
+    standin.fail_puts = [400]
+    with pytest.raises(UploadError):
+        service(standin, tmp_path).upload(str(clip), "Clip")
+    assert no_backoff == []
+
+
+def test_services_sharing_the_sessions_file_keep_each_others_entries(standin, tmp_path, clip):
+    # Two `cli.py upload` processes, each with its own state loaded at start
+    first, second = service(standin, tmp_path), service(standin, tmp_path)
+    other = tmp_path / "other.mp4"
+    other.write_bytes(b"other clip")
+    assert first.upload(str(clip), "Clip") == "video1"
+    assert second.upload(str(other), "Other") == "video2"
+    with open(tmp_path / "sessions.json", encoding="utf-8") as f:
+        uploaded = json.load(f)["uploaded"]
+    assert sorted(uploaded.values()) == ["video1", "video2"]
+
+    # The second service skips the file the first one uploaded after it started
+    requests_before = len(standin.requests)
+    assert second.upload(str(clip), "Clip") == "video1"
+    assert len(standin.requests) == requests_before
+    assert not [path for path in tmp_path.iterdir() if path.name.endswith(".tmp")]
+
+
+def test_session_started_by_another_service_is_continued(standin, tmp_path, clip):
+    first, second = service(standin, tmp_path, max_retries=0), service(standin, tmp_path)
+    standin.fail_puts = [503]
+    with pytest.raises(UploadError):
+        first.upload(str(clip), "Clip")
+    assert second.upload(str(clip), "Clip") == "video1"
+    assert [method for method, _ in standin.requests].count("POST") == 1
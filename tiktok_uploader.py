@@ -1,36 +1,129 @@
 """
 tiktok_uploader.py
 Automated TikTok video uploader using Selenium.
-- Upload a video to TikTok
+- Upload a queue of videos in one browser session
 - Set caption
+- Explicit waits (file accepted, upload processed, post done) instead of fixed pauses
+- Per-clip timing
 - Requires manual login for first use
+
+The upload page URL and element selectors can be changed, so the uploader can be
+run against a local stand-in page (e.g. upload_url="file:///tmp/upload.html").
 """
 
+import os
+import time
 from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
 from selenium.webdriver.common.by import By
-import time
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from metrics import stage
+
+UPLOAD_URL = "https://www.tiktok.com/upload"
+SELECTORS = {
+    "file_input": (By.XPATH, '//input[@type="file"]'),
+    "caption": (By.XPATH, '//textarea'),
+    "post_button": (By.XPATH, '//button[contains(text(),"Post")]'),
+    # Shown once the video is posted (the post button also goes away)
+    "posted": (By.XPATH, '//*[contains(text(),"Your video has been uploaded") or contains(text(),"Manage your posts")]'),
+}
+
+
+class TikTokUploader:
+    '''
+    One Chrome session reused for a queue of uploads.
+    Use as a context manager: `with TikTokUploader() as uploader: uploader.upload_many(...)`.
+    timeout: maximum wait for each step (file processing can take a while on long clips).
+    '''
+
+    def __init__(self, upload_url=UPLOAD_URL, user_data_dir="selenium", timeout=300, selectors=None, headless=False):
+        self.upload_url = upload_url
+        self.user_data_dir = user_data_dir
+        self.timeout = timeout
+        self.selectors = dict(SELECTORS, **(selectors or {}))
+        self.headless = headless
+        self.driver = None
+
+    def start(self):
+        if self.driver is None:
+            options = webdriver.ChromeOptions()
+            options.add_argument(f"--user-data-dir={self.user_data_dir}")
+            if self.headless:
+                options.add_argument("--headless=new")
+            self.driver = webdriver.Chrome(options=options)
+        return self.driver
+
+    def close(self):
+        if self.driver is not None:
+            self.driver.quit()
+            self.driver = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def upload(self, video_path, caption):
+        '''Upload one video and wait until it is posted. Returns the time it took (s).'''
+        driver = self.start()
+        wait = WebDriverWait(driver, self.timeout)
+        start = time.perf_counter()
+        with stage("tiktok_upload", clip=os.path.basename(video_path)):
+            driver.get(self.upload_url)
+            upload_input = wait.until(EC.presence_of_element_located(self.selectors["file_input"]))
+            upload_input.send_keys(os.path.abspath(video_path))
+            # The caption box appears once the file is accepted
+            caption_box = wait.until(EC.element_to_be_clickable(self.selectors["caption"]))
+            caption_box.clear()
+            caption_box.send_keys(caption)
+            # The post button is enabled once the upload is processed
+            post_button = wait.until(EC.element_to_be_clickable(self.selectors["post_button"]))
+            post_button.click()
+            wait.until(EC.any_of(
+                EC.staleness_of(post_button),
+                EC.presence_of_element_located(self.selectors["posted"])
+            ))
+        return time.perf_counter() - start
+
+    def upload_many(self, videos):
+        '''
+        Upload (video_path, caption) pairs one after the other in the same session.
+        A failed clip does not stop the queue; the browser is restarted if it died.
+        Returns [{"path", "ok", "seconds", "error"}, ...].
+        '''
+        report = []
+        for video_path, caption in videos:
+            start = time.perf_counter()
+            try:
+                seconds = self.upload(video_path, caption)
+                report.append({"path": video_path, "ok": True, "seconds": seconds, "error": None})
+                print(f"✅ TikTok : {video_path} publiée en {seconds:.1f}s")
+            except Exception as e:
+                seconds = time.perf_counter() - start
+                # Selenium timeouts have an empty message: keep the exception type
+                error = f"{type(e).__name__}: {e}".strip()
+                report.append({"path": video_path, "ok": False, "seconds": seconds, "error": error})
+                print(f"Error during TikTok upload of {video_path}: {error}")
+                if isinstance(e, WebDriverException) and not self._alive():
+                    self.close()
+        return report
+
+    def _alive(self):
+        try:
+            self.driver.current_url
+            return True
+        except WebDriverException:
+            return False
+
 
 def upload_to_tiktok(video_path, caption):
     '''
     Upload a video to TikTok with a caption using Selenium automation.
+    For several videos, use TikTokUploader.upload_many() to keep one browser session.
     '''
-    options = webdriver.ChromeOptions()
-    options.add_argument("--user-data-dir=selenium")
-    driver = webdriver.Chrome(options=options)
-    try:
-        driver.get("https://www.tiktok.com/upload")
-        time.sleep(10)
-        upload_input = driver.find_element(By.XPATH, '//input[@type="file"]')
-        upload_input.send_keys(video_path)
-        time.sleep(10)
-        caption_box = driver.find_element(By.XPATH, '//textarea')
-        caption_box.clear()
-        caption_box.send_keys(caption)
-        time.sleep(2)
-        post_button = driver.find_element(By.XPATH, '//button[contains(text(),"Post")]')
-        post_button.click()
-        time.sleep(10)
-    except Exception as e:
-        print(f"Error during TikTok upload: {e}")
-    finally:
-        driver.quit()
+    with TikTokUploader() as uploader:
+        uploader.upload_many([(video_path, caption)])
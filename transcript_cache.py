@@ -0,0 +1,175 @@
+"""
+transcript_cache.py
+Content-addressed cache of Whisper transcripts.
+- Key: hash of the audio stream packets (read with a stream copy, no decoding)
+  + model name + language + Whisper options
+- Compact gzip'd JSON storage of segments with word timestamps
+- Size-based eviction of the least recently used entries, with their fingerprints
+- Safe with concurrent processes (file lock, unique temporary files)
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import subprocess
+import tempfile
+
+from file_lock import locked, write_json_atomic
+
+CACHE_DIR = os.path.join("cache", "transcripts")
+MAX_CACHE_BYTES = 500 * 1024 * 1024
+FINGERPRINTS_FILE = "fingerprints.json"
+FINGERPRINT_PREFIX = 16  # hex digits of the fingerprint leading each entry name
+
+
+def _load_fingerprints(cache_dir):
+    path = os.path.join(cache_dir, FINGERPRINTS_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _locked_cache(cache_dir):
+    '''Lock shared by the fingerprint updates and the eviction of cache_dir.'''
+    return locked(os.path.join(cache_dir, FINGERPRINTS_FILE))
+
+
+def hash_audio_stream(media_path):
+    '''
+    SHA-256 of the packets of the first audio stream of media_path.
+    The stream is copied, not decoded, so hashing costs one read of the file; a
+    remux (e.g. the audio track muxed into the video) keeps the same packets.
+    '''
+    result = subprocess.run([
+        "ffmpeg", "-nostdin", "-v", "error",
+        "-i", media_path,
+        "-map", "0:a:0", "-c", "copy",
+        "-f", "hash", "-hash", "sha256", "-"
+    ], stdout=subprocess.PIPE, text=True, check=True)
+    return result.stdout.strip().split("=", 1)[1]
+
+
+def audio_fingerprint(media_path, cache_dir=CACHE_DIR):
+    '''
+    Fingerprint of the audio of media_path (see hash_audio_stream).
+    It is remembered per path with its size and mtime, so that unchanged files
+    are not read again.
+    '''
+    stat = os.stat(media_path)
+    path = os.path.abspath(media_path)
+    known = _load_fingerprints(cache_dir).get(path)
+    if known and known["size"] == stat.st_size and known["mtime"] == int(stat.st_mtime):
+        return known["fingerprint"]
+
+    fingerprint = hash_audio_stream(media_path)
+    with _locked_cache(cache_dir):
+        fingerprints = _load_fingerprints(cache_dir)
+        fingerprints[path] = {"size": stat.st_size, "mtime": int(stat.st_mtime), "fingerprint": fingerprint}
+        write_json_atomic(os.path.join(cache_dir, FINGERPRINTS_FILE), fingerprints)
+    return fingerprint
+
+
+def cache_key(media_path, model_name="base", language=None, options=None, cache_dir=CACHE_DIR):
+    '''
+    Cache key for a transcription of media_path with the given model and options.
+    It starts with the audio fingerprint, so evict() knows which fingerprints are
+    still in use.
+    '''
+    fingerprint = audio_fingerprint(media_path, cache_dir)
+    payload = json.dumps({
+        "audio": fingerprint,
+        "model": model_name,
+        "language": language,
+        "options": options or {},
+    }, sort_keys=True)
+    return f"{fingerprint[:FINGERPRINT_PREFIX]}_{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+
+def _entry_path(key, cache_dir):
+    return os.path.join(cache_dir, f"{key}.json.gz")
+
+
+def _pack(result):
+    '''Whisper result -> compact lists: [start, end, text, [[word, start, end, probability], ...]].'''
+    segments = []
+    for seg in result["segments"]:
+        words = [
+            [w["word"], round(float(w["start"]), 3), round(float(w["end"]), 3), round(float(w.get("probability", 0.0)), 3)]
+            for w in seg.get("words", [])
+        ]
+        segments.append([round(float(seg["start"]), 3), round(float(seg["end"]), 3), seg["text"], words])
+    return {"text": result["text"], "language": result.get("language"), "segments": segments}
+
+
+def _unpack(data):
+    '''Compact lists -> Whisper-shaped result dict.'''
+    segments = []
+    for i, (start, end, text, words) in enumerate(data["segments"]):
+        segments.append({
+            "id": i,
+            "start": start,
+            "end": end,
+            "text": text,
+            "words": [{"word": w, "start": s, "end": e, "probability": p} for w, s, e, p in words],
+        })
+    return {"text": data["text"], "language": data["language"], "segments": segments}
+
+
+def load(key, cache_dir=CACHE_DIR):
+    '''Return the cached Whisper result for key, or None on a miss.'''
+    path = _entry_path(key, cache_dir)
+    if not os.path.exists(path):
+        return None
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        data = json.load(f)
+    os.utime(path)  # mark as recently used
+    return _unpack(data)
+
+
+def store(key, result, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+    '''Store a Whisper result under key, then evict old entries above max_bytes.'''
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _entry_path(key, cache_dir)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as raw, gzip.open(raw, "wt", encoding="utf-8") as f:
+            json.dump(_pack(result), f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    evict(cache_dir, max_bytes)
+    return path
+
+
+def evict(cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+    '''
+    Delete the least recently used entries until the cache fits in max_bytes, then
+    forget the fingerprints no entry uses any more and those of deleted files.
+    '''
+    with _locked_cache(cache_dir):
+        entries = []
+        for name in os.listdir(cache_dir):
+            if name.endswith(".json.gz"):
+                path = os.path.join(cache_dir, name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        kept = set()
+        for _, size, path in sorted(entries):
+            if total > max_bytes:
+                os.remove(path)
+                total -= size
+            else:
+                kept.add(os.path.basename(path)[:FINGERPRINT_PREFIX])
+
+        fingerprints = _load_fingerprints(cache_dir)
+        in_use = {
+            path: known for path, known in fingerprints.items()
+            if known["fingerprint"][:FINGERPRINT_PREFIX] in kept and os.path.exists(path)
+        }
+        if len(in_use) < len(fingerprints):
+            write_json_atomic(os.path.join(cache_dir, FINGERPRINTS_FILE), in_use)
@@ -0,0 +1,102 @@
+"""
+transcription_worker.py
+Long-lived local transcription worker keeping Whisper models warm.
+- Serve transcription requests over a Unix socket
+- Client helper used by subtitle.transcribe_media()
+Run it once, e.g. `python transcription_worker.py --socket /tmp/whisper.sock --preload base`,
+then export WHISPER_WORKER_SOCKET=/tmp/whisper.sock for the pipeline runs.
+"""
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import threading
+
+from subtitle import get_whisper_model
+
+DEFAULT_SOCKET_PATH = "/tmp/whisper_worker.sock"
+
+
+def _to_json(value):
+    '''json.dumps fallback for numpy scalars/arrays in Whisper results.'''
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+class TranscriptionHandler(socketserver.StreamRequestHandler):
+    '''Handle one JSON request per connection and answer with one JSON line.'''
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+            model = get_whisper_model(request.get("model_name", "base"), request.get("device"))
+            # Whisper models are not thread-safe: one transcription at a time
+            with self.server.transcribe_lock:
+                result = model.transcribe(request["media_path"], **request.get("options", {}))
+            response = {"ok": True, "result": result}
+        except Exception as e:
+            response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        self.wfile.write(json.dumps(response, default=_to_json).encode("utf-8") + b"\n")
+
+
+class TranscriptionServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path):
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        super().__init__(socket_path, TranscriptionHandler)
+        self.transcribe_lock = threading.Lock()
+
+
+def serve(socket_path=DEFAULT_SOCKET_PATH, preload=("base",), device=None):
+    '''Start the worker, optionally preloading models, and serve until interrupted.'''
+    for model_name in preload:
+        get_whisper_model(model_name, device)
+        print(f"Modèle Whisper chargé : {model_name}")
+    server = TranscriptionServer(socket_path)
+    print(f"Worker de transcription en écoute sur {socket_path}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+def transcribe_via_worker(socket_path, media_path, model_name="base", device=None, **options):
+    '''
+    Send a transcription request to a running worker and return the Whisper result.
+    Raises OSError if the worker cannot be reached, RuntimeError if transcription failed.
+    '''
+    request = {
+        "media_path": os.path.abspath(media_path),
+        "model_name": model_name,
+        "device": device,
+        "options": options,
+    }
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as f:
+            line = f.readline()
+    if not line:
+        raise OSError("Connexion fermée par le worker de transcription.")
+    response = json.loads(line)
+    if not response["ok"]:
+        raise RuntimeError(response["error"])
+    return response["result"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warm Whisper transcription worker")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH)
+    parser.add_argument("--preload", nargs="*", default=["base"], help="Whisper models to load at startup")
+    parser.add_argument("--device", default=None)
+    args = parser.parse_args()
+    serve(args.socket, preload=args.preload, device=args.device)
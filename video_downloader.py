@@ -3,36 +3,46 @@ video_downloader.py
 Video download utilities for YouTube and satisfying background videos.
 - Download trending YouTube videos
 - Download random satisfying videos
+- Concurrent satisfying video acquisition within a duration budget
+- Resolution-capped format selection, separate audio/video downloads
+- Download cache keyed by (video ID, format), see download_cache.py
 - Utility for random date generation
+API calls go through youtube_api.py (session, cache, search pool, quota).
 """
 
-import requests
+import glob
 import os
-from yt_dlp import YoutubeDL
+import subprocess
 import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from datetime import datetime, timedelta
-import configparser
+from urllib.parse import urlparse, parse_qs
+import youtube_api
+import download_cache
+from youtube_api import parse_iso8601_duration
 
-config = configparser.ConfigParser()
-config.read('credential/youtube_credential.ini')
-YOUTUBE_API_KEY = config.get('youtube', 'api_key')
+SATISFYING_POOL = "satisfying"
+
+def get_trending_video_urls(count=1):
+    '''Get the URLs of the `count` most popular YouTube videos (at most 50).'''
+    video_ids = youtube_api.client().trending_video_ids(count, region_code="US") #Région du monde pas langue
+    if not video_ids:
+        raise Exception("Aucune vidéo retournée. Vérifie la clé API et les quotas.")
+    return [f"https://www.youtube.com/watch?v={video_id}" for video_id in video_ids]
 
 def get_trending_video_url():
     '''Get the URL of a trending YouTube video.'''
-    url = (
-        "https://www.googleapis.com/youtube/v3/videos"
-        "?part=snippet"
-        "&chart=mostPopular"
-        "&maxResults=1"
-        "&regionCode=US" #Région du monde pas langue
-        f"&key={YOUTUBE_API_KEY}"
-    )
-    response = requests.get(url)
-    data = response.json()
-    if "items" not in data or len(data["items"]) == 0:
-        raise Exception("Aucune vidéo retournée. Vérifie la clé API et les quotas.")
-    video_id = data["items"][0]["id"]
-    return f"https://www.youtube.com/watch?v={video_id}"
+    return get_trending_video_urls(1)[0]
+
+def video_id_from_url(video_url):
+    '''Extract the YouTube video ID from a watch/short/youtu.be URL (None if not found).'''
+    parsed = urlparse(video_url)
+    if parsed.hostname and parsed.hostname.endswith("youtu.be"):
+        return parsed.path.lstrip("/") or None
+    if parsed.path.startswith("/shorts/"):
+        return parsed.path.split("/")[2] or None
+    return parse_qs(parsed.query).get("v", [None])[0]
 
 def random_published_after(days_back=90):
     '''Generate a random publishedAfter date string for YouTube API.'''
@@ -40,8 +50,8 @@ def random_published_after(days_back=90):
     date = datetime.utcnow() - timedelta(days=delta_days)
     return date.strftime("%Y-%m-%dT00:00:00Z")
 
-def get_satisfying_video_url():
-    '''Get a random satisfying video URL from YouTube.'''
+def satisfying_search_params():
+    '''Build YouTube search parameters for a random satisfying subject/style.'''
     subjects = [
         "kinetic sand", "slime", "soap cutting", 
         "hydraulic press", "asmr cooking", "shaving foam"
@@ -51,38 +61,275 @@ def get_satisfying_video_url():
     ]
     subject = random.choice(subjects)
     style = random.choice(styles)
-    query = f"{subject} {style}"
-    published_after = random_published_after(90)
-    url = (
-        "https://www.googleapis.com/youtube/v3/search"
-        f"?part=snippet&type=video&maxResults=10&order=viewCount"
-        f"&q={requests.utils.quote(query)}"
-        f"&regionCode=FR&videoDuration=medium"
-        f"&publishedAfter={published_after}"
-        f"&key={YOUTUBE_API_KEY}"
+    return dict(
+        query=f"{subject} {style}",
+        maxResults=10,
+        order="viewCount",
+        regionCode="FR",
+        videoDuration="medium",
+        publishedAfter=random_published_after(90)
     )
-    response = requests.get(url)
-    data = response.json()
-    if "items" not in data or len(data["items"]) == 0:
+
+def fetch_satisfying_videos():
+    '''
+    Run one satisfying search and return the results with their durations, read from
+    the API metadata: [{"id", "url", "title", "duration"}, ...].
+    '''
+    api = youtube_api.client()
+    # The random publishedAfter would make every search a cache miss: a cached search
+    # of the same subject and style is as good as a new one
+    items = api.search(cache_ignore=("publishedAfter",), **satisfying_search_params())
+    if not items:
         raise Exception("Aucune vidéo trouvée. Vérifie les paramètres ou la clé API.")
-    video = random.choice(data["items"])
-    video_id = video["id"]["videoId"]
-    return f"https://www.youtube.com/watch?v={video_id}"
+    ids = [item["id"]["videoId"] for item in items]
+    durations = api.video_durations(ids)
+    titles = {item["id"]["videoId"]: item["snippet"]["title"] for item in items}
+    return [
+        {"id": video_id, "url": f"https://www.youtube.com/watch?v={video_id}",
+         "title": titles[video_id], "duration": durations[video_id]}
+        for video_id in ids if durations.get(video_id)
+    ]
 
-def download_video(video_url, outdir="downloads/video"):
-    '''Download a video from YouTube using yt_dlp.'''
+def search_satisfying_videos(count=10):
+    '''
+    Draw up to `count` satisfying videos from the local pool of search results.
+    The pool is topped up with one search (100 quota units) only when it runs low,
+    so one search serves several picks.
+    '''
+    api = youtube_api.client()
+    if api.pool_size(SATISFYING_POOL) < count:
+        api.pool_add(SATISFYING_POOL, fetch_satisfying_videos())
+    return api.pool_draw(SATISFYING_POOL, count)
+
+def get_satisfying_video_url():
+    '''Get a random satisfying video URL from YouTube.'''
+    videos = search_satisfying_videos(1)
+    if not videos:
+        raise Exception("Aucune vidéo trouvée. Vérifie les paramètres ou la clé API.")
+    return videos[0]["url"]
+
+def acquire_satisfying_videos(target_duration, outdir="downloads/satisfying", max_workers=4, max_searches=10):
+    '''
+    Download satisfying videos covering target_duration seconds.
+    Durations come from the search metadata, so a covering set is chosen before any
+    download. Downloads run concurrently (max_workers); once the downloaded footage
+    covers the budget, the remaining downloads are cancelled.
+    Returns [{"id", "url", "title", "duration", "path"}, ...].
+    '''
+    candidates = []
+    seen = set()
+    searches = 0
+
+    def next_candidate():
+        nonlocal searches
+        while not candidates:
+            if searches >= max_searches:
+                return None
+            searches += 1
+            for video in search_satisfying_videos():
+                if video["id"] not in seen:
+                    seen.add(video["id"])
+                    candidates.append(video)
+            random.shuffle(candidates)
+        return candidates.pop()
+
+    cancel_event = threading.Event()
+    downloaded = []
+    covered = 0.0
+    pending = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        try:
+            planned = 0.0
+            while covered < target_duration:
+                # Keep enough downloads in flight to cover what is still missing
+                while planned < target_duration and len(pending) < max_workers:
+                    video = next_candidate()
+                    if video is None:
+                        break
+                    # Not cached: the footage is normalized into the background library
+                    pending[pool.submit(download_video, video["url"], outdir, cancel_event, use_cache=False)] = video
+                    planned += video["duration"]
+                if not pending:
+                    raise Exception("Pas assez de vidéos satisfaisantes pour couvrir la durée demandée.")
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    video = pending.pop(future)
+                    try:
+                        video["path"] = future.result()
+                    except Exception as e:
+                        print(f"Erreur lors du téléchargement de {video['url']} : {e}")
+                        planned -= video["duration"]
+                        continue
+                    downloaded.append(video)
+                    covered += video["duration"]
+                    print(f"Téléchargée : {video['title']} ({video['duration']:.0f}s), total = {covered:.0f}s")
+        except BaseException:
+            # Nothing is returned: do not leave the downloads finished meanwhile on disk
+            cancel_event.set()
+            for video in _finish_pending(pending):
+                os.remove(video["path"])
+            raise
+        finally:
+            # Stop the downloads still running once the budget is covered (or on error)
+            cancel_event.set()
+            # Unused search results go back to the pool for the next run
+            youtube_api.client().pool_add(SATISFYING_POOL, candidates)
+        # Downloads that completed before they saw the cancellation are kept
+        downloaded.extend(_finish_pending(pending))
+    return downloaded
+
+def _finish_pending(pending):
+    '''Wait for the pending downloads ({future: video}); return the videos that completed, with their "path".'''
+    finished = []
+    for future in list(pending):
+        video = pending.pop(future)
+        try:
+            video["path"] = future.result()
+        except Exception:
+            continue  # cancelled: its partial files are already removed
+        finished.append(video)
+    return finished
+
+OUTPUT_HEIGHT = 1080
+AUDIO_FORMAT = 'ba[ext=m4a]/ba'
+
+def video_format_selector(min_height=OUTPUT_HEIGHT, with_audio=True):
+    '''
+    yt-dlp format selector for the smallest video stream at least min_height high
+    (mp4 preferred), falling back to the best available stream.
+    '''
+    audio = "+ba" if with_audio else ""
+    return (
+        f"wv*[height>={min_height}][ext=mp4]{audio}[ext=m4a]/"
+        f"wv*[height>={min_height}]{audio}/"
+        f"bv*{audio}/b"
+    )
+
+def _downloaded_path(ydl, info_dict):
+    '''Final path of a finished download (after merging), as reported by yt-dlp.'''
+    requested = info_dict.get("requested_downloads") or []
+    if requested and requested[0].get("filepath"):
+        return requested[0]["filepath"]
+    return ydl.prepare_filename(info_dict)
+
+def _run_ydl(video_url, ydl_opts):
+    '''Download video_url with yt_dlp (imported here, it is slow to import). Returns (path, info_dict).'''
+    from yt_dlp import YoutubeDL
+    with YoutubeDL(ydl_opts) as ydl:
+        info_dict = ydl.extract_info(video_url, download=True)
+        return _downloaded_path(ydl, info_dict), info_dict
+
+def _remove_partial_files(paths):
+    '''
+    Delete what yt-dlp leaves behind when a download is cancelled: the files it was
+    writing, their .part/.ytdl companions, the fragments of segmented formats and
+    the streams already fetched but not yet merged.
+    '''
+    for path in paths:
+        leftovers = [path, path + ".part", path + ".ytdl"] + glob.glob(glob.escape(path) + ".part-Frag*")
+        for leftover in leftovers:
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+def download_video(video_url, outdir="downloads/video", cancel_event=None, min_height=None, use_cache=True, hold=False):
+    '''
+    Download a video from YouTube using yt_dlp.
+    cancel_event: optional threading.Event; setting it aborts the download in progress
+    and deletes its partial files.
+    min_height: pick the smallest format at least this high instead of the default 'mp4'.
+    use_cache: answer from the download cache when this video/format was already
+    fetched, and keep the new download there (the returned file is owned by the cache).
+    hold: keep the cached file from being evicted until download_cache.release(path).
+    '''
+    format_selector = video_format_selector(min_height) if min_height else 'mp4'
+    video_id = video_id_from_url(video_url)
+    if use_cache and video_id:
+        cached = download_cache.lookup(video_id, format_selector, hold=hold)
+        if cached:
+            print(f"Vidéo en cache : {cached}")
+            return cached
     os.makedirs(outdir, exist_ok=True)
-    output_path = os.path.join(outdir, "%(title).50s.%(ext)s")
+    output_path = os.path.join(outdir, "%(id)s.%(ext)s")
+
+    from yt_dlp.utils import DownloadCancelled
+
+    written = set()
+
+    def check_cancelled(progress):
+        written.update(progress[key] for key in ("filename", "tmpfilename") if progress.get(key))
+        if cancel_event is not None and cancel_event.is_set():
+            raise DownloadCancelled("Téléchargement annulé")
+
     ydl_opts = {
-        'format': 'mp4',
+        'format': format_selector,
         'outtmpl': output_path,
         'quiet': False,
         'noplaylist': True,
-        'merge_output_format': 'mp4'
+        'merge_output_format': 'mp4',
+        'progress_hooks': [check_cancelled]
     }
-    with YoutubeDL(ydl_opts) as ydl:
-        info_dict = ydl.extract_info(video_url, download=True)
-        filename = ydl.prepare_filename(info_dict)
-        filename = filename.replace(".webm", ".mp4")
-        return filename
+    try:
+        path, info_dict = _run_ydl(video_url, ydl_opts)
+    except DownloadCancelled:
+        _remove_partial_files(written)
+        raise
+    if use_cache and video_id:
+        return download_cache.store(video_id, format_selector, path, hold=hold, url=video_url,
+                                    title=info_dict.get("title"), duration=info_dict.get("duration"))
+    return path
+
+def download_audio(video_url, outdir="downloads/video"):
+    '''Download only the audio track of a video (m4a preferred). Returns its path.'''
+    os.makedirs(outdir, exist_ok=True)
+    ydl_opts = {
+        'format': AUDIO_FORMAT,
+        'outtmpl': os.path.join(outdir, "%(id)s.audio.%(ext)s"),
+        'quiet': False,
+        'noplaylist': True
+    }
+    return _run_ydl(video_url, ydl_opts)[0]
+
+def download_video_stream(video_url, outdir="downloads/video", min_height=OUTPUT_HEIGHT):
+    '''Download only the video stream, in the smallest format covering min_height. Returns its path.'''
+    os.makedirs(outdir, exist_ok=True)
+    ydl_opts = {
+        'format': video_format_selector(min_height, with_audio=False),
+        'outtmpl': os.path.join(outdir, "%(id)s.video.%(ext)s"),
+        'quiet': False,
+        'noplaylist': True
+    }
+    return _run_ydl(video_url, ydl_opts)[0]
+
+def muxed_format(min_height=OUTPUT_HEIGHT):
+    '''Cache format key of download_video_stream() muxed with download_audio().'''
+    return f"{video_format_selector(min_height, with_audio=False)}+{AUDIO_FORMAT}"
+
+def cached_muxed_video(video_url, min_height=OUTPUT_HEIGHT, hold=False):
+    '''
+    Cached muxed video of video_url (no network access), or None.
+    hold: keep it from being evicted until download_cache.release(path).
+    '''
+    video_id = video_id_from_url(video_url)
+    return download_cache.lookup(video_id, muxed_format(min_height), hold=hold) if video_id else None
+
+def cache_muxed_video(video_url, path, min_height=OUTPUT_HEIGHT, hold=False):
+    '''
+    Move a muxed download into the download cache. Returns its new path.
+    hold: keep it from being evicted until download_cache.release(path).
+    '''
+    video_id = video_id_from_url(video_url)
+    if not video_id:
+        return path
+    return download_cache.store(video_id, muxed_format(min_height), path, hold=hold, url=video_url)
 
+def mux_audio_video(video_path, audio_path, output_path):
+    '''Join a video-only and an audio-only file into an mp4 without re-encoding.'''
+    subprocess.run([
+        "ffmpeg", "-y", "-v", "error",
+        "-i", video_path, "-i", audio_path,
+        "-map", "0:v:0", "-map", "1:a:0",
+        "-c", "copy",
+        "-movflags", "+faststart",
+        output_path
+    ], check=True)
+    return output_path
@@ -3,22 +3,91 @@ video_editor.py
 Video editing utilities for TikTok/YouTube automation.
 - Split video into 1-minute clips
 - Edit video with satisfying or blurred background
-- Merge multiple videos
+- Merge multiple videos (stream copy, mismatched inputs conformed once: media_merge.py)
+- Single-pass ffmpeg rendering of the stacked and blurred background layouts
+- Blurred backgrounds computed at reduced resolution, optionally once per source (blur track)
+- Single-pass renders at any 9:16 size and x264 preset (low resolution previews)
+moviepy is imported inside the functions using it, the ffmpeg paths do not need it;
+its readers are shared and capped through media_readers.READERS.
 """
 
 import subprocess
-from moviepy.editor import VideoFileClip, CompositeVideoClip, concatenate_videoclips
 import os
+import media_merge
+from media_readers import READERS
+from metrics import run_ffmpeg
+
+ENDING_PATH = os.path.join("downloads", "video", "ending.mp4")
+
+# Blur strength for a 1080px wide output (scaled with the output width); the
+# background is blurred at 1/factor of the output size (with sigma / factor) and
+# scaled back up, which looks the same for a blur this strong and costs a fraction
+# of a full-resolution gblur.
+BLUR_SIGMA = 36
+BLUR_DOWNSCALE = {"fast": 8, "balanced": 4, "high": 2}
+
+
+def blur_size(width=1080, height=1920, quality="balanced"):
+    '''Reduced (even) size at which the background is blurred.'''
+    factor = BLUR_DOWNSCALE[quality]
+    return width // factor // 2 * 2, height // factor // 2 * 2
+
+
+def blur_filter(width=1080, height=1920, quality="balanced", upscale=True):
+    '''
+    ffmpeg filter chain for the blurred background: cover-crop the source at the
+    reduced size, blur it, then (if upscale) scale it back to width x height.
+    quality: "fast", "balanced" or "high" (blur resolution 1/8, 1/4 or 1/2).
+    '''
+    small_width, small_height = blur_size(width, height, quality)
+    chain = (
+        f"scale={small_width}:{small_height}:force_original_aspect_ratio=increase,"
+        f"crop={small_width}:{small_height},gblur=sigma={BLUR_SIGMA * width / 1080 / BLUR_DOWNSCALE[quality]:g}"
+    )
+    if upscale:
+        chain += f",scale={width}:{height}:flags=bilinear"
+    return chain + ",setsar=1"
+
+
+def render_blur_track(input_path, output_path, quality="balanced", fps=30):
+    '''
+    Render the blurred background of a whole source once, at the reduced blur size,
+    so every clip only has to cut and upscale its time range (see blur_track in the
+    render functions). An existing track newer than the source is reused.
+    '''
+    if os.path.exists(output_path) and os.path.getmtime(output_path) >= os.path.getmtime(input_path):
+        return output_path
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    tmp_path = os.path.splitext(output_path)[0] + ".part.mp4"
+    run_ffmpeg([
+        "ffmpeg", "-y",
+        "-i", input_path,
+        "-vf", f"{blur_filter(quality=quality, upscale=False)},fps={fps},format=yuv420p",
+        "-an",
+        "-c:v", "libx264", "-preset", "veryfast", "-crf", "23",
+        "-g", str(fps),  # one keyframe per second keeps the per-clip seeks cheap
+        tmp_path
+    ], name="blur_track", check=True, output=output_path)
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+def temp_audiofile_for(output_path):
+    '''
+    Temporary audio file used by moviepy when writing output_path.
+    moviepy puts it in the current directory by default, where concurrent renders would collide.
+    '''
+    return os.path.splitext(output_path)[0] + "TEMP_MPY_wvf_snd.mp4"
 
 def split_video(path):
     '''Split a video into 1-minute clips and save them to the clips/ directory.'''
-    clip = VideoFileClip(path)
     clips = []
-    for i in range(0, int(clip.duration), 60):
-        subclip = clip.subclip(i, min(i+60, clip.duration))
-        out_name = f"clips/clip_{i//60}.mp4"
-        subclip.write_videofile(out_name, codec="libx264", audio_codec="aac")
-        clips.append(out_name)
+    with READERS.open(path) as clip:
+        for i in range(0, int(clip.duration), 60):
+            subclip = clip.subclip(i, min(i+60, clip.duration))
+            out_name = f"clips/clip_{i//60}.mp4"
+            subclip.write_videofile(out_name, codec="libx264", audio_codec="aac", temp_audiofile=temp_audiofile_for(out_name))
+            clips.append(out_name)
     return clips
 
 
@@ -26,85 +95,256 @@ def edit_video(main_clip_path, satisfying_clip_path, output_path, start=0, durat
     '''
     Edit a video by stacking the main and satisfying clips vertically for TikTok format.
     '''
-    main_clip = VideoFileClip(main_clip_path).subclip(start, start + duration)
-    satisfying_clip = VideoFileClip(satisfying_clip_path).subclip(0, 60)  # 1 min max
+    from moviepy.editor import CompositeVideoClip
     width = 1080
     height = 1920
     half_height = height // 2
-    main_clip_resized = main_clip.resize(width=width, height=half_height)
-    satisfying_clip_resized = satisfying_clip.resize(width=width, height=half_height)
-    main_clip_pos = main_clip_resized.set_position(("center", "top"))
-    satisfying_clip_pos = satisfying_clip_resized.set_position(("center", half_height))
-
-    final_clip = CompositeVideoClip(
-        [main_clip_pos, satisfying_clip_pos],
-        size=(width, height)
-    )
-    final_clip.write_videofile(output_path, codec="libx264", audio_codec="aac")
-    main_clip.close()
-    satisfying_clip.close()
-    final_clip.close()
+    # The inputs are usually per-clip segments: their readers are not kept
+    with READERS.open(main_clip_path, keep=False) as main_source, \
+            READERS.open(satisfying_clip_path, keep=False) as satisfying_source:
+        main_clip = main_source.subclip(start, start + duration)
+        satisfying_clip = satisfying_source.subclip(0, min(60, satisfying_source.duration))  # 1 min max
+        main_clip_resized = main_clip.resize(width=width, height=half_height)
+        satisfying_clip_resized = satisfying_clip.resize(width=width, height=half_height)
+        main_clip_pos = main_clip_resized.set_position(("center", "top"))
+        satisfying_clip_pos = satisfying_clip_resized.set_position(("center", half_height))
+
+        final_clip = CompositeVideoClip(
+            [main_clip_pos, satisfying_clip_pos],
+            size=(width, height)
+        )
+        final_clip.write_videofile(output_path, codec="libx264", audio_codec="aac", temp_audiofile=temp_audiofile_for(output_path))
     return output_path
 
 
 def merge_videos(video_paths, output_path):
-    '''Merge a list of videos into a single continuous video.'''
-    clips = [VideoFileClip(p) for p in video_paths]
-    final_clip = concatenate_videoclips(clips, method="compose")
-    final_clip.write_videofile(output_path, codec="libx264", audio_codec="aac")
-    for c in clips:
-        c.close()
-    final_clip.close()
-    return output_path
+    '''
+    Merge a list of videos into a single continuous video.
+    Inputs matching the first one are joined by stream copy; the others (e.g. the
+    ending card) are conformed to its format once and cached (see media_merge.py).
+    '''
+    return media_merge.merge(video_paths, output_path)
 
 
-def edit_video_blur_background(input_path, output_path, duration=60):
+def edit_video_blur_background(input_path, output_path, duration=60, workdir=".",
+                               blur_quality="balanced", blur_track=None, blur_start=0):
     '''
     Create a vertical (9:16) video with a blurred background and a centered square crop in the foreground.
     Appends ending.mp4 to the final video.
+    workdir: directory for the intermediate files, one per concurrent render.
+    blur_track: optional render_blur_track() output of the whole source; the background
+    is then cut from it at blur_start instead of being blurred again.
     '''
+    from moviepy.editor import CompositeVideoClip
     width = 1080
     height = 1920
     square_size = width
-    blurred_path = "temp_blurred.mp4"
-    temp_final_path = "temp_final_with_blur.mp4"
+    blurred_path = os.path.join(workdir, "temp_blurred.mp4")
+    temp_final_path = os.path.join(workdir, "temp_final_with_blur.mp4")
 
     # Generate blurred background with ffmpeg
+    if blur_track:
+        blur_input = ["-ss", str(blur_start), "-t", str(duration), "-i", blur_track]
+        blur_vf = f"scale={width}:{height}:flags=bilinear,setsar=1"
+    else:
+        blur_input = ["-i", input_path, "-t", str(duration)]
+        blur_vf = blur_filter(width, height, blur_quality)
     ffmpeg_blur_command = [
         "ffmpeg",
         "-y",
-        "-i", input_path,
-        "-t", str(duration),
-        "-vf", "gblur=sigma=20,scale=1080:1920:force_original_aspect_ratio=increase,crop=1080:1920",
+        *blur_input,
+        "-vf", blur_vf,
         "-an",
         blurred_path
     ]
-    subprocess.run(ffmpeg_blur_command, check=True)
-    base_clip = VideoFileClip(input_path).subclip(0, duration)
-    blurred_clip = VideoFileClip(blurred_path)
-    # Crop 1:1 centered
-    min_side = min(base_clip.w, base_clip.h)
-    x_center = base_clip.w // 2
-    y_center = base_clip.h // 2
-    x1 = x_center - square_size // 2
-    y1 = y_center - square_size // 2
-    x2 = x1 + square_size
-    y2 = y1 + square_size
-    square_clip = (
-        base_clip.crop(x1=max(0, x1), y1=max(0, y1), x2=min(base_clip.w, x2), y2=min(base_clip.h, y2))
-        .resize((square_size, square_size))
-        .set_position(("center", (height - square_size) // 2))
-    )
-    final_clip = CompositeVideoClip([blurred_clip.set_position((0, 0)), square_clip], size=(width, height))
-    final_clip.write_videofile(temp_final_path, codec="libx264", audio_codec="aac")
-    ending_path = r"downloads\video\ending.mp4"
+    run_ffmpeg(ffmpeg_blur_command, name="blur_background", check=True)
+    # Both inputs are scratch files deleted below: their readers are not kept
+    with READERS.open(input_path, keep=False) as base_source, READERS.open(blurred_path, keep=False) as blurred_clip:
+        base_clip = base_source.subclip(0, duration)
+        # Crop 1:1 centered
+        x_center = base_clip.w // 2
+        y_center = base_clip.h // 2
+        x1 = x_center - square_size // 2
+        y1 = y_center - square_size // 2
+        x2 = x1 + square_size
+        y2 = y1 + square_size
+        square_clip = (
+            base_clip.crop(x1=max(0, x1), y1=max(0, y1), x2=min(base_clip.w, x2), y2=min(base_clip.h, y2))
+            .resize((square_size, square_size))
+            .set_position(("center", (height - square_size) // 2))
+        )
+        final_clip = CompositeVideoClip([blurred_clip.set_position((0, 0)), square_clip], size=(width, height))
+        final_clip.write_videofile(temp_final_path, codec="libx264", audio_codec="aac", temp_audiofile=temp_audiofile_for(temp_final_path))
+    ending_path = ENDING_PATH
     merge_videos([temp_final_path, ending_path], output_path)
-    base_clip.close()
-    blurred_clip.close()
-    square_clip.close()
-    final_clip.close()
     if os.path.exists(blurred_path):
         os.remove(blurred_path)
     if os.path.exists(temp_final_path):
         os.remove(temp_final_path)
-    return output_path
\ No newline at end of file
+    return output_path
+
+def has_audio_stream(path):
+    '''Return True if the media file contains at least one audio stream.'''
+    result = subprocess.run([
+        "ffprobe", "-v", "error",
+        "-select_streams", "a",
+        "-show_entries", "stream=index",
+        "-of", "csv=p=0",
+        path
+    ], capture_output=True, text=True, check=True)
+    return bool(result.stdout.strip())
+
+
+def probe_duration(path):
+    '''Return the container duration of a media file in seconds, without decoding it.'''
+    result = subprocess.run([
+        "ffprobe", "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "csv=p=0",
+        path
+    ], capture_output=True, text=True, check=True)
+    return float(result.stdout.strip())
+
+
+def render_stacked_clip_single_pass(
+    main_clip_path,
+    satisfying_clip_path,
+    output_path,
+    main_start=0,
+    satisfying_start=0,
+    duration=60,
+    subtitle_filter=None,
+    fps=30,
+    preset="medium",
+    width=1080,
+    height=1920
+):
+    '''
+    ffmpeg equivalent of edit_video(): stack the main clip over the satisfying clip.
+    Both sources are read directly at their time offsets and the width x height clip
+    (1080x1920 by default) is written in a single run. Each half is scaled to half the
+    height, centered and cropped (or padded) to the width, as moviepy does, and both
+    audio tracks are mixed.
+    '''
+    half_height = height // 2
+    half_filter = (
+        f"scale=-2:{half_height},crop='min(iw,{width})':{half_height},"
+        f"pad={width}:{half_height}:(ow-iw)/2:0,setsar=1"
+    )
+    stacked_filters = ["vstack=inputs=2"]
+    if subtitle_filter:
+        stacked_filters.append(subtitle_filter)
+    stacked_filters.append(f"fps={fps},format=yuv420p")
+
+    graph = [
+        f"[0:v]{half_filter}[top]",
+        f"[1:v]{half_filter}[bottom]",
+        "[top][bottom]" + ",".join(stacked_filters) + "[v]",
+    ]
+    audio_inputs = [f"[{i}:a]" for i, path in enumerate([main_clip_path, satisfying_clip_path]) if has_audio_stream(path)]
+    if len(audio_inputs) == 2:
+        graph.append("".join(audio_inputs) + "amix=inputs=2:duration=first:normalize=0[a]")
+    elif audio_inputs:
+        graph.append(f"{audio_inputs[0]}anull[a]")
+    else:
+        graph.append(f"anullsrc=r=44100:cl=stereo,atrim=duration={duration}[a]")
+
+    ffmpeg_command = [
+        "ffmpeg", "-y",
+        "-ss", str(main_start), "-t", str(duration), "-i", main_clip_path,
+        "-ss", str(satisfying_start), "-t", str(duration), "-i", satisfying_clip_path,
+        "-filter_complex", ";".join(graph),
+        "-map", "[v]", "-map", "[a]",
+        "-c:v", "libx264", "-preset", preset,
+        "-c:a", "aac",
+        "-movflags", "+faststart",
+        output_path
+    ]
+    run_ffmpeg(ffmpeg_command, name="render_stacked", check=True, output=output_path)
+    return output_path
+
+
+def render_blur_clip_single_pass(
+    input_path,
+    output_path,
+    start=0,
+    duration=60,
+    subtitle_filter=None,
+    ending_path=ENDING_PATH,
+    fps=30,
+    preset="medium",
+    blur_quality="balanced",
+    blur_track=None,
+    width=1080,
+    height=1920
+):
+    '''
+    Render a blurred background clip in a single ffmpeg run.
+    Seeks into the source, builds the blurred 9:16 background and the centered
+    square overlay, burns the subtitles and appends the ending, decoding the
+    source once and encoding the output once.
+    subtitle_filter: optional filter from subtitle.build_subtitle_filter(), with
+    subtitle timings relative to `start`.
+    blur_quality: resolution of the blur (see blur_filter()).
+    blur_track: optional render_blur_track() output of the whole source; its
+    [start, start + duration] range is upscaled instead of blurring the clip.
+    width, height: output size (a smaller 9:16 size and a faster preset make a preview).
+    '''
+    square_size = width
+
+    main_filters = [f"overlay=(W-w)/2:{(height - square_size) // 2}"]
+    if subtitle_filter:
+        main_filters.append(subtitle_filter)
+    main_filters.append(f"fps={fps},format=yuv420p,setsar=1")
+    audio_format = "aformat=sample_rates=44100:channel_layouts=stereo"
+
+    # The square is cut from the source as in the 1080px render, whatever the output size
+    foreground = f"crop='min(iw,1080)':'min(ih,1080)',scale={square_size}:{square_size}"
+    inputs = ["-ss", str(start), "-t", str(duration), "-i", input_path]
+    if blur_track:
+        inputs += ["-ss", str(start), "-t", str(duration), "-i", blur_track]
+        graph = [
+            f"[0:v]{foreground}[fg]",
+            f"[1:v]scale={width}:{height}:flags=bilinear,setsar=1[bg]",
+        ]
+    else:
+        graph = [
+            "[0:v]split=2[bgsrc][fgsrc]",
+            f"[bgsrc]{blur_filter(width, height, blur_quality)}[bg]",
+            f"[fgsrc]{foreground}[fg]",
+        ]
+    graph.append("[bg][fg]" + ",".join(main_filters) + "[mainv]")
+    if has_audio_stream(input_path):
+        graph.append(f"[0:a]{audio_format}[maina]")
+    else:
+        graph.append(f"anullsrc=r=44100:cl=stereo,atrim=duration={duration}[maina]")
+
+    if ending_path:
+        ending = 2 if blur_track else 1
+        inputs += ["-i", ending_path]
+        graph.append(
+            f"[{ending}:v]scale={width}:{height}:force_original_aspect_ratio=decrease,"
+            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,fps={fps},format=yuv420p,setsar=1[endv]"
+        )
+        if has_audio_stream(ending_path):
+            graph.append(f"[{ending}:a]{audio_format}[enda]")
+        else:
+            ending_duration = probe_duration(ending_path)
+            graph.append(f"anullsrc=r=44100:cl=stereo,atrim=duration={ending_duration}[enda]")
+        graph.append("[mainv][maina][endv][enda]concat=n=2:v=1:a=1[v][a]")
+    else:
+        graph.append("[mainv]null[v]")
+        graph.append("[maina]anull[a]")
+
+    ffmpeg_command = [
+        "ffmpeg", "-y",
+        *inputs,
+        "-filter_complex", ";".join(graph),
+        "-map", "[v]", "-map", "[a]",
+        "-c:v", "libx264", "-preset", preset,
+        "-c:a", "aac",
+        "-movflags", "+faststart",
+        output_path
+    ]
+    run_ffmpeg(ffmpeg_command, name="render_blur", check=True, output=output_path)
+    return output_path
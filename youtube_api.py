@@ -0,0 +1,227 @@
+"""
+youtube_api.py
+Client for the YouTube Data API v3 (read-only calls used by the downloader).
+- One shared requests.Session with timeouts and retries
+- TTL cache of trending charts and search results, persisted under cache/
+- Local pool of search results to draw repeated picks from
+- Per-day quota unit counter that stops before the daily limit, shared by all
+  processes: the state file is locked and read again before each update
+- Credentials read on first use, not at import
+"""
+
+import configparser
+import json
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from file_lock import locked, write_json_atomic
+
+API_URL = "https://www.googleapis.com/youtube/v3"
+CREDENTIAL_PATH = os.path.join("credential", "youtube_credential.ini")
+STATE_PATH = os.path.join("cache", "youtube_api.json")
+
+# Quota units per call (https://developers.google.com/youtube/v3/determine_quota_cost)
+QUOTA_COSTS = {"search": 100, "videos": 1}
+DAILY_QUOTA = 10000
+QUOTA_MARGIN = 500  # keep some units for uploads and manual runs
+TRENDING_TTL = 60 * 60
+SEARCH_TTL = 24 * 60 * 60
+POOL_TTL = 7 * 24 * 60 * 60
+
+
+class QuotaExceeded(Exception):
+    '''The daily quota (minus the safety margin) would be exceeded by the call.'''
+
+
+def parse_iso8601_duration(duration):
+    '''Convert a YouTube ISO 8601 duration ("PT1H4M13S") to seconds.'''
+    match = re.fullmatch(r"P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?", duration or "")
+    if not match:
+        return 0.0
+    days, hours, minutes, seconds = (int(x) if x else 0 for x in match.groups())
+    return float(((days * 24 + hours) * 60 + minutes) * 60 + seconds)
+
+
+def quota_day():
+    '''The API quota resets at midnight Pacific time.'''
+    return datetime.now(ZoneInfo("America/Los_Angeles")).strftime("%Y-%m-%d")
+
+
+class YouTubeAPI:
+    '''
+    YouTube Data API client. State (cache, pool, quota counter) is kept in
+    state_path so it is shared by successive runs.
+    '''
+
+    def __init__(self, api_key=None, state_path=STATE_PATH, daily_quota=DAILY_QUOTA,
+                 quota_margin=QUOTA_MARGIN, timeout=(5, 30), retries=3):
+        self._api_key = api_key
+        self.state_path = state_path
+        self.daily_quota = daily_quota
+        self.quota_margin = quota_margin
+        self.timeout = timeout
+        self.session = requests.Session()
+        retry = Retry(total=retries, backoff_factor=1, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=["GET"])
+        self.session.mount("https://", HTTPAdapter(max_retries=retry))
+        self._lock = threading.RLock()
+        self._state = self._load_state()
+
+    @property
+    def api_key(self):
+        if self._api_key is None:
+            self._api_key = os.environ.get("YOUTUBE_API_KEY")
+        if self._api_key is None:
+            config = configparser.ConfigParser()
+            config.read(CREDENTIAL_PATH)
+            self._api_key = config.get('youtube', 'api_key')
+        return self._api_key
+
+    def _load_state(self):
+        state = {"cache": {}, "durations": {}, "pools": {}, "quota": {"day": None, "used": 0}}
+        if os.path.exists(self.state_path):
+            with open(self.state_path, encoding="utf-8") as f:
+                state.update(json.load(f))
+        return state
+
+    def _save_state(self):
+        now = time.time()
+        self._state["cache"] = {k: v for k, v in self._state["cache"].items() if v["expires"] > now}
+        write_json_atomic(self.state_path, self._state)
+
+    @contextmanager
+    def _update_state(self):
+        '''
+        Read-modify-write of the state under the file lock: changes made by other
+        processes since our last read (quota units, pools) are kept.
+        '''
+        with self._lock, locked(self.state_path):
+            self._state = self._load_state()
+            yield self._state
+            self._save_state()
+
+    def quota_used(self):
+        quota = self._state["quota"]
+        return quota["used"] if quota["day"] == quota_day() else 0
+
+    def _reserve_quota(self, endpoint):
+        cost = QUOTA_COSTS.get(endpoint, 1)
+        used = self.quota_used()
+        if used + cost > self.daily_quota - self.quota_margin:
+            raise QuotaExceeded(f"Quota YouTube presque atteint ({used}/{self.daily_quota} unités aujourd'hui)")
+        self._state["quota"] = {"day": quota_day(), "used": used + cost}
+
+    def get(self, endpoint, ttl=0, cache_ignore=(), **params):
+        '''
+        Call an API endpoint and return its JSON response.
+        With ttl, the response is cached for ttl seconds; a stale cached response
+        is returned instead of failing when the quota is exhausted.
+        Params named in cache_ignore are left out of the cache key: calls that only
+        differ by them share the cached response.
+        '''
+        key = endpoint + "?" + "&".join(f"{k}={params[k]}" for k in sorted(params) if k not in cache_ignore)
+        with self._lock:
+            cached = self._state["cache"].get(key)
+            if cached and cached["expires"] > time.time():
+                return cached["data"]
+        with self._update_state() as state:
+            cached = state["cache"].get(key)
+            if cached and cached["expires"] > time.time():
+                return cached["data"]
+            try:
+                self._reserve_quota(endpoint)
+            except QuotaExceeded:
+                if cached:
+                    print("⚠️ Quota YouTube presque atteint, réponse en cache utilisée.")
+                    return cached["data"]
+                raise
+        response = self.session.get(f"{API_URL}/{endpoint}", params={**params, "key": self.api_key},
+                                    timeout=self.timeout)
+        data = response.json()
+        if "error" in data:
+            reasons = {e.get("reason") for e in data["error"].get("errors", [])}
+            if "quotaExceeded" in reasons or "dailyLimitExceeded" in reasons:
+                with self._update_state() as state:
+                    state["quota"] = {"day": quota_day(), "used": self.daily_quota}
+                raise QuotaExceeded(data["error"].get("message"))
+            raise Exception(f"Erreur de l'API YouTube : {data['error'].get('message')}")
+        if ttl:
+            with self._update_state() as state:
+                state["cache"][key] = {"expires": time.time() + ttl, "data": data}
+        return data
+
+    def trending_video_ids(self, count=1, region_code="US"):
+        '''IDs of the `count` most popular videos (at most 50), cached for TRENDING_TTL.'''
+        data = self.get("videos", ttl=TRENDING_TTL, part="snippet", chart="mostPopular",
+                        maxResults=count, regionCode=region_code)
+        return [item["id"] for item in data.get("items", [])]
+
+    def search(self, query, ttl=SEARCH_TTL, cache_ignore=(), **params):
+        '''Search videos matching query; returns the result items.'''
+        return self.get("search", ttl=ttl, cache_ignore=cache_ignore, part="snippet", type="video", q=query,
+                        **params).get("items", [])
+
+    def video_durations(self, video_ids):
+        '''Durations in seconds of the given videos; known durations are not fetched again.'''
+        with self._lock:
+            known = self._state["durations"]
+            missing = [video_id for video_id in video_ids if video_id not in known]
+        if missing:
+            data = self.get("videos", part="contentDetails", id=",".join(missing))
+            with self._update_state() as state:
+                for item in data.get("items", []):
+                    state["durations"][item["id"]] = parse_iso8601_duration(item["contentDetails"]["duration"])
+        with self._lock:
+            known = self._state["durations"]
+            return {video_id: known[video_id] for video_id in video_ids if video_id in known}
+
+    def pool_size(self, name):
+        with self._lock, locked(self.state_path):
+            self._state = self._load_state()
+            self._expire_pool(name)
+            return len(self._state["pools"].get(name, []))
+
+    def pool_add(self, name, entries):
+        '''Add search results to the named pool (entries are dicts with an "id").'''
+        with self._update_state() as state:
+            self._expire_pool(name)
+            pool = state["pools"].setdefault(name, [])
+            known = {entry["id"] for entry in pool}
+            pool.extend(dict(entry, pooled=time.time()) for entry in entries if entry["id"] not in known)
+
+    def pool_draw(self, name, count=1):
+        '''Remove and return up to count random entries from the named pool.'''
+        with self._update_state() as state:
+            self._expire_pool(name)
+            pool = state["pools"].get(name, [])
+            random.shuffle(pool)
+            drawn, state["pools"][name] = pool[:count], pool[count:]
+        return [{k: v for k, v in entry.items() if k != "pooled"} for entry in drawn]
+
+    def _expire_pool(self, name):
+        oldest = time.time() - POOL_TTL
+        pool = self._state["pools"].get(name, [])
+        self._state["pools"][name] = [entry for entry in pool if entry["pooled"] > oldest]
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def client():
+    '''Shared YouTubeAPI client of this process.'''
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = YouTubeAPI()
+        return _client
@@ -1,22 +1,41 @@
 """
 youtube_uploader.py
 YouTube video uploader using the YouTube Data API v3.
-- Authenticate with OAuth2
+- Authenticate with OAuth2 once per process (credentials and client cached)
 - Upload videos with metadata
 - Save and refresh credentials
+- Resumable chunked uploads (UploadService): concurrent uploads of a directory,
+  resume from the last acknowledged byte with backoff, sessions kept across restarts
 """
 
 import os
+import glob
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaFileUpload
 import pickle
-from google.auth.transport.requests import Request
+from google.auth.transport.requests import Request, AuthorizedSession
 from configparser import ConfigParser
 import json
-import tempfile
+import requests
+from file_lock import locked, write_json_atomic
 
 SCOPES = ['https://www.googleapis.com/auth/youtube.upload']
+TOKEN_PATH = os.path.join("credential", "token_youtube.pkl")
+
+UPLOAD_URL = "https://www.googleapis.com"
+SESSIONS_PATH = os.path.join("cache", "upload_sessions.json")
+CHUNK_GRANULARITY = 256 * 1024  # chunk sizes must be multiples of 256 KiB
+DEFAULT_CHUNK_SIZE = 32 * CHUNK_GRANULARITY  # 8 MiB
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_credentials = None
+_youtube = None
+_auth_lock = threading.Lock()
 
 
 def get_youtube_config():
@@ -26,50 +45,64 @@ def get_youtube_config():
     return config['youtube']
 
 
-def authenticate_youtube():
+def get_credentials():
     '''
-    Authenticate and return a YouTube API client.
-    Handles token refresh and OAuth2 flow.
+    OAuth2 credentials for uploads, obtained once per process.
+    Loads and refreshes the saved token, or runs the OAuth2 flow.
     '''
-    credentials = None
-    token_path = r'credential/token_youtube.pkl'
-    config = get_youtube_config()
-    client_secret_dict = {
-        "installed": {
-            "client_id": config.get('client_id'),
-            "project_id": config.get('project_id'),
-            "auth_uri": config.get('auth_uri'),
-            "token_uri": config.get('token_uri'),
-            "auth_provider_x509_cert_url": config.get('auth_provider_x509_cert_url'),
-            "client_secret": config.get('client_secret'),
-            "redirect_uris": [config.get('redirect_uris')]
-        }
-    }
-    with tempfile.NamedTemporaryFile('w+', delete=False, suffix='.json') as tmp:
-        json.dump(client_secret_dict, tmp)
-        tmp.flush()
-        client_secret_path = tmp.name
-
-    if os.path.exists(token_path):
-        with open(token_path, 'rb') as token_file:
-            credentials = pickle.load(token_file)
-
-    if credentials and credentials.expired and credentials.refresh_token:
-        credentials.refresh(Request())
-
-    if not credentials or not credentials.valid:
-        flow = InstalledAppFlow.from_client_secrets_file(client_secret_path, SCOPES)
-        credentials = flow.run_local_server(port=0)
-        with open(token_path, 'wb') as token_file:
+    global _credentials
+    with _auth_lock:
+        if _credentials and _credentials.valid:
+            return _credentials
+        credentials = _credentials
+        if credentials is None and os.path.exists(TOKEN_PATH):
+            with open(TOKEN_PATH, 'rb') as token_file:
+                credentials = pickle.load(token_file)
+
+        if credentials and credentials.expired and credentials.refresh_token:
+            credentials.refresh(Request())
+
+        if not credentials or not credentials.valid:
+            config = get_youtube_config()
+            client_config = {
+                "installed": {
+                    "client_id": config.get('client_id'),
+                    "project_id": config.get('project_id'),
+                    "auth_uri": config.get('auth_uri'),
+                    "token_uri": config.get('token_uri'),
+                    "auth_provider_x509_cert_url": config.get('auth_provider_x509_cert_url'),
+                    "client_secret": config.get('client_secret'),
+                    "redirect_uris": [config.get('redirect_uris')]
+                }
+            }
+            # The client secret stays in memory, no temporary JSON file is written
+            flow = InstalledAppFlow.from_client_config(client_config, SCOPES)
+            credentials = flow.run_local_server(port=0)
+        with open(TOKEN_PATH, 'wb') as token_file:
             pickle.dump(credentials, token_file)
+        _credentials = credentials
+        return credentials
 
-    youtube = build('youtube', 'v3', credentials=credentials)
-    return youtube
+
+def authenticate_youtube():
+    '''
+    Authenticate and return a YouTube API client.
+    The client is built once and reused by later calls.
+    '''
+    global _youtube
+    credentials = get_credentials()
+    with _auth_lock:
+        if _youtube is None:
+            _youtube = build('youtube', 'v3', credentials=credentials)
+        return _youtube
 
 
-def upload_video(youtube, file_path, title, description, tags=None, category_id='22', privacy_status='private'):
+def upload_video(youtube, file_path, title, description, tags=None, category_id='22', privacy_status='private',
+                 chunk_size=DEFAULT_CHUNK_SIZE):
     '''
     Upload a video to YouTube with metadata.
+    The file is sent in chunk_size chunks; a failed chunk is retried with backoff
+    from the last acknowledged offset. See UploadService for batches.
     '''
     request_body = {
         'snippet': {
@@ -83,7 +116,7 @@ def upload_video(youtube, file_path, title, description, tags=None, category_id=
         }
     }
 
-    media = MediaFileUpload(file_path, chunksize=-1, resumable=True, mimetype='video/*')
+    media = MediaFileUpload(file_path, chunksize=chunk_size, resumable=True, mimetype='video/*')
     request = youtube.videos().insert(
         part='snippet,status',
         body=request_body,
@@ -92,13 +125,209 @@ def upload_video(youtube, file_path, title, description, tags=None, category_id=
 
     response = None
     while response is None:
-        status, response = request.next_chunk()
+        status, response = request.next_chunk(num_retries=5)
         if status:
             print(f"Uploading: {int(status.progress() * 100)}%")
 
     print(f"Upload complete! Video ID: {response['id']}")
     return response['id']
 
+
+class UploadError(Exception):
+    '''An upload failed for good (rejected by the API or out of retries).'''
+
+
+class _RetryableError(Exception):
+    pass
+
+
+class UploadService:
+    '''
+    Resumable YouTube uploads over the raw upload protocol.
+    - Each file is sent in chunk_size chunks; after a network error or a 5xx/429
+      the service waits (exponential backoff), asks the server for the last
+      acknowledged byte and continues from there.
+    - Upload session URIs and finished uploads are saved in sessions_path, so a
+      restarted process resumes unfinished uploads and skips finished ones.
+    - upload_url can point at a local HTTP stand-in, e.g.
+      UploadService(credentials=AnonymousCredentials(), upload_url="http://127.0.0.1:8080").
+    '''
+
+    def __init__(self, credentials=None, upload_url=UPLOAD_URL, chunk_size=DEFAULT_CHUNK_SIZE,
+                 sessions_path=SESSIONS_PATH, max_retries=8, timeout=120):
+        if chunk_size <= 0 or chunk_size % CHUNK_GRANULARITY:
+            raise ValueError(f"chunk_size doit être un multiple de {CHUNK_GRANULARITY} octets")
+        self.credentials = credentials
+        self.upload_url = upload_url.rstrip("/")
+        self.chunk_size = chunk_size
+        self.sessions_path = sessions_path
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._state = self._load_state()
+
+    def _session(self):
+        '''One authorized HTTP session per uploading thread.'''
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = AuthorizedSession(self.credentials or get_credentials())
+        return session
+
+    def _load_state(self):
+        state = {"sessions": {}, "uploaded": {}}
+        if os.path.exists(self.sessions_path):
+            with open(self.sessions_path, encoding="utf-8") as f:
+                state.update(json.load(f))
+        return state
+
+    def _update_state(self, update):
+        '''
+        Apply update(state) to the saved state and write it back, under a file lock:
+        other processes uploading with the same sessions_path keep their entries.
+        Returns what update returns.
+        '''
+        with self._lock, locked(self.sessions_path):
+            self._state = self._load_state()
+            result = update(self._state)
+            write_json_atomic(self.sessions_path, self._state, indent=2)
+            return result
+
+    def _forget_session(self, key, uri):
+        '''Drop the saved session uri of key (expired), unless it was replaced meanwhile.'''
+        def forget(state):
+            if state["sessions"].get(key) == uri:
+                del state["sessions"][key]
+        self._update_state(forget)
+
+    @staticmethod
+    def _file_key(file_path):
+        stat = os.stat(file_path)
+        return f"{os.path.abspath(file_path)}|{stat.st_size}|{int(stat.st_mtime)}"
+
+    def _start_session(self, metadata, size):
+        response = self._session().post(
+            f"{self.upload_url}/upload/youtube/v3/videos",
+            params={"uploadType": "resumable", "part": "snippet,status"},
+            json=metadata,
+            headers={"X-Upload-Content-Length": str(size), "X-Upload-Content-Type": "video/*"},
+            timeout=self.timeout
+        )
+        if response.status_code in RETRY_STATUSES:
+            raise _RetryableError(f"HTTP {response.status_code}")
+        if response.status_code != 200 or "Location" not in response.headers:
+            raise UploadError(f"Création de la session refusée : HTTP {response.status_code} {response.text}")
+        return response.headers["Location"]
+
+    def _put(self, uri, data, content_range):
+        '''
+        Send one chunk (or a status query) and interpret the answer.
+        Returns (next_offset, result): result is the video resource once the upload
+        is complete; next_offset is None when the session expired.
+        '''
+        response = self._session().put(uri, data=data, headers={"Content-Range": content_range},
+                                       timeout=self.timeout)
+        if response.status_code in (200, 201):
+            return None, response.json()
+        if response.status_code == 308:
+            acknowledged = response.headers.get("Range")  # "bytes=0-1234"
+            return (int(acknowledged.rsplit("-", 1)[1]) + 1 if acknowledged else 0), None
+        if response.status_code in (404, 410):
+            return None, None
+        if response.status_code in RETRY_STATUSES:
+            raise _RetryableError(f"HTTP {response.status_code}")
+        raise UploadError(f"Envoi refusé : HTTP {response.status_code} {response.text}")
+
+    def upload(self, file_path, title, description="", tags=None, category_id='22', privacy_status='private'):
+        '''Upload one file (or resume its saved session). Returns the YouTube video ID.'''
+        key = self._file_key(file_path)
+        with self._lock, locked(self.sessions_path):
+            self._state = self._load_state()
+            if key in self._state["uploaded"]:
+                print(f"Déjà publiée : {file_path} ({self._state['uploaded'][key]})")
+                return self._state["uploaded"][key]
+            uri = self._state["sessions"].get(key)
+        metadata = {
+            'snippet': {'title': title, 'description': description, 'tags': tags or [], 'categoryId': category_id},
+            'status': {'privacyStatus': privacy_status}
+        }
+        size = os.path.getsize(file_path)
+        offset = None  # unknown: ask the server before sending
+        attempt = 0
+        result = None
+        while result is None:
+            try:
+                if uri is None:
+                    new_uri = self._start_session(metadata, size)
+                    # Another process may have started this file meanwhile: continue its session
+                    uri = self._update_state(lambda state: state["sessions"].setdefault(key, new_uri))
+                    if uri != new_uri:
+                        continue
+                    offset = 0
+                elif offset is None:
+                    offset, result = self._put(uri, b"", f"bytes */{size}")
+                    if result is not None:
+                        break
+                    if offset is None:
+                        print(f"Session expirée, nouvel envoi : {file_path}")
+                        self._forget_session(key, uri)
+                        uri = None
+                        continue
+                    if offset:
+                        print(f"Reprise de {file_path} à {offset * 100 // size}%")
+
+                with open(file_path, "rb") as f:
+                    f.seek(offset)
+                    chunk = f.read(self.chunk_size)
+                content_range = f"bytes {offset}-{offset + len(chunk) - 1}/{size}"
+                offset, result = self._put(uri, chunk, content_range)
+                attempt = 0
+                if result is None and offset is None:
+                    self._forget_session(key, uri)
+                    uri = None
+                elif result is None:
+                    print(f"Uploading {os.path.basename(file_path)}: {offset * 100 // size}%")
+            except (requests.ConnectionError, requests.Timeout, _RetryableError) as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise UploadError(f"Échec de l'envoi de {file_path} après {self.max_retries} essais : {e}")
+                delay = min(2 ** attempt, 64) + random.random()
+                print(f"⚠️ Envoi interrompu ({e}), nouvel essai dans {delay:.0f}s")
+                time.sleep(delay)
+                offset = None
+
+        video_id = result["id"]
+
+        def finish(state):
+            state["sessions"].pop(key, None)
+            state["uploaded"][key] = video_id
+        self._update_state(finish)
+        print(f"Upload complete! Video ID: {video_id}")
+        return video_id
+
+    def upload_many(self, file_paths, max_workers=3, title_fn=None, **metadata):
+        '''
+        Upload several files concurrently. title_fn(path) gives each title (default:
+        the file name). Returns {path: video ID or the exception raised}.
+        '''
+        title_fn = title_fn or (lambda path: os.path.splitext(os.path.basename(path))[0])
+        results = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {pool.submit(self.upload, path, title_fn(path), **metadata): path for path in file_paths}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    results[path] = future.result()
+                except Exception as e:
+                    print(f"❌ Échec de la publication de {path} : {e}")
+                    results[path] = e
+        return results
+
+    def upload_directory(self, directory, pattern="*.mp4", max_workers=3, title_fn=None, **metadata):
+        '''Upload every clip of a directory concurrently (see upload_many).'''
+        return self.upload_many(sorted(glob.glob(os.path.join(directory, pattern))), max_workers, title_fn, **metadata)
+
+
 if __name__ == '__main__':
     yt = authenticate_youtube()
     upload_video(